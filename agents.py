@@ -1,31 +1,438 @@
+import asyncio
+import functools
 import os
-import pandas as pd
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Dict, Any, AsyncIterator, Generator, Iterator, List, NamedTuple, Optional
 from langchain.prompts import ChatPromptTemplate
-from tavily import TavilyClient
+from infraestrutura import Infraestrutura, obter_infraestrutura
+from tabela_score import ScoreForaDaFaixaError
+from calculo_score import calcular_score
+from cotacao import PROMPT_COTACAO, consulta_cotacao, texto_resultados
+from sessao import EstadoSessao
+from metricas import metricas
+from rastreamento import contar_tokens, rastreador, rastrear
+from roteador import MOEDAS_POR_CATEGORIA, roteador
+from normalizacao import extrair_cpf, extrair_data, extrair_valor
+from limitador import limites_autenticacao, minutos_de_espera, registrar_sucesso
+from classificador import (
+    classificacao_fallback, interpretar_classificacao, negativa_por_palavras, registrar_camada
+)
+
+class ChamadaLLM(NamedTuple):
+    """Chamada ao LLM pedida por um handler; o resultado é o texto da resposta
+
+    Com transmitir=True, o texto gerado faz parte da resposta ao usuário e é
+    repassado token a token quando a mensagem é processada em modo streaming.
+    """
+    prompt: ChatPromptTemplate
+    dados: Dict[str, Any]
+    transmitir: bool = False
+
+
+class ChamadaBusca(NamedTuple):
+    """Busca na web (Tavily) pedida por um handler"""
+    query: str
+    max_results: int = 3
+
+
+class ChamadaCotacao(NamedTuple):
+    """Cotação de uma moeda (busca + extração pelo LLM), opcionalmente via cache"""
+    moeda: str
+    usar_cache: bool
+
+
+class Trecho(NamedTuple):
+    """Início da resposta já conhecido pelo handler, antes de uma chamada transmitida"""
+    texto: str
+
+
+# Handlers que fazem chamadas externas são geradores: emitem Chamada* e
+# recebem o resultado. O mesmo fluxo é executado pelo motor síncrono
+# (processar_mensagem), pelo assíncrono (processar_mensagem_async) e pelas
+# versões em streaming (transmitir_mensagem e transmitir_mensagem_async).
+Fluxo = Generator[Any, Any, Any]
+
+METRICA_PRIMEIRO_TRECHO = "resposta_primeiro_trecho_segundos"
+METRICA_AUTENTICACAO_BLOQUEADA = "autenticacao_bloqueada_total"
+
+
+class _Transmissao:
+    """Controla os trechos já enviados ao cliente numa resposta em streaming
+
+    Trechos dos handlers ficam pendentes até o primeiro token do LLM; se a
+    chamada falhar antes disso, são descartados e só a resposta final é
+    enviada. O tempo até o primeiro trecho é registrado em
+    METRICA_PRIMEIRO_TRECHO, com origem "llm" ou "direto".
+    """
+    __slots__ = ("agente", "inicio", "fila", "_pendentes", "_enviados")
+
+    def __init__(self, agente: str, fila: Optional[asyncio.Queue] = None):
+        self.agente = agente
+        self.inicio = time.perf_counter()
+        self.fila = fila
+        self._pendentes: List[str] = []
+        self._enviados: List[str] = []
+
+    def trecho(self, texto: str):
+        self._pendentes.append(texto)
+
+    def token(self, texto: str) -> List[str]:
+        """Trechos a enviar ao receber um token do LLM"""
+        if not texto:
+            return []
+        if not self._enviados:
+            self._registrar_primeiro("llm")
+        saida = self._pendentes + [texto]
+        self._pendentes = []
+        self._enviados.extend(saida)
+        return saida
+
+    def publicar(self, texto: str):
+        """Versão de token() para o motor assíncrono: coloca os trechos na fila"""
+        for trecho in self.token(texto):
+            self.fila.put_nowait(trecho)
+
+    def finalizar(self, resposta: str) -> List[str]:
+        """Trechos restantes para completar a resposta final"""
+        enviado = "".join(self._enviados)
+        if not enviado:
+            self._registrar_primeiro("direto")
+            restante = resposta
+        elif resposta.startswith(enviado):
+            restante = resposta[len(enviado):]
+        else:
+            # O fluxo falhou depois de parte da resposta ter sido enviada
+            restante = "\n\n" + resposta
+        return [restante] if restante else []
+
+    def _registrar_primeiro(self, origem: str):
+        metricas.observar(
+            METRICA_PRIMEIRO_TRECHO, time.perf_counter() - self.inicio,
+            agente=self.agente, origem=origem
+        )
+
+# Prompts construídos uma única vez, no carregamento do módulo
+PROMPT_NEGATIVA = ChatPromptTemplate.from_template("""
+Você é um classificador de intenções de usuário em um banco.
+
+Contexto da pergunta anterior: {contexto}
+Resposta do usuário: {mensagem}
+
+O usuário está indicando que NÃO quer continuar com a atividade/serviço atual?
+Exemplos de respostas negativas: "não", "não quero", "agora não", "deixa pra depois", "não precisa", "tá bom assim", "só isso mesmo", "é só isso", "não obrigado"
+
+Responda APENAS com: SIM ou NAO
+""")
+
+PROMPT_CLASSIFICACAO = ChatPromptTemplate.from_template("""
+Você é um assistente de classificação de intenções para um banco.
+
+Contexto da pergunta anterior: {contexto}
+Mensagem do cliente: {mensagem}
+
+Classifique a mensagem em dois aspectos:
+1. intencao - a intenção principal, uma das opções:
+   - credito: se o cliente quer consultar limite ou solicitar aumento de crédito
+   - cambio: se o cliente quer consultar cotação de moedas
+   - outros: se não se encaixa nas opções acima
+2. negativa - true se o cliente indica que NÃO quer continuar (ex.: "não", "agora não", "é só isso", "não obrigado"), senão false
+
+Responda APENAS com um JSON no formato:
+{{"intencao": "credito|cambio|outros", "negativa": true|false}}
+""")
+
+# Nomes dos prompts nos spans de rastreamento
+_NOMES_PROMPTS = {
+    id(PROMPT_NEGATIVA): "negativa",
+    id(PROMPT_CLASSIFICACAO): "classificacao",
+    id(PROMPT_COTACAO): "cotacao",
+}
+
+
+def _campo_estado(nome: str) -> property:
+    """Atributo do BancoAgilSystem que lê e escreve no EstadoSessao da conversa"""
+    return property(
+        lambda self: getattr(self.estado, nome),
+        lambda self, valor: setattr(self.estado, nome, valor),
+        doc=f"Atalho para estado.{nome}"
+    )
+
 
 class BancoAgilSystem:
-    def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-            temperature=0.3
-        )
-        self.tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-        
-        # Estado do sistema
-        self.agente_atual = "triagem"
-        self.cliente_autenticado = False
-        self.cliente_dados = None
-        self.tentativas_auth = 0
-        self.conversa_encerrada = False
-        self.contexto = {}
-        self.historico = []
+    __slots__ = (
+        "llm", "tavily_client", "repositorio_clientes", "registro_solicitacoes",
+        "tabela_score", "classificador_regras", "cache_cotacoes", "armazenamento_sessoes",
+        "limitador_autenticacao", "cache_classificacao", "origem", "estado", "_lock_async",
+        "_descartadas"
+    )
+    
+    # Estado do sistema (guardado em self.estado)
+    agente_atual = _campo_estado("agente_atual")
+    cliente_autenticado = _campo_estado("cliente_autenticado")
+    cliente_dados = _campo_estado("cliente_dados")
+    tentativas_auth = _campo_estado("tentativas_auth")
+    conversa_encerrada = _campo_estado("conversa_encerrada")
+    contexto = _campo_estado("contexto")
+    historico = _campo_estado("historico")
+    
+    def __init__(
+        self,
+        infraestrutura: Optional[Infraestrutura] = None,
+        estado: Optional[EstadoSessao] = None,
+        origem: Optional[str] = None
+    ):
+        # Clientes e dados são compartilhados pelo processo; a sessão guarda só o estado da conversa
+        infraestrutura = infraestrutura if infraestrutura is not None else obter_infraestrutura()
+        self.llm = infraestrutura.llm
+        self.tavily_client = infraestrutura.tavily_client
+        self.repositorio_clientes = infraestrutura.repositorio_clientes
+        self.registro_solicitacoes = infraestrutura.registro_solicitacoes
+        self.tabela_score = infraestrutura.tabela_score
+        self.classificador_regras = infraestrutura.classificador_regras
+        self.cache_cotacoes = infraestrutura.cache_cotacoes
+        self.armazenamento_sessoes = infraestrutura.armazenamento_sessoes
+        self.limitador_autenticacao = infraestrutura.limitador_autenticacao
+        self.cache_classificacao = infraestrutura.cache_classificacao
+        
+        # Cliente que enviou a mensagem (ex.: IP na API); limita as tentativas de autenticação por origem
+        self.origem = origem
+        
+        self.estado = estado if estado is not None else EstadoSessao()
+        self._lock_async = None
+        
+        # Mensagens que saem do buffer do histórico podem ser arquivadas no store de sessões;
+        # ficam pendentes até salvar() gravar a sessão, para não arquivar uma alteração recusada
+        self._descartadas: List[Dict[str, str]] = []
+        if os.getenv("BANCO_AGIL_ARQUIVAR_HISTORICO") == "1":
+            self.estado.historico.ao_descartar = self._descartadas.append
+    
+    @property
+    def id_sessao(self) -> str:
+        return self.estado.id
+    
+    @classmethod
+    def retomar(
+        cls, id_sessao: str, infraestrutura: Optional[Infraestrutura] = None, origem: Optional[str] = None
+    ) -> Optional["BancoAgilSystem"]:
+        """Recria a sessão a partir do store de sessões (None se não existir)"""
+        infraestrutura = infraestrutura if infraestrutura is not None else obter_infraestrutura()
+        with rastrear("sessao", operacao="obter"):
+            estado = infraestrutura.armazenamento_sessoes.obter(id_sessao)
+        if estado is None:
+            return None
+        return cls(infraestrutura, estado, origem)
+    
+    def salvar(self):
+        """Persiste o estado da conversa no store de sessões e arquiva as mensagens descartadas
+
+        Se o store recusar a gravação (SessaoConcorrente), nada é arquivado.
+        """
+        with rastrear("sessao", operacao="salvar", agente=self.agente_atual):
+            self.armazenamento_sessoes.salvar(self.estado)
+            for mensagem in self._descartadas:
+                self.armazenamento_sessoes.arquivar(self.estado.id, mensagem)
+            self._descartadas.clear()
         
     def processar_mensagem(self, mensagem: str) -> str:
         """Processa a mensagem do usuário e retorna resposta apropriada"""
+        return self._executar(self._fluxo_mensagem(mensagem))
+    
+    async def processar_mensagem_async(self, mensagem: str) -> str:
+        """Versão assíncrona de processar_mensagem: LLM e busca não bloqueiam o event loop"""
+        # Mensagens da mesma sessão são processadas em ordem; sessões diferentes em paralelo
+        if self._lock_async is None:
+            self._lock_async = asyncio.Lock()
+        async with self._lock_async:
+            return await self._executar_async(self._fluxo_mensagem(mensagem))
+    
+    def transmitir_mensagem(self, mensagem: str) -> Iterator[str]:
+        """Versão de processar_mensagem que entrega a resposta em trechos, à medida que o LLM gera
+
+        A concatenação dos trechos é a mesma resposta de processar_mensagem.
+        """
+        transmissao = _Transmissao(self.agente_atual)
+        resposta = yield from self._executar_transmitindo(self._fluxo_mensagem(mensagem), transmissao)
+        yield from transmissao.finalizar(resposta)
+    
+    async def transmitir_mensagem_async(self, mensagem: str) -> AsyncIterator[str]:
+        """Versão assíncrona de transmitir_mensagem"""
+        if self._lock_async is None:
+            self._lock_async = asyncio.Lock()
+        async with self._lock_async:
+            fila = asyncio.Queue()
+            transmissao = _Transmissao(self.agente_atual, fila)
+            
+            async def produzir():
+                try:
+                    resposta = await self._executar_async(self._fluxo_mensagem(mensagem), transmissao)
+                    for trecho in transmissao.finalizar(resposta):
+                        fila.put_nowait(trecho)
+                finally:
+                    fila.put_nowait(None)
+            
+            tarefa = asyncio.ensure_future(produzir())
+            try:
+                while True:
+                    trecho = await fila.get()
+                    if trecho is None:
+                        break
+                    yield trecho
+                await tarefa  # propaga eventual erro do fluxo
+            finally:
+                if not tarefa.done():
+                    tarefa.cancel()
+    
+    def _executar(self, fluxo: Fluxo):
+        """Executa um fluxo atendendo suas chamadas externas de forma bloqueante"""
+        resultado, erro = None, None
+        while True:
+            try:
+                chamada = fluxo.send(resultado) if erro is None else fluxo.throw(erro)
+            except StopIteration as fim:
+                return fim.value
+            
+            resultado, erro = None, None
+            try:
+                resultado = self._atender(chamada)
+            except Exception as e:
+                erro = e
+    
+    def _executar_transmitindo(self, fluxo: Fluxo, transmissao: _Transmissao) -> Iterator[str]:
+        """Como _executar, mas emite os trechos da resposta; o valor de retorno é o do fluxo"""
+        resultado, erro = None, None
+        while True:
+            try:
+                chamada = fluxo.send(resultado) if erro is None else fluxo.throw(erro)
+            except StopIteration as fim:
+                return fim.value
+            
+            resultado, erro = None, None
+            try:
+                resultado = yield from self._atender_transmitindo(chamada, transmissao)
+            except Exception as e:
+                erro = e
+    
+    async def _executar_async(self, fluxo: Fluxo, transmissao: Optional[_Transmissao] = None):
+        """Executa um fluxo atendendo suas chamadas externas com await"""
+        resultado, erro = None, None
+        while True:
+            try:
+                chamada = fluxo.send(resultado) if erro is None else fluxo.throw(erro)
+            except StopIteration as fim:
+                return fim.value
+            
+            resultado, erro = None, None
+            try:
+                resultado = await self._atender_async(chamada, transmissao)
+            except Exception as e:
+                erro = e
+    
+    def _atender(self, chamada):
+        """Executa uma chamada externa de forma bloqueante"""
+        if isinstance(chamada, ChamadaLLM):
+            with self._span_llm(chamada) as span:
+                mensagens = chamada.prompt.format_messages(**chamada.dados)
+                resposta = self.llm.invoke(mensagens)
+                if rastreador.ativo:
+                    span.definir(**contar_tokens(mensagens, resposta))
+                return resposta.content
+        if isinstance(chamada, ChamadaBusca):
+            with rastrear("busca", agente=self.agente_atual):
+                return self.tavily_client.search(chamada.query, max_results=chamada.max_results)
+        if isinstance(chamada, ChamadaCotacao):
+            with self._span_cotacao(chamada):
+                if chamada.usar_cache:
+                    return self.cache_cotacoes.obter(chamada.moeda, lambda: self._buscar_cotacao(chamada.moeda))
+                return self._buscar_cotacao(chamada.moeda)
+        if isinstance(chamada, Trecho):
+            return None  # sem streaming, a resposta só é entregue completa
+        raise TypeError(f"Chamada desconhecida: {chamada!r}")
+    
+    def _atender_transmitindo(self, chamada, transmissao: _Transmissao) -> Iterator[str]:
+        """Como _atender, repassando tokens do LLM quando a chamada é transmitida"""
+        if isinstance(chamada, Trecho):
+            transmissao.trecho(chamada.texto)
+            return None
+        if isinstance(chamada, ChamadaLLM) and chamada.transmitir:
+            with self._span_llm(chamada) as span:
+                partes = []
+                for parte in self.llm.stream(chamada.prompt.format_messages(**chamada.dados)):
+                    partes.append(parte.content)
+                    yield from transmissao.token(parte.content)
+                span.definir(tokens_saida=len(partes))
+                return "".join(partes)
+        if isinstance(chamada, ChamadaCotacao) and not self._cotacao_em_cache(chamada):
+            with self._span_cotacao(chamada):
+                carregar = lambda: self._executar_transmitindo(
+                    self._fluxo_cotacao(chamada.moeda, transmitir=True), transmissao
+                )
+                if chamada.usar_cache:
+                    # Quem dispara a busca transmite os tokens; buscas simultâneas esperam o valor
+                    return (yield from self.cache_cotacoes.obter_transmitindo(chamada.moeda, carregar))
+                return (yield from carregar())
+        return self._atender(chamada)
+    
+    def _cotacao_em_cache(self, chamada: ChamadaCotacao) -> bool:
+        """True se a cotação pode ser servida pelo cache sem esperar uma busca"""
+        return chamada.usar_cache and self.cache_cotacoes.disponivel(chamada.moeda)
+    
+    def _span_llm(self, chamada: ChamadaLLM):
+        return rastrear("llm", agente=self.agente_atual, prompt=_NOMES_PROMPTS.get(id(chamada.prompt), "outro"))
+    
+    def _span_cotacao(self, chamada: ChamadaCotacao):
+        span = rastrear("cotacao", agente=self.agente_atual, moeda=chamada.moeda)
+        if rastreador.ativo:
+            span.definir(cache=(
+                "desligado" if not chamada.usar_cache
+                else "hit" if self._cotacao_em_cache(chamada) else "miss"
+            ))
+        return span
+    
+    async def _atender_async(self, chamada, transmissao: Optional[_Transmissao] = None):
+        """Executa uma chamada externa sem bloquear o event loop"""
+        if isinstance(chamada, Trecho):
+            if transmissao is not None:
+                transmissao.trecho(chamada.texto)
+            return None
+        if isinstance(chamada, ChamadaLLM):
+            with self._span_llm(chamada) as span:
+                mensagens = chamada.prompt.format_messages(**chamada.dados)
+                if transmissao is not None and chamada.transmitir:
+                    partes = []
+                    async for parte in self.llm.astream(mensagens):
+                        partes.append(parte.content)
+                        transmissao.publicar(parte.content)
+                    span.definir(tokens_saida=len(partes))
+                    return "".join(partes)
+                resultado = await self.llm.ainvoke(mensagens)
+                if rastreador.ativo:
+                    span.definir(**contar_tokens(mensagens, resultado))
+                return resultado.content
+        if isinstance(chamada, ChamadaBusca):
+            with rastrear("busca", agente=self.agente_atual):
+                asearch = getattr(self.tavily_client, "asearch", None)
+                if asearch is not None:
+                    return await asearch(chamada.query, max_results=chamada.max_results)
+                # Cliente sem versão assíncrona: executa em thread para não bloquear o loop
+                return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                    self.tavily_client.search, chamada.query, max_results=chamada.max_results
+                ))
+        if isinstance(chamada, ChamadaCotacao):
+            with self._span_cotacao(chamada):
+                # Em streaming, quem dispara a busca publica os tokens; buscas simultâneas esperam o
+                # valor. Atualizações em segundo plano (cotação vencida servida) não transmitem
+                transmitir = transmissao is not None and not self._cotacao_em_cache(chamada)
+                carregar = lambda: self._executar_async(
+                    self._fluxo_cotacao(chamada.moeda, transmitir=transmitir), transmissao if transmitir else None
+                )
+                if chamada.usar_cache:
+                    return await self.cache_cotacoes.obter_async(chamada.moeda, carregar)
+                return await carregar()
+        raise TypeError(f"Chamada desconhecida: {chamada!r}")
+    
+    def _fluxo_mensagem(self, mensagem: str) -> Fluxo:
+        """Máquina de estados do atendimento para uma mensagem do usuário"""
         
         # Verifica se é mensagem inicial
         if not mensagem and not self.historico:
@@ -40,64 +447,54 @@ class BancoAgilSystem:
             self.conversa_encerrada = True
             return "Obrigado por utilizar o Banco Ágil! Até logo! 👋"
         
-        # Roteia para o agente apropriado
-        if self.agente_atual == "triagem":
-            resposta = self._processar_triagem(mensagem)
-        elif self.agente_atual == "credito":
-            resposta = self._processar_credito(mensagem)
-        elif self.agente_atual == "entrevista":
-            resposta = self._processar_entrevista(mensagem)
-        elif self.agente_atual == "cambio":
-            resposta = self._processar_cambio(mensagem)
-        else:
-            resposta = "Desculpe, ocorreu um erro. Por favor, reinicie o atendimento."
+        # Roteia para o agente apropriado (tabela de estados em roteador.py)
+        with rastrear("handler", agente=self.agente_atual):
+            resposta = yield from roteador.rotear(self, mensagem)
         
         self.historico.append({"role": "assistant", "content": resposta})
         return resposta
     
     def _usuario_quer_encerrar(self, mensagem: str) -> bool:
         """Detecta se usuário quer encerrar a conversa"""
-        if not mensagem:
-            return False
-        
-        palavras_chave = ["tchau", "encerrar", "sair", "finalizar", "desligar", "até logo", "adeus"]
-        return any(palavra in mensagem.lower() for palavra in palavras_chave)
+        return roteador.menciona(mensagem, "encerrar")
     
-    def _detectar_intencao_negativa(self, mensagem: str, contexto_pergunta: str = "") -> bool:
+    def _detectar_intencao_negativa(self, mensagem: str, contexto_pergunta: str = "") -> Fluxo:
         """Detecta se o usuário quer encerrar a atividade atual ou responde negativamente"""
         if not mensagem:
             return False
         
-        prompt = ChatPromptTemplate.from_template("""
-Você é um classificador de intenções de usuário em um banco.
-
-Contexto da pergunta anterior: {contexto}
-Resposta do usuário: {mensagem}
-
-O usuário está indicando que NÃO quer continuar com a atividade/serviço atual?
-Exemplos de respostas negativas: "não", "não quero", "agora não", "deixa pra depois", "não precisa", "tá bom assim", "só isso mesmo", "é só isso", "não obrigado"
-
-Responda APENAS com: SIM ou NAO
-""")
+        # Casos de alta confiança são resolvidos localmente, sem chamar o LLM
+        negativa = self.classificador_regras.negativa(mensagem)
+        if negativa is not None:
+            registrar_camada("negativa", "regras")
+            return negativa
+        
+        # Mesma pergunta e mensagem já classificadas pelo LLM antes
+        resultado = self.cache_classificacao.obter("negativa", contexto_pergunta, mensagem)
+        if resultado is not None:
+            registrar_camada("negativa", "cache")
+            return "SIM" in resultado.strip().upper()
         
         try:
-            chain = prompt | self.llm
-            resultado = chain.invoke({
+            resultado = yield ChamadaLLM(PROMPT_NEGATIVA, {
                 "contexto": contexto_pergunta,
                 "mensagem": mensagem
             })
-            resposta = resultado.content.strip().upper()
+            resposta = resultado.strip().upper()
+            registrar_camada("negativa", "llm")
+            self.cache_classificacao.definir("negativa", contexto_pergunta, mensagem, resultado)
             return "SIM" in resposta
-        except:
-            # Fallback para palavras-chave simples se LLM falhar
-            negativas = ["não", "nao", "nada", "agora não", "deixa", "só isso", "é só isso"]
-            return any(neg in mensagem.lower() for neg in negativas)
+        except Exception:
+            # Fallback para palavras-chave simples se o LLM falhar, estourar o prazo
+            # ou estiver com o disjuntor aberto (resiliencia.py)
+            registrar_camada("negativa", "fallback")
+            return negativa_por_palavras(mensagem)
     
     def _agente_triagem_inicio(self) -> str:
         """Mensagem inicial do agente de triagem"""
         return "Olá! Bem-vindo ao Banco Ágil. 🏦\n\nSou seu assistente virtual e estou aqui para ajudá-lo.\n\nPara começarmos, por favor, informe seu CPF (somente números):"
     
-    def _processar_triagem(self, mensagem: str) -> str:
+    def _processar_triagem(self, mensagem: str) -> Fluxo:
         """Processa mensagens do agente de triagem"""
         
         # Etapa 1: Coletar CPF
@@ -120,52 +517,46 @@ Responda APENAS com: SIM ou NAO
         
         # Etapa 3: Identificar intenção e redirecionar
         if self.cliente_autenticado:
-            return self._identificar_intencao(mensagem)
+            return (yield from self._identificar_intencao(mensagem))
         
         return "Desculpe, houve um erro no processo. Por favor, reinicie o atendimento."
     
     def _extrair_cpf(self, mensagem: str) -> Optional[str]:
         """Extrai CPF da mensagem"""
-        import re
-        cpf = re.sub(r'\D', '', mensagem)
-        if len(cpf) == 11:
-            return cpf
-        return None
+        return extrair_cpf(mensagem)
     
     def _extrair_data(self, mensagem: str) -> Optional[str]:
-        """Extrai data de nascimento da mensagem"""
-        import re
-        
-        # Tenta encontrar data no formato DD/MM/AAAA
-        match = re.search(r'(\d{2})[/-](\d{2})[/-](\d{4})', mensagem)
-        if match:
-            dia, mes, ano = match.groups()
-            return f"{ano}-{mes}-{dia}"
-        
-        # Tenta encontrar data no formato AAAA-MM-DD
-        match = re.search(r'(\d{4})[/-](\d{2})[/-](\d{2})', mensagem)
-        if match:
-            return match.group(0).replace('/', '-')
-        
-        return None
+        """Extrai data de nascimento da mensagem (DD/MM/AAAA ou AAAA-MM-DD)"""
+        return extrair_data(mensagem)
     
     def _autenticar_cliente(self) -> str:
         """Autentica o cliente contra a base de dados"""
+        # Tentativas por CPF e por origem são contadas entre sessões e workers;
+        # acima do limite, recusa antes de consultar a base
+        cpf = self.contexto["cpf"]
+        espera = self.limitador_autenticacao.consumir(limites_autenticacao(cpf, self.origem))
+        if espera > 0:
+            metricas.incrementar(METRICA_AUTENTICACAO_BLOQUEADA)
+            self.contexto = {}
+            return f"""Muitas tentativas de autenticação. ⏳
+
+Por segurança, aguarde {minutos_de_espera(espera)} minuto(s) antes de tentar novamente."""
+        
         try:
-            df = pd.read_csv("clientes.csv")
-            cliente = df[
-                (df["cpf"].astype(str) == self.contexto["cpf"]) &
-                (df["data_nascimento"] == self.contexto["data_nascimento"])
-            ]
+            cliente = self.repositorio_clientes.autenticar(
+                self.contexto["cpf"],
+                self.contexto["data_nascimento"]
+            )
             
-            if not cliente.empty:
+            if cliente is not None:
                 self.cliente_autenticado = True
-                self.cliente_dados = cliente.iloc[0].to_dict()
+                self.cliente_dados = cliente
                 self.tentativas_auth = 0
+                registrar_sucesso(self.limitador_autenticacao, cpf, self.origem)
                 
                 return f"""Perfeito! Autenticação realizada com sucesso. ✅
 
-Olá, {self.cliente_dados['nome']}! Como posso ajudá-lo hoje?
+Olá, {self.cliente_dados.nome}! Como posso ajudá-lo hoje?
 
 Posso auxiliar com:
 💳 Consulta de limite de crédito
@@ -189,34 +580,35 @@ Por favor, informe seu CPF novamente:"""
         except Exception as e:
             return f"Erro ao acessar a base de dados. Por favor, tente novamente mais tarde. Detalhes: {str(e)}"
     
-    def _identificar_intencao(self, mensagem: str) -> str:
+    def _identificar_intencao(self, mensagem: str) -> Fluxo:
         """Identifica a intenção do cliente e redireciona"""
         
-        # Primeiro verifica se quer encerrar explicitamente
-        if self._detectar_intencao_negativa(mensagem, "Posso ajudá-lo com algo mais?"):
+        # Regras locais primeiro; o que ficar ambíguo vai ao LLM numa única chamada
+        negativa = self.classificador_regras.negativa(mensagem)
+        intencao = self.classificador_regras.intencao(mensagem) if not negativa else None
+        if negativa is not None:
+            registrar_camada("negativa", "regras")
+        if intencao is not None:
+            registrar_camada("intencao", "regras")
+        
+        if negativa is None or (not negativa and intencao is None):
+            classificacao = yield from self._classificar_mensagem(mensagem, "Posso ajudá-lo com algo mais?")
+            if negativa is None:
+                negativa = classificacao.negativa
+                registrar_camada("negativa", classificacao.camada)
+            if intencao is None and not negativa:
+                intencao = classificacao.intencao
+                registrar_camada("intencao", classificacao.camada)
+        
+        # Verifica se quer encerrar explicitamente
+        if negativa:
             self.conversa_encerrada = True
             return "Obrigado por utilizar o Banco Ágil! Até logo! 👋"
         
-        prompt = ChatPromptTemplate.from_template("""
-Você é um assistente de classificação de intenções para um banco.
-
-Analise a mensagem do cliente e identifique a intenção principal. Responda APENAS com uma das opções:
-- credito: se o cliente quer consultar limite ou solicitar aumento de crédito
-- cambio: se o cliente quer consultar cotação de moedas
-- outros: se não se encaixa nas opções acima
-
-Mensagem do cliente: {mensagem}
-
-Intenção:""")
-        
-        chain = prompt | self.llm
-        resultado = chain.invoke({"mensagem": mensagem})
-        intencao = resultado.content.strip().lower()
-        
-        if "credito" in intencao or "crédito" in intencao:
+        if intencao == "credito":
             self.agente_atual = "credito"
             return self._iniciar_agente_credito()
-        elif "cambio" in intencao or "câmbio" in intencao or "moeda" in intencao:
+        elif intencao == "cambio":
             self.agente_atual = "cambio"
             return self._iniciar_agente_cambio()
         else:
@@ -227,25 +619,42 @@ Intenção:""")
 
 Qual serviço você precisa?"""
     
+    def _classificar_mensagem(self, mensagem: str, contexto_pergunta: str = "") -> Fluxo:
+        """Classifica intenção e negativa com uma única chamada ao LLM (retorna Classificacao)"""
+        resultado = self.cache_classificacao.obter("classificacao", contexto_pergunta, mensagem)
+        if resultado is not None:
+            return interpretar_classificacao(resultado)._replace(camada="cache")
+        
+        try:
+            resultado = yield ChamadaLLM(PROMPT_CLASSIFICACAO, {
+                "contexto": contexto_pergunta,
+                "mensagem": mensagem
+            })
+            classificacao = interpretar_classificacao(resultado)
+            # Só respostas válidas vão para o cache
+            self.cache_classificacao.definir("classificacao", contexto_pergunta, mensagem, resultado)
+            return classificacao
+        except Exception:
+            return classificacao_fallback(mensagem)
+    
     def _iniciar_agente_credito(self) -> str:
         """Inicia o agente de crédito"""
-        limite_atual = self.cliente_dados.get("limite_credito", 0)
+        # Atualiza os dados do cliente a partir do repositório compartilhado
+        cliente = self.repositorio_clientes.buscar(self.contexto["cpf"])
+        if cliente is not None:
+            self.cliente_dados = cliente
+        
+        limite_atual = self.cliente_dados.limite_credito
         
         # Verifica se já mencionou aumento na mensagem de entrada
-        ultimo_user_msg = ""
-        for msg in reversed(self.historico):
-            if msg["role"] == "user":
-                ultimo_user_msg = msg["content"]
-                break
+        ultimo_user_msg = self.historico.ultima_mensagem_usuario
         
         # Tenta extrair valor da mensagem
-        import re
-        valor_match = re.search(r'(\d+\.?\d*)', ultimo_user_msg.replace(',', '.'))
+        valor = extrair_valor(ultimo_user_msg)
         
         # Se já mencionou aumento E informou valor, processa direto
-        if any(palavra in ultimo_user_msg.lower() for palavra in ["aumento", "aumentar", "solicitar", "elevar", "novo limite"]):
-            if valor_match:
-                valor = float(valor_match.group(1))
+        if roteador.menciona(ultimo_user_msg, "aumento"):
+            if valor is not None:
                 return self._processar_solicitacao_aumento(valor)
             else:
                 # Mencionou aumento mas não informou valor
@@ -258,57 +667,43 @@ Qual o novo limite de crédito você gostaria de ter? Por favor, informe o valor
 
 Você gostaria de solicitar um aumento de limite ou precisa de alguma outra informação sobre seu crédito?"""
     
-    def _processar_credito(self, mensagem: str) -> str:
+    def _processar_credito(self, mensagem: str) -> Fluxo:
         """Processa mensagens do agente de crédito"""
         
         # Verifica se usuário não quer mais nada após aprovação/rejeição
+        # (pedidos de câmbio nesse ponto já foram redirecionados pela tabela do roteador)
         if self.contexto.get("solicitacao_processada"):
-            
-            # --- CORREÇÃO AQUI: Verificamos troca de contexto PRIMEIRO ---
-            
-            # Se mencionou outro serviço (Câmbio), redireciona
-            if any(palavra in mensagem.lower() for palavra in ["cotação", "cotacao", "cambio", "câmbio", "moeda", "dolar", "euro", "libra", "peso"]):
-                self.agente_atual = "cambio"
-                self.contexto.pop("solicitacao_processada", None)
-                # Passa a mensagem para o agente de câmbio processar imediatamente
-                return self._processar_cambio(mensagem)
-            
-            # Só depois verificamos se é uma negativa para encerrar
-            if self._detectar_intencao_negativa(mensagem, "Posso ajudá-lo com algo mais?"):
+            if (yield from self._detectar_intencao_negativa(mensagem, "Posso ajudá-lo com algo mais?")):
                 self.conversa_encerrada = True
                 return "Obrigado por utilizar o Banco Ágil! Até logo! 👋"
 
         # Detecta solicitação de aumento com valor já informado
-        import re
-        if any(palavra in mensagem.lower() for palavra in ["aumento", "aumentar", "solicitar", "elevar", "novo limite"]):
-            valor_match = re.search(r'(\d+\.?\d*)', mensagem.replace(',', '.'))
-            if valor_match:
-                valor = float(valor_match.group(1))
+        valor = extrair_valor(mensagem)
+        if roteador.menciona(mensagem, "aumento"):
+            if valor is not None:
                 return self._processar_solicitacao_aumento(valor)
             else:
                 return self._solicitar_valor_aumento()
         
         # Detecta valor numérico para aumento (quando já estava em contexto de aumento)
-        valor_match = re.search(r'(\d+\.?\d*)', mensagem.replace(',', '.'))
-        if valor_match:
-            valor = float(valor_match.group(1))
+        if valor is not None:
             return self._processar_solicitacao_aumento(valor)
         
         # Verifica se cliente quer entrevista após rejeição
         if self.contexto.get("solicitacao_rejeitada"):
             # Aqui também aplicamos a mesma lógica: verifica se quer sair antes de assumir negativa
             # Mas para entrevista, "não" geralmente significa "não quero entrevista" (voltar ou sair)
-            if self._detectar_intencao_negativa(mensagem, "Gostaria de prosseguir com essa análise?"):
+            if (yield from self._detectar_intencao_negativa(mensagem, "Gostaria de prosseguir com essa análise?")):
                 # Se disse não para a entrevista, perguntamos se quer outra coisa ao invés de sair direto
                 self.contexto.pop("solicitacao_rejeitada", None)
                 return self._voltar_menu_principal()
 
-            elif any(palavra in mensagem.lower() for palavra in ["sim", "quero", "aceito", "vamos", "pode", "prosseguir"]):
+            elif roteador.menciona(mensagem, "afirmativa"):
                 self.agente_atual = "entrevista"
                 return self._iniciar_entrevista()
         
         # Caso genérico - oferece opções
-        limite_atual = self.cliente_dados.get("limite_credito", 0)
+        limite_atual = self.cliente_dados.limite_credito
         return f"""Seu limite de crédito atual é de R$ {limite_atual:.2f}
 
 Como posso ajudá-lo com seu crédito?"""
@@ -321,18 +716,10 @@ Como posso ajudá-lo com seu crédito?"""
         """Processa a solicitação de aumento de limite"""
         
         try:
-            # Carrega tabela de score x limite
-            df_score = pd.read_csv("score_limite.csv")
-            
             # Verifica limite permitido para o score atual
-            score_atual = self.cliente_dados["score"]
-            limite_atual = self.cliente_dados["limite_credito"]
-            
-            limite_permitido = None
-            for _, row in df_score.iterrows():
-                if row["score_min"] <= score_atual <= row["score_max"]:
-                    limite_permitido = row["limite_maximo"]
-                    break
+            score_atual = self.cliente_dados.score
+            limite_atual = self.cliente_dados.limite_credito
+            limite_permitido = self.tabela_score.limite_para(score_atual)
             
             # Registra solicitação
             timestamp = datetime.now().isoformat()
@@ -370,42 +757,25 @@ Gostaria de prosseguir com essa análise?"""
             
             return resposta
             
+        except ScoreForaDaFaixaError:
+            return f"""Não foi possível avaliar sua solicitação: seu score atual ({self.cliente_dados.score}) não se enquadra em nenhuma faixa da nossa tabela de limites.
+
+Por favor, entre em contato com nosso SAC para uma análise manual. Posso ajudá-lo com algo mais?"""
         except Exception as e:
             return f"Erro ao processar solicitação: {str(e)}"
     
     def _salvar_solicitacao(self, cpf, timestamp, limite_atual, novo_limite, status):
-        """Salva solicitação de aumento no CSV"""
+        """Registra a solicitação de aumento no log append-only"""
         try:
-            # Cria ou lê o arquivo
-            try:
-                df = pd.read_csv("solicitacoes_aumento_limite.csv")
-            except FileNotFoundError:
-                df = pd.DataFrame(columns=[
-                    "cpf_cliente", "data_hora_solicitacao", "limite_atual",
-                    "novo_limite_solicitado", "status_pedido"
-                ])
-            
-            # Adiciona nova solicitação
-            nova_linha = pd.DataFrame([{
-                "cpf_cliente": cpf,
-                "data_hora_solicitacao": timestamp,
-                "limite_atual": limite_atual,
-                "novo_limite_solicitado": novo_limite,
-                "status_pedido": status
-            }])
-            
-            df = pd.concat([df, nova_linha], ignore_index=True)
-            df.to_csv("solicitacoes_aumento_limite.csv", index=False)
+            self.registro_solicitacoes.registrar(cpf, timestamp, limite_atual, novo_limite, status)
         except Exception as e:
             print(f"Erro ao salvar solicitação: {e}")
     
     def _atualizar_limite_cliente(self, novo_limite: float):
-        """Atualiza o limite do cliente no CSV"""
+        """Atualiza o limite do cliente no repositório"""
         try:
-            df = pd.read_csv("clientes.csv")
-            df.loc[df["cpf"].astype(str) == self.contexto["cpf"], "limite_credito"] = novo_limite
-            df.to_csv("clientes.csv", index=False)
-            self.cliente_dados["limite_credito"] = novo_limite
+            self.repositorio_clientes.atualizar_limite(self.contexto["cpf"], novo_limite)
+            self.cliente_dados = self.cliente_dados._replace(limite_credito=novo_limite)
         except Exception as e:
             print(f"Erro ao atualizar limite: {e}")
     
@@ -423,10 +793,9 @@ Primeira pergunta: Qual é sua renda mensal em reais?"""
         
         # Pergunta 1: Renda mensal
         if "renda_mensal" not in entrevista:
-            import re
-            valor = re.search(r'(\d+\.?\d*)', mensagem.replace(',', '.'))
-            if valor:
-                entrevista["renda_mensal"] = float(valor.group(1))
+            valor = extrair_valor(mensagem)
+            if valor is not None:
+                entrevista["renda_mensal"] = valor
                 self.contexto["entrevista"] = entrevista
                 return "Qual é o seu tipo de emprego?\n1. Formal (CLT)\n2. Autônomo\n3. Desempregado"
             return "Por favor, informe sua renda mensal em reais (exemplo: 5000):"
@@ -448,10 +817,9 @@ Primeira pergunta: Qual é sua renda mensal em reais?"""
         
         # Pergunta 3: Despesas fixas
         if "despesas_fixas" not in entrevista:
-            import re
-            valor = re.search(r'(\d+\.?\d*)', mensagem.replace(',', '.'))
-            if valor:
-                entrevista["despesas_fixas"] = float(valor.group(1))
+            valor = extrair_valor(mensagem)
+            if valor is not None:
+                entrevista["despesas_fixas"] = valor
                 self.contexto["entrevista"] = entrevista
                 return "Quantos dependentes você tem?\n0, 1, 2 ou 3+"
             return "Por favor, informe suas despesas fixas mensais em reais:"
@@ -492,40 +860,17 @@ Primeira pergunta: Qual é sua renda mensal em reais?"""
         
         entrevista = self.contexto["entrevista"]
         
-        # Pesos
-        peso_renda = 30
-        peso_emprego = {
-            "formal": 300,
-            "autônomo": 200,
-            "desempregado": 0
-        }
-        peso_dependentes = {
-            0: 100,
-            1: 80,
-            2: 60,
-            "3+": 30
-        }
-        peso_dividas = {
-            "sim": -100,
-            "não": 100
-        }
-        
-        # Cálculo
-        renda = entrevista["renda_mensal"]
-        despesas = entrevista["despesas_fixas"]
-        
-        score = (
-            (renda / (despesas + 1)) * peso_renda +
-            peso_emprego[entrevista["tipo_emprego"]] +
-            peso_dependentes[entrevista["dependentes"]] +
-            peso_dividas[entrevista["dividas"]]
+        # Mesma fórmula usada no re-score em lote (calculo_score.py)
+        score = calcular_score(
+            entrevista["renda_mensal"],
+            entrevista["tipo_emprego"],
+            entrevista["despesas_fixas"],
+            entrevista["dependentes"],
+            entrevista["dividas"]
         )
         
-        # Limita entre 0 e 1000
-        score = max(0, min(1000, int(score)))
-        
         # Atualiza score do cliente
-        score_antigo = self.cliente_dados["score"]
+        score_antigo = self.cliente_dados.score
         self._atualizar_score_cliente(score)
         
         # Retorna ao agente de crédito
@@ -541,12 +886,10 @@ Agora você pode fazer uma nova solicitação de aumento de limite.
 Qual seria o limite desejado?"""
     
     def _atualizar_score_cliente(self, novo_score: int):
-        """Atualiza o score do cliente no CSV"""
+        """Atualiza o score do cliente no repositório"""
         try:
-            df = pd.read_csv("clientes.csv")
-            df.loc[df["cpf"].astype(str) == self.contexto["cpf"], "score"] = novo_score
-            df.to_csv("clientes.csv", index=False)
-            self.cliente_dados["score"] = novo_score
+            self.repositorio_clientes.atualizar_score(self.contexto["cpf"], novo_score)
+            self.cliente_dados = self.cliente_dados._replace(score=novo_score)
         except Exception as e:
             print(f"Erro ao atualizar score: {e}")
     
@@ -554,23 +897,14 @@ Qual seria o limite desejado?"""
         """Inicia o agente de câmbio"""
         return "Posso consultar a cotação de moedas para você. 💱\n\nQual moeda você gostaria de consultar? (exemplo: dólar, euro, libra)"
     
-    def _processar_cambio(self, mensagem: str) -> str:
+    def _processar_cambio(self, mensagem: str) -> Fluxo:
         """Processa consulta de câmbio"""
         
         try:
             # Verifica se usuário não quer mais cotações
+            # (pedidos de crédito nesse ponto já foram redirecionados pela tabela do roteador)
             if self.contexto.get("cotacao_realizada"):
-                
-                # --- CORREÇÃO AQUI TAMBÉM ---
-                
-                # 1. Verifica se quer trocar para CRÉDITO
-                if any(palavra in mensagem.lower() for palavra in ["limite", "aumento", "credito", "crédito", "cartão"]):
-                    self.agente_atual = "credito"
-                    self.contexto.pop("cotacao_realizada", None)
-                    return self._iniciar_agente_credito()
-
-                # 2. Verifica negativa (Encerrar)
-                if self._detectar_intencao_negativa(mensagem, "Gostaria de consultar outra moeda?"):
+                if (yield from self._detectar_intencao_negativa(mensagem, "Gostaria de consultar outra moeda?")):
                     self.conversa_encerrada = True
                     return "Obrigado por utilizar o Banco Ágil! Até logo! 👋"
             
@@ -582,34 +916,9 @@ Qual seria o limite desejado?"""
                  # Tenta ver se é uma saudação ou algo genérico
                  return "Qual moeda você gostaria de consultar? (ex: dólar, euro)"
 
-            # Busca cotação usando Tavily
-            query = f"cotação {moeda} hoje Brasil"
-            resultado = self.tavily_client.search(query, max_results=3)
-            
-            # ... (Restante do código de extração com LLM permanece igual) ...
-            
-            # Extrai informação da cotação
-            prompt = ChatPromptTemplate.from_template("""
-Com base nos seguintes resultados de busca, extraia a cotação atual do {moeda} em reais brasileiros.
-
-Resultados:
-{resultados}
-
-Responda de forma clara e direta, informando o valor da cotação.
-""")
-            
-            resultados_texto = "\n\n".join([
-                f"Fonte: {r.get('title', 'N/A')}\n{r.get('content', '')}"
-                for r in resultado.get('results', [])
-            ])
-            
-            chain = prompt | self.llm
-            resposta = chain.invoke({
-                "moeda": moeda,
-                "resultados": resultados_texto
-            })
-            
-            cotacao = resposta.content
+            # Moedas reconhecidas vêm do cache compartilhado; textos livres são buscados diretamente
+            yield Trecho(f"💱 Cotação do {moeda.upper()}:\n\n")
+            cotacao = yield ChamadaCotacao(moeda, usar_cache=moeda != mensagem)
             
             # Marca que já foi feita uma cotação
             self.contexto["cotacao_realizada"] = True
@@ -623,6 +932,23 @@ Gostaria de consultar outra moeda?"""
         except Exception as e:
             return f"Desculpe, não consegui consultar a cotação no momento. Erro: {str(e)}\n\nPosso ajudá-lo com algo mais?"
     
+    def _buscar_cotacao(self, moeda: str) -> str:
+        """Busca a cotação com Tavily e extrai o valor com o LLM"""
+        return self._executar(self._fluxo_cotacao(moeda))
+    
+    def _fluxo_cotacao(self, moeda: str, transmitir: bool = False) -> Fluxo:
+        """Fluxo de busca da cotação: Tavily seguido de extração pelo LLM"""
+        # Busca cotação usando Tavily
+        resultado = yield ChamadaBusca(consulta_cotacao(moeda), max_results=3)
+        
+        # Extrai informação da cotação
+        cotacao = yield ChamadaLLM(PROMPT_COTACAO, {
+            "moeda": moeda,
+            "resultados": texto_resultados(resultado)
+        }, transmitir=transmitir)
+        
+        return cotacao
+    
     def _voltar_menu_principal(self) -> str:
         """Volta ao menu principal oferecendo outros serviços"""
         # Limpa contextos específicos
@@ -642,15 +968,8 @@ Qual serviço você precisa?"""
     
     def _identificar_moeda(self, mensagem: str) -> str:
         """Identifica a moeda mencionada"""
-        msg_lower = mensagem.lower()
-        
-        if "dolar" in msg_lower or "dólar" in msg_lower or "usd" in msg_lower:
-            return "dólar"
-        elif "euro" in msg_lower or "eur" in msg_lower:
-            return "euro"
-        elif "libra" in msg_lower or "gbp" in msg_lower:
-            return "libra"
-        elif "peso" in msg_lower:
-            return "peso argentino"
-        else:
-            return mensagem  # Retorna a mensagem original se não identificar
\ No newline at end of file
+        categorias = roteador.categorias(mensagem)
+        for categoria, moeda in MOEDAS_POR_CATEGORIA:
+            if categoria in categorias:
+                return moeda
+        return mensagem  # Retorna a mensagem original se não identificar
\ No newline at end of file
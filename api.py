@@ -0,0 +1,208 @@
+"""API HTTP/WebSocket do Banco Ágil (ASGI)
+
+Uso:
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+    POST   /sessoes                   cria a sessão e retorna a saudação
+    GET    /sessoes/{id}              estado resumido e histórico recente
+    POST   /sessoes/{id}/mensagens    {"mensagem": "..."} -> {"resposta": "...", "encerrada": false}
+                                      com ?stream=1, NDJSON: {"trecho": "..."}... e por fim a resposta
+    DELETE /sessoes/{id}              remove a sessão
+    WS     /sessoes/{id}/ws           envia mensagens e recebe {"trecho"}... seguidos da resposta
+    GET    /metricas                  contadores e histogramas no formato de texto do Prometheus
+
+O estado das conversas fica no store de sessões (ver sessao.py); com
+BANCO_AGIL_SESSOES_DB, workers diferentes atendem a mesma conversa. Dentro de
+um worker, as mensagens de uma sessão são processadas em ordem; entre workers,
+o store grava por compare-and-swap de versão: se duas mensagens da mesma
+conversa chegam juntas a workers diferentes, a que terminar depois não
+sobrescreve a outra e recebe 409 (o cliente reenvia a mensagem). As chamadas
+ao store (SQLite) rodam no threadpool, fora do event loop.
+"""
+import asyncio
+import json
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from agents import BancoAgilSystem
+from infraestrutura import obter_infraestrutura
+from rastreamento import texto_prometheus
+from sessao import SessaoConcorrente
+
+# Uma trava por sessão garante que mensagens da mesma conversa sejam processadas em ordem
+# neste worker; entre workers, quem garante é a versão da sessão no store
+_travas: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _trava(id_sessao: str) -> asyncio.Lock:
+    trava = _travas.get(id_sessao)
+    if trava is None:
+        trava = asyncio.Lock()
+        _travas[id_sessao] = trava
+    return trava
+
+
+def _origem(conexao) -> Optional[str]:
+    """IP do cliente HTTP/WebSocket, usado no limite de tentativas de autenticação"""
+    return conexao.client.host if conexao.client else None
+
+
+ERRO_CONCORRENCIA = "A sessão foi alterada por outra mensagem enquanto esta era processada; envie novamente"
+
+
+def _sessao_nao_encontrada() -> JSONResponse:
+    return JSONResponse({"erro": "Sessão não encontrada"}, status_code=404)
+
+
+async def _responder(id_sessao: str, mensagem: str, origem: Optional[str] = None) -> Optional[dict]:
+    """Processa uma mensagem da sessão e persiste o novo estado (None se a sessão não existe)
+
+    Levanta SessaoConcorrente se outro worker salvou a sessão nesse meio-tempo.
+    """
+    async with _trava(id_sessao):
+        sistema = await run_in_threadpool(BancoAgilSystem.retomar, id_sessao, origem=origem)
+        if sistema is None:
+            return None
+        if sistema.conversa_encerrada:
+            return {"resposta": "Este atendimento já foi encerrado.", "encerrada": True}
+        resposta = await sistema.processar_mensagem_async(mensagem)
+        await run_in_threadpool(sistema.salvar)
+        return {"resposta": resposta, "encerrada": sistema.conversa_encerrada}
+
+
+async def _transmitir(id_sessao: str, mensagem: str, origem: Optional[str] = None) -> AsyncIterator[dict]:
+    """Como _responder, emitindo {"trecho"} à medida que a resposta é gerada"""
+    async with _trava(id_sessao):
+        sistema = await run_in_threadpool(BancoAgilSystem.retomar, id_sessao, origem=origem)
+        if sistema is None:
+            yield {"erro": "Sessão não encontrada", "status": 404}
+            return
+        if sistema.conversa_encerrada:
+            aviso = "Este atendimento já foi encerrado."
+            yield {"trecho": aviso}
+            yield {"resposta": aviso, "encerrada": True}
+            return
+        partes = []
+        async for trecho in sistema.transmitir_mensagem_async(mensagem):
+            partes.append(trecho)
+            yield {"trecho": trecho}
+        try:
+            await run_in_threadpool(sistema.salvar)
+        except SessaoConcorrente:
+            yield {"erro": ERRO_CONCORRENCIA, "status": 409}
+            return
+        yield {"resposta": "".join(partes), "encerrada": sistema.conversa_encerrada}
+
+
+async def criar_sessao(request: Request) -> JSONResponse:
+    sistema = BancoAgilSystem()
+    resposta = await sistema.processar_mensagem_async("")
+    await run_in_threadpool(sistema.salvar)
+    return JSONResponse(
+        {"id": sistema.id_sessao, "resposta": resposta, "encerrada": False},
+        status_code=201
+    )
+
+
+async def consultar_sessao(request: Request) -> JSONResponse:
+    sistema = await run_in_threadpool(BancoAgilSystem.retomar, request.path_params["id"])
+    if sistema is None:
+        return _sessao_nao_encontrada()
+    return JSONResponse({
+        "id": sistema.id_sessao,
+        "agente_atual": sistema.agente_atual,
+        "autenticado": sistema.cliente_autenticado,
+        "encerrada": sistema.conversa_encerrada,
+        "historico": list(sistema.historico),
+    })
+
+
+async def enviar_mensagem(request: Request) -> JSONResponse:
+    try:
+        corpo = await request.json()
+        mensagem = corpo["mensagem"]
+    except Exception:
+        return JSONResponse({"erro": "Envie um JSON no formato {\"mensagem\": \"...\"}"}, status_code=400)
+    if not isinstance(mensagem, str) or not mensagem.strip():
+        return JSONResponse({"erro": "A mensagem não pode ser vazia"}, status_code=400)
+
+    id_sessao = request.path_params["id"]
+    if request.query_params.get("stream") == "1":
+        if await run_in_threadpool(obter_infraestrutura().armazenamento_sessoes.obter, id_sessao) is None:
+            return _sessao_nao_encontrada()
+        linhas = (
+            json.dumps(evento, ensure_ascii=False) + "\n"
+            async for evento in _transmitir(id_sessao, mensagem, _origem(request))
+        )
+        return StreamingResponse(linhas, media_type="application/x-ndjson")
+
+    try:
+        resultado = await _responder(id_sessao, mensagem, _origem(request))
+    except SessaoConcorrente:
+        return JSONResponse({"erro": ERRO_CONCORRENCIA}, status_code=409)
+    if resultado is None:
+        return _sessao_nao_encontrada()
+    return JSONResponse(resultado)
+
+
+async def remover_sessao(request: Request) -> Response:
+    await run_in_threadpool(obter_infraestrutura().armazenamento_sessoes.remover, request.path_params["id"])
+    return Response(status_code=204)
+
+
+async def conversar(websocket: WebSocket):
+    """Cada mensagem de texto recebida gera JSONs {"trecho"} e, por fim, {"resposta", "encerrada"}"""
+    id_sessao = websocket.path_params["id"]
+    await websocket.accept()
+    try:
+        while True:
+            mensagem = await websocket.receive_text()
+            async for evento in _transmitir(id_sessao, mensagem, _origem(websocket)):
+                await websocket.send_json(evento)
+            if evento.get("status") == 409:
+                # Mensagem descartada por concorrência; a conexão continua aberta
+                continue
+            if "erro" in evento:
+                await websocket.close(code=4404)
+                return
+            if evento["encerrada"]:
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+
+
+async def exportar_metricas(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(texto_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: Starlette):
+    infraestrutura = obter_infraestrutura()
+    yield
+    # Fecha as conexões aiohttp do event loop do worker
+    fechar_async = getattr(infraestrutura.tavily_client, "fechar_async", None)
+    if fechar_async is not None:
+        await fechar_async()
+
+
+app = Starlette(
+    routes=[
+        Route("/sessoes", criar_sessao, methods=["POST"]),
+        Route("/sessoes/{id}", consultar_sessao, methods=["GET"]),
+        Route("/sessoes/{id}", remover_sessao, methods=["DELETE"]),
+        Route("/sessoes/{id}/mensagens", enviar_mensagem, methods=["POST"]),
+        WebSocketRoute("/sessoes/{id}/ws", conversar),
+        Route("/metricas", exportar_metricas, methods=["GET"]),
+    ],
+    lifespan=ciclo_de_vida,
+)
@@ -2,10 +2,48 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from agents import BancoAgilSystem
+from cliente_api import SessaoRemota
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
+
+def origem_cliente():
+    """IP do navegador conectado (ou, sem ele, o id da sessão do Streamlit)
+
+    Usado pelo limitador de tentativas de autenticação, como o IP da conexão na API.
+    """
+    try:
+        from streamlit.runtime import get_instance
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        contexto = get_script_run_ctx()
+        if contexto is None:
+            return None
+        # Conexão WebSocket do navegador (API interna do Streamlit, pode mudar entre versões)
+        cliente = get_instance().get_client(contexto.session_id)
+        requisicao = getattr(cliente, "request", None)
+        if requisicao is not None and requisicao.remote_ip:
+            return requisicao.remote_ip
+        return contexto.session_id
+    except Exception:
+        return None
+
+
+def criar_sistema():
+    """Usa a API HTTP (api.py) se BANCO_AGIL_API_URL estiver definida; senão, atende no próprio processo"""
+    url_api = os.getenv("BANCO_AGIL_API_URL")
+    if url_api:
+        return SessaoRemota(url_api)
+    return BancoAgilSystem(origem=origem_cliente())
+
+
+def salvar_sessao():
+    """Grava a sessão local no store de sessões, arquivando o histórico descartado (a API salva a dela)"""
+    if isinstance(st.session_state.sistema, BancoAgilSystem):
+        st.session_state.sistema.salvar()
+
+
 # Configuração da página
 st.set_page_config(
     page_title="Banco Ágil - Atendimento Virtual",
@@ -48,7 +86,7 @@ st.markdown("<p style='text-align: center; color: #666;'>Atendimento Virtual Int
 
 # Inicializa o sistema no session_state
 if 'sistema' not in st.session_state:
-    st.session_state.sistema = BancoAgilSystem()
+    st.session_state.sistema = criar_sistema()
     st.session_state.messages = []
     st.session_state.conversa_ativa = False
 
@@ -56,15 +94,25 @@ if 'sistema' not in st.session_state:
 if not st.session_state.conversa_ativa:
     if st.button("🚀 Iniciar Atendimento", type="primary", use_container_width=True):
         st.session_state.messages = []
-        st.session_state.sistema = BancoAgilSystem()
+        st.session_state.sistema = criar_sistema()
         st.session_state.conversa_ativa = True
 
         # Mensagem inicial
         resposta = st.session_state.sistema.processar_mensagem("")
+        salvar_sessao()
         st.session_state.messages.append(
             {"role": "assistant", "content": resposta})
         st.rerun()
 
+def html_mensagem_assistente(conteudo: str) -> str:
+    return f"""
+        <div class='chat-message agent-message'>
+            <strong style='color: #1f77b4;'>🤖 Assistente:</strong><br>
+            <span style='color: #212121;'>{conteudo}</span>
+        </div>
+        """
+
+
 # Exibe histórico de mensagens
 for message in st.session_state.messages:
     if message["role"] == "user":
@@ -75,12 +123,7 @@ for message in st.session_state.messages:
         </div>
         """, unsafe_allow_html=True)
     else:
-        st.markdown(f"""
-        <div class='chat-message agent-message'>
-            <strong style='color: #1f77b4;'>🤖 Assistente:</strong><br>
-            <span style='color: #212121;'>{message["content"]}</span>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(html_mensagem_assistente(message["content"]), unsafe_allow_html=True)
 
 # Campo de entrada de mensagem
 if st.session_state.conversa_ativa:
@@ -104,8 +147,13 @@ if st.session_state.conversa_ativa:
             st.session_state.messages.append(
                 {"role": "user", "content": user_input})
 
-            # Processa mensagem
-            resposta = st.session_state.sistema.processar_mensagem(user_input)
+            # Processa mensagem, exibindo a resposta à medida que é gerada
+            espaco_resposta = st.empty()
+            resposta = ""
+            for trecho in st.session_state.sistema.transmitir_mensagem(user_input):
+                resposta += trecho
+                espaco_resposta.markdown(html_mensagem_assistente(resposta), unsafe_allow_html=True)
+            salvar_sessao()
 
             # Adiciona resposta do agente
             st.session_state.messages.append(
@@ -0,0 +1,329 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+COLUNAS_CLIENTES = ["cpf", "data_nascimento", "nome", "limite_credito", "score"]
+
+
+class ClienteRegistro(NamedTuple):
+    """Registro compacto de um cliente (apenas os campos usados pelos agentes)"""
+    data_nascimento: str
+    nome: str
+    limite_credito: float
+    score: int
+
+
+@contextlib.contextmanager
+def _trava_arquivo(caminho: str):
+    """Trava exclusiva entre processos baseada em arquivo auxiliar"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(caminho, "a") as trava:
+        fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+
+
+class ArmazenamentoClientes(ABC):
+    """Interface dos backends de persistência de clientes"""
+
+    @abstractmethod
+    def buscar(self, cpf: str) -> Optional[ClienteRegistro]:
+        """Retorna o registro do cliente ou None se o CPF não existir"""
+
+    @abstractmethod
+    def atualizar(self, cpf: str, **campos):
+        """Atualiza atomicamente os campos de um único cliente"""
+
+    @abstractmethod
+    def atualizar_em_lote(self, campo: str, valores: Dict[str, Any]) -> int:
+        """Atualiza um campo de muitos clientes de uma vez; retorna quantos foram atualizados
+
+        CPFs inexistentes são ignorados.
+        """
+
+    @abstractmethod
+    def registros(self) -> Iterator[Tuple[str, ClienteRegistro]]:
+        """Itera sobre todos os clientes (usado em exportação/migração)"""
+
+    @abstractmethod
+    def blocos(self, tamanho_bloco: int = 500_000) -> Iterator[pd.DataFrame]:
+        """Itera sobre todos os clientes em DataFrames de até tamanho_bloco linhas
+
+        Usado nos processamentos em lote: a memória fica limitada a um bloco.
+        """
+
+
+class ArmazenamentoCSV(ArmazenamentoClientes):
+    """Backend em CSV: índice em memória recarregado quando o arquivo muda
+
+    Atualizações regravam o arquivo inteiro (O(N)) de forma atômica, sob
+    trava entre processos, para que escritas concorrentes não se percam.
+    """
+
+    def __init__(self, caminho: str = "clientes.csv"):
+        self.caminho = caminho
+        self._indice: Dict[str, ClienteRegistro] = {}
+        self._mtime = None
+        self._lock = threading.RLock()
+
+    def _carregar_se_necessario(self):
+        """Recarrega o índice se o mtime do arquivo mudou desde a última leitura"""
+        mtime = os.stat(self.caminho).st_mtime_ns
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+
+            df = pd.read_csv(self.caminho, dtype={"cpf": str, "data_nascimento": str, "nome": str})
+            self._indice = {
+                cpf: ClienteRegistro(data_nascimento, nome, float(limite), int(score))
+                for cpf, data_nascimento, nome, limite, score in zip(
+                    df["cpf"], df["data_nascimento"], df["nome"],
+                    df["limite_credito"], df["score"]
+                )
+            }
+            self._mtime = mtime
+
+    def buscar(self, cpf: str) -> Optional[ClienteRegistro]:
+        self._carregar_se_necessario()
+        return self._indice.get(cpf)
+
+    def atualizar(self, cpf: str, **campos):
+        with self._lock, _trava_arquivo(self.caminho + ".lock"):
+            self._carregar_se_necessario()
+            cliente = self._indice.get(cpf)
+            if cliente is None:
+                raise KeyError(f"CPF não encontrado: {cpf}")
+
+            self._indice[cpf] = cliente._replace(**campos)
+            self._persistir()
+
+    def atualizar_em_lote(self, campo: str, valores: Dict[str, Any]) -> int:
+        if campo not in ClienteRegistro._fields:
+            raise ValueError(f"Campo inválido: {campo}")
+
+        with self._lock, _trava_arquivo(self.caminho + ".lock"):
+            self._carregar_se_necessario()
+            atualizados = 0
+            for cpf, valor in valores.items():
+                cliente = self._indice.get(cpf)
+                if cliente is not None:
+                    self._indice[cpf] = cliente._replace(**{campo: valor})
+                    atualizados += 1
+            if atualizados:
+                self._persistir()
+            return atualizados
+
+    def registros(self) -> Iterator[Tuple[str, ClienteRegistro]]:
+        self._carregar_se_necessario()
+        return iter(list(self._indice.items()))
+
+    def blocos(self, tamanho_bloco: int = 500_000) -> Iterator[pd.DataFrame]:
+        # Lê direto do arquivo em vez do índice, que para a base inteira não caberia em memória
+        return pd.read_csv(
+            self.caminho,
+            dtype={"cpf": str, "data_nascimento": str, "nome": str},
+            chunksize=tamanho_bloco
+        )
+
+    def _persistir(self):
+        """Grava o índice em arquivo temporário e substitui o CSV atomicamente"""
+        df = pd.DataFrame(
+            [(cpf, *cliente) for cpf, cliente in self._indice.items()],
+            columns=COLUNAS_CLIENTES
+        )
+        diretorio = os.path.dirname(os.path.abspath(self.caminho))
+        descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix=".csv.tmp")
+        try:
+            with os.fdopen(descritor, "w", newline="", encoding="utf-8") as arquivo:
+                df.to_csv(arquivo, index=False)
+            os.replace(temporario, self.caminho)
+        except Exception:
+            os.remove(temporario)
+            raise
+        self._mtime = os.stat(self.caminho).st_mtime_ns
+
+
+class ArmazenamentoSQLite(ArmazenamentoClientes):
+    """Backend em SQLite (modo WAL) com atualizações pontuais transacionais"""
+
+    def __init__(self, caminho: str = "banco_agil.db"):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._criar_tabela()
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão própria de cada thread"""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_tabela(self):
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS clientes (
+                    cpf TEXT PRIMARY KEY,
+                    data_nascimento TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    limite_credito REAL NOT NULL,
+                    score INTEGER NOT NULL
+                )
+            """)
+
+    def buscar(self, cpf: str) -> Optional[ClienteRegistro]:
+        linha = self._conexao().execute(
+            "SELECT data_nascimento, nome, limite_credito, score FROM clientes WHERE cpf = ?",
+            (cpf,)
+        ).fetchone()
+        return ClienteRegistro(*linha) if linha else None
+
+    def atualizar(self, cpf: str, **campos):
+        colunas = [coluna for coluna in campos if coluna in ClienteRegistro._fields]
+        if len(colunas) != len(campos):
+            raise ValueError(f"Campos inválidos: {sorted(set(campos) - set(colunas))}")
+
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in colunas)
+        with self._conexao() as conexao:
+            cursor = conexao.execute(
+                f"UPDATE clientes SET {atribuicoes} WHERE cpf = ?",
+                [campos[coluna] for coluna in colunas] + [cpf]
+            )
+            if cursor.rowcount == 0:
+                raise KeyError(f"CPF não encontrado: {cpf}")
+
+    def atualizar_em_lote(self, campo: str, valores: Dict[str, Any]) -> int:
+        if campo not in ClienteRegistro._fields:
+            raise ValueError(f"Campo inválido: {campo}")
+
+        with self._conexao() as conexao:
+            antes = conexao.total_changes
+            conexao.executemany(
+                f"UPDATE clientes SET {campo} = ? WHERE cpf = ?",
+                ((valor, cpf) for cpf, valor in valores.items())
+            )
+            return conexao.total_changes - antes
+
+    def registros(self) -> Iterator[Tuple[str, ClienteRegistro]]:
+        cursor = self._conexao().execute(
+            "SELECT cpf, data_nascimento, nome, limite_credito, score FROM clientes ORDER BY cpf"
+        )
+        for cpf, *campos in cursor:
+            yield cpf, ClienteRegistro(*campos)
+
+    def blocos(self, tamanho_bloco: int = 500_000) -> Iterator[pd.DataFrame]:
+        cursor = self._conexao().execute(
+            "SELECT cpf, data_nascimento, nome, limite_credito, score FROM clientes ORDER BY cpf"
+        )
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                return
+            yield pd.DataFrame(linhas, columns=COLUNAS_CLIENTES)
+
+    def importar_csv(self, caminho_csv: str = "clientes.csv", tamanho_bloco: int = 100_000) -> int:
+        """Substitui todos os clientes pelos do CSV, lido em blocos
+
+        Tudo ocorre numa única transação: clientes ausentes do CSV são removidos
+        e, até o commit, os leitores continuam vendo a base anterior.
+        """
+        total = 0
+        with self._conexao() as conexao:
+            conexao.execute("DELETE FROM clientes")
+            for bloco in pd.read_csv(
+                caminho_csv,
+                dtype={"cpf": str, "data_nascimento": str, "nome": str},
+                chunksize=tamanho_bloco
+            ):
+                conexao.executemany(
+                    "INSERT OR REPLACE INTO clientes VALUES (?, ?, ?, ?, ?)",
+                    zip(
+                        bloco["cpf"], bloco["data_nascimento"], bloco["nome"],
+                        bloco["limite_credito"].astype(float), bloco["score"].astype(int).tolist()
+                    )
+                )
+                total += len(bloco)
+        return total
+
+    def exportar_csv(self, caminho_csv: str = "clientes.csv", tamanho_bloco: int = 100_000) -> int:
+        """Exporta todos os clientes para CSV"""
+        total = 0
+        cabecalho = True
+        cursor = self._conexao().execute(
+            "SELECT cpf, data_nascimento, nome, limite_credito, score FROM clientes ORDER BY cpf"
+        )
+        with open(caminho_csv, "w", newline="", encoding="utf-8") as arquivo:
+            while True:
+                linhas = cursor.fetchmany(tamanho_bloco)
+                if not linhas:
+                    break
+                pd.DataFrame(linhas, columns=COLUNAS_CLIENTES).to_csv(
+                    arquivo, index=False, header=cabecalho
+                )
+                cabecalho = False
+                total += len(linhas)
+        return total
+
+
+def criar_armazenamento(caminho_csv: str = "clientes.csv") -> ArmazenamentoClientes:
+    """Escolhe o backend: SQLite se BANCO_AGIL_DB estiver definida, snapshot
+    mapeado em memória se BANCO_AGIL_SNAPSHOT estiver definida, senão CSV"""
+    caminho_banco = os.getenv("BANCO_AGIL_DB")
+    if caminho_banco:
+        return ArmazenamentoSQLite(caminho_banco)
+    caminho_snapshot = os.getenv("BANCO_AGIL_SNAPSHOT")
+    if caminho_snapshot:
+        from snapshot_clientes import obter_snapshot
+        return obter_snapshot(caminho_snapshot)
+    return ArmazenamentoCSV(caminho_csv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração entre CSV e SQLite da base de clientes")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    migrar = subcomandos.add_parser(
+        "migrar", help="Substitui os clientes do banco SQLite pelos de clientes.csv"
+    )
+    migrar.add_argument("--banco", default=os.getenv("BANCO_AGIL_DB", "banco_agil.db"))
+    migrar.add_argument("--clientes", default="clientes.csv")
+
+    exportar = subcomandos.add_parser("exportar", help="Exporta o banco SQLite para CSV")
+    exportar.add_argument("--banco", default=os.getenv("BANCO_AGIL_DB", "banco_agil.db"))
+    exportar.add_argument("--clientes", default="clientes.csv")
+
+    args = parser.parse_args()
+    armazenamento = ArmazenamentoSQLite(args.banco)
+
+    if args.comando == "migrar":
+        total = armazenamento.importar_csv(args.clientes)
+        print(f"{total} clientes importados de {args.clientes} para {args.banco}")
+    else:
+        total = armazenamento.exportar_csv(args.clientes)
+        print(f"{total} clientes exportados de {args.banco} para {args.clientes}")
+
+
+if __name__ == "__main__":
+    main()
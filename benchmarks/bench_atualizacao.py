@@ -0,0 +1,73 @@
+"""Latência de atualizações pontuais de limite/score em função do tamanho da base
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_atualizacao --tamanhos 1000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazenamentoCSV, ArmazenamentoSQLite
+
+
+def gerar_clientes(caminho: str, quantidade: int):
+    """Gera um clientes.csv sintético com a quantidade informada de linhas"""
+    rng = np.random.default_rng(42)
+    pd.DataFrame({
+        "cpf": [f"{cpf:011d}" for cpf in range(1, quantidade + 1)],
+        "data_nascimento": "1990-01-01",
+        "nome": "Cliente Teste",
+        "limite_credito": rng.integers(1000, 30000, quantidade).astype(float),
+        "score": rng.integers(0, 1000, quantidade),
+    }).to_csv(caminho, index=False)
+
+
+def medir(armazenamento, quantidade: int, operacoes: int):
+    """Executa atualizações aleatórias e retorna as latências em microssegundos"""
+    latencias = []
+    for i in range(operacoes):
+        cpf = f"{random.randint(1, quantidade):011d}"
+        inicio = time.perf_counter()
+        if i % 2:
+            armazenamento.atualizar(cpf, score=random.randint(0, 1000))
+        else:
+            armazenamento.atualizar(cpf, limite_credito=float(random.randint(1000, 30000)))
+        latencias.append((time.perf_counter() - inicio) * 1e6)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--operacoes", type=int, default=1_000)
+    parser.add_argument("--incluir-csv", action="store_true",
+                        help="mede também o backend CSV (regrava o arquivo a cada atualização)")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'clientes':>10} {'mediana (µs)':>14} {'p95 (µs)':>10}")
+    for quantidade in args.tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_csv = os.path.join(diretorio, "clientes.csv")
+            gerar_clientes(caminho_csv, quantidade)
+
+            backends = [("sqlite", ArmazenamentoSQLite(os.path.join(diretorio, "banco.db")))]
+            backends[0][1].importar_csv(caminho_csv)
+            if args.incluir_csv:
+                backends.append(("csv", ArmazenamentoCSV(caminho_csv)))
+
+            for nome, armazenamento in backends:
+                # CSV regrava o arquivo inteiro: limita as operações para manter o tempo viável
+                operacoes = args.operacoes if nome == "sqlite" else min(args.operacoes, 20)
+                latencias = medir(armazenamento, quantidade, operacoes)
+                p95 = statistics.quantiles(latencias, n=20)[-1]
+                print(f"{nome:<8} {quantidade:>10} {statistics.median(latencias):>14.1f} {p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
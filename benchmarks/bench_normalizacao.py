@@ -0,0 +1,70 @@
+"""Vazão da extração de CPF, data e valor: regex compiladas por chamada x normalizacao.py
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_normalizacao --mensagens 100000
+"""
+import argparse
+import random
+import re
+import time
+
+from normalizacao import _TAMANHO_CACHE, extrair_cpf, extrair_data, extrair_valor
+
+MODELOS = (
+    "{cpf}", "meu cpf é {cpf}", "{dia:02d}/{mes:02d}/{ano}", "nasci em {ano}-{mes:02d}-{dia:02d}",
+    "quero aumentar meu limite para {valor}", "R$ {valor}", "minha renda é {valor} reais",
+)
+
+
+def gerar_mensagens(quantidade: int, distintas: int):
+    """Mensagens típicas de um turno; `distintas` controla a repetição (acerto de cache)"""
+    base = [
+        random.choice(MODELOS).format(
+            cpf=f"{random.randrange(10**11):011d}", dia=random.randint(1, 28), mes=random.randint(1, 12),
+            ano=random.randint(1940, 2005), valor=f"{random.randint(1, 50)}.{random.randint(0, 999):03d},00"
+        )
+        for _ in range(distintas)
+    ]
+    return [random.choice(base) for _ in range(quantidade)]
+
+
+def extrair_anterior(mensagem: str):
+    """Comportamento anterior de agents.py: `import re` e padrões montados a cada chamada"""
+    import re
+    cpf = re.sub(r'\D', '', mensagem)
+    cpf = cpf if len(cpf) == 11 else None
+    data = re.search(r'(\d{2})[/-](\d{2})[/-](\d{4})', mensagem) or re.search(r'(\d{4})[/-](\d{2})[/-](\d{2})', mensagem)
+    valor = re.search(r'(\d+\.?\d*)', mensagem.replace(',', '.'))
+    return cpf, data, float(valor.group(1)) if valor else None
+
+
+def extrair_atual(mensagem: str):
+    return extrair_cpf(mensagem, validar=True), extrair_data(mensagem), extrair_valor(mensagem)
+
+
+def medir(funcao, mensagens) -> float:
+    """Retorna mensagens por segundo"""
+    inicio = time.perf_counter()
+    for mensagem in mensagens:
+        funcao(mensagem)
+    return len(mensagens) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mensagens", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'cenário':<24} {'anterior (msg/s)':>17} {'atual (msg/s)':>14}")
+    for nome, distintas in (("mensagens repetidas", _TAMANHO_CACHE // 4),
+                            ("mensagens distintas", args.mensagens)):
+        mensagens = gerar_mensagens(args.mensagens, distintas)
+        re.purge()
+        extrair_data.cache_clear()
+        extrair_valor.cache_clear()
+        anterior, atual = medir(extrair_anterior, mensagens), medir(extrair_atual, mensagens)
+        print(f"{nome:<24} {anterior:>17,.0f} {atual:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Replay de conversas roteirizadas: latência por turno, turnos/s e pico de memória
+
+Cada linha de benchmarks/conversas.jsonl é {"nome": ..., "mensagens": [...]};
+a primeira mensagem vazia é a saudação. LLM e Tavily são substituídos por
+clientes falsos determinísticos (clientes_falsos.py) com latência injetada.
+Os dados de clientes são copiados para um diretório temporário, então a base
+do projeto não é alterada.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_replay --sessoes 200 --concorrencia 20 --latencia-llm 0.05
+    python -m benchmarks.bench_replay --modo async --saida resultado.json
+    python -m benchmarks.bench_replay --referencia base.json --tolerancia 0.2
+
+Para ver o efeito dos prazos e do disjuntor (resiliencia.py) num incidente do provedor:
+    BANCO_AGIL_PRAZO_LLM=0.5 python -m benchmarks.bench_replay --taxa-lentidao 0.1 --latencia-lenta 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Chaves fictícias: os clientes reais não são usados
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVOS_DADOS = ("clientes.csv", "score_limite.csv")
+
+
+def carregar_conversas(caminho: str) -> List[dict]:
+    with open(caminho, encoding="utf-8") as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil pelo método do vizinho mais próximo (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def pico_rss_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+
+
+class Coletor:
+    """Latências por estado do agente no início do turno"""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def registrar(self, agente: str, segundos: float):
+        with self._lock:
+            self.latencias[agente].append(segundos)
+
+    def resumo(self) -> Dict[str, dict]:
+        resultado = {}
+        todas = []
+        for agente, valores in sorted(self.latencias.items()):
+            valores = sorted(valores)
+            todas.extend(valores)
+            resultado[agente] = self._estatisticas(valores)
+        resultado["total"] = self._estatisticas(sorted(todas))
+        return resultado
+
+    @staticmethod
+    def _estatisticas(valores: List[float]) -> dict:
+        return {
+            "turnos": len(valores),
+            "p50_ms": percentil(valores, 50) * 1000,
+            "p95_ms": percentil(valores, 95) * 1000,
+            "p99_ms": percentil(valores, 99) * 1000,
+        }
+
+
+def executar_sync(criar_sistema, conversas, sessoes: int, concorrencia: int, coletor: Coletor):
+    def conversar(indice: int):
+        sistema = criar_sistema()
+        for mensagem in conversas[indice % len(conversas)]["mensagens"]:
+            if sistema.conversa_encerrada:
+                break
+            agente = sistema.agente_atual
+            inicio = time.perf_counter()
+            sistema.processar_mensagem(mensagem)
+            coletor.registrar(agente, time.perf_counter() - inicio)
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(conversar, range(sessoes)))
+
+
+async def executar_async(criar_sistema, conversas, sessoes: int, concorrencia: int, coletor: Coletor):
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def conversar(indice: int):
+        async with limite:
+            sistema = criar_sistema()
+            for mensagem in conversas[indice % len(conversas)]["mensagens"]:
+                if sistema.conversa_encerrada:
+                    break
+                agente = sistema.agente_atual
+                inicio = time.perf_counter()
+                await sistema.processar_mensagem_async(mensagem)
+                coletor.registrar(agente, time.perf_counter() - inicio)
+
+    await asyncio.gather(*(conversar(i) for i in range(sessoes)))
+
+
+def comparar(resultado: dict, referencia: dict, tolerancia: float) -> List[str]:
+    """Lista as regressões de p95 por estado e de turnos/s acima da tolerância"""
+    regressoes = []
+    for agente, atual in resultado["latencias"].items():
+        base = referencia["latencias"].get(agente)
+        if base and base["p95_ms"] and atual["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{agente}: p95 {base['p95_ms']:.2f} -> {atual['p95_ms']:.2f} ms")
+    if resultado["turnos_por_segundo"] < referencia["turnos_por_segundo"] * (1 - tolerancia):
+        regressoes.append(
+            f"turnos/s {referencia['turnos_por_segundo']:.1f} -> {resultado['turnos_por_segundo']:.1f}"
+        )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversas", default=os.path.join(RAIZ, "benchmarks", "conversas.jsonl"))
+    parser.add_argument("--sessoes", type=int, default=120, help="total de conversas reproduzidas")
+    parser.add_argument("--concorrencia", type=int, default=10, help="sessões simultâneas")
+    parser.add_argument("--modo", choices=["sync", "async"], default="sync")
+    parser.add_argument("--latencia-llm", type=float, default=0.0, help="segundos por chamada ao LLM")
+    parser.add_argument("--latencia-busca", type=float, default=0.0, help="segundos por busca na web")
+    parser.add_argument("--taxa-lentidao", type=float, default=0.0,
+                        help="fração das chamadas externas que levam --latencia-lenta")
+    parser.add_argument("--latencia-lenta", type=float, default=0.0, help="segundos das chamadas lentas")
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--referencia", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="regressão aceita (fração)")
+    args = parser.parse_args()
+
+    conversas = carregar_conversas(args.conversas)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        for nome in ARQUIVOS_DADOS:
+            shutil.copy(os.path.join(RAIZ, nome), diretorio)
+        diretorio_original = os.getcwd()
+        os.chdir(diretorio)
+        try:
+            from agents import BancoAgilSystem
+            from clientes_falsos import BuscaFalsa, LLMFalso
+            from infraestrutura import Infraestrutura
+
+            infraestrutura = Infraestrutura(
+                llm=LLMFalso(latencia=args.latencia_llm, semente=42, taxa_lentidao=args.taxa_lentidao,
+                             latencia_lenta=args.latencia_lenta),
+                tavily_client=BuscaFalsa(latencia=args.latencia_busca, semente=42, taxa_lentidao=args.taxa_lentidao,
+                                         latencia_lenta=args.latencia_lenta)
+            )
+            infraestrutura.cache_cotacoes.limpar()
+            infraestrutura.cache_classificacao.limpar()
+            criar_sistema = lambda: BancoAgilSystem(infraestrutura)
+
+            coletor = Coletor()
+            inicio = time.perf_counter()
+            if args.modo == "async":
+                asyncio.run(executar_async(criar_sistema, conversas, args.sessoes, args.concorrencia, coletor))
+            else:
+                executar_sync(criar_sistema, conversas, args.sessoes, args.concorrencia, coletor)
+            duracao = time.perf_counter() - inicio
+            infraestrutura.registro_solicitacoes.flush()
+        finally:
+            os.chdir(diretorio_original)
+
+    latencias = coletor.resumo()
+    resultado = {
+        "parametros": {
+            "modo": args.modo,
+            "sessoes": args.sessoes,
+            "concorrencia": args.concorrencia,
+            "latencia_llm": args.latencia_llm,
+            "latencia_busca": args.latencia_busca,
+            "taxa_lentidao": args.taxa_lentidao,
+            "latencia_lenta": args.latencia_lenta,
+            "conversas": [c["nome"] for c in conversas],
+        },
+        "duracao_s": duracao,
+        "turnos_por_segundo": latencias["total"]["turnos"] / duracao,
+        "pico_rss_mb": pico_rss_mb(),
+        "chamadas_llm": infraestrutura.llm.chamadas,
+        "chamadas_busca": infraestrutura.tavily_client.chamadas,
+        "latencias": latencias,
+    }
+
+    print(f"{'estado':<12} {'turnos':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for agente, estatisticas in latencias.items():
+        print(f"{agente:<12} {estatisticas['turnos']:>8} {estatisticas['p50_ms']:>10.2f} "
+              f"{estatisticas['p95_ms']:>10.2f} {estatisticas['p99_ms']:>10.2f}")
+    print(f"\nturnos/s: {resultado['turnos_por_segundo']:.1f}   "
+          f"pico RSS: {resultado['pico_rss_mb']:.1f} MB   "
+          f"chamadas LLM: {resultado['chamadas_llm']}   buscas: {resultado['chamadas_busca']}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+    if args.referencia:
+        with open(args.referencia, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        if regressoes:
+            print("\nRegressões em relação à referência:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
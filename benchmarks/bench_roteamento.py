@@ -0,0 +1,65 @@
+"""Custo de roteamento por mensagem: varreduras lineares x casador único do roteador
+
+Compara, para as mensagens das conversas gravadas, as buscas `any(palavra in
+mensagem.lower() ...)` feitas antes por categoria com a varredura única de
+roteador.CasadorPalavras (sem e com o cache de mensagens repetidas).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_roteamento --repeticoes 200
+"""
+import argparse
+import json
+import os
+import time
+
+from roteador import PALAVRAS_CHAVE, CasadorPalavras
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def carregar_mensagens(caminho: str):
+    mensagens = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                mensagens.extend(json.loads(linha).get("mensagens", []))
+    return mensagens
+
+
+def varreduras_lineares(mensagem: str):
+    """Comportamento anterior: uma varredura (e um lower()) por categoria consultada"""
+    return frozenset(
+        categoria for categoria, palavras in PALAVRAS_CHAVE.items()
+        if any(palavra in mensagem.lower() for palavra in palavras)
+    )
+
+
+def medir(funcao, mensagens, repeticoes: int) -> float:
+    """Retorna o tempo médio por mensagem em µs"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for mensagem in mensagens:
+            funcao(mensagem)
+    return (time.perf_counter() - inicio) * 1e6 / (repeticoes * len(mensagens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversas", default=os.path.join(RAIZ, "benchmarks", "conversas.jsonl"))
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    mensagens = carregar_mensagens(args.conversas)
+    casador = CasadorPalavras(PALAVRAS_CHAVE)
+    sem_cache = CasadorPalavras(PALAVRAS_CHAVE, tamanho_cache=0)
+
+    print(f"{len(mensagens)} mensagens, {sum(map(len, PALAVRAS_CHAVE.values()))} palavras-chave")
+    print(f"{'estratégia':<20} {'µs/mensagem':>12}")
+    for nome, funcao in (("lineares", varreduras_lineares),
+                         ("casador", sem_cache.categorias),
+                         ("casador + cache", casador.categorias)):
+        print(f"{nome:<20} {medir(funcao, mensagens, args.repeticoes):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Sessões criadas por segundo e memória por sessão: clientes por sessão x compartilhados
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_sessoes --sessoes 2000
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+# Chaves fictícias: a criação dos clientes não faz chamadas de rede
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from tavily import TavilyClient
+
+from agents import BancoAgilSystem
+from infraestrutura import Infraestrutura, obter_infraestrutura
+from sessao import EstadoSessao, serializar
+
+
+def criar_por_sessao() -> BancoAgilSystem:
+    """Comportamento anterior: cada sessão constrói seus próprios clientes"""
+    return BancoAgilSystem(Infraestrutura(
+        llm=ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            google_api_key=os.getenv("GEMINI_API_KEY"),
+            temperature=0.3
+        ),
+        tavily_client=TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    ))
+
+
+def criar_compartilhado() -> BancoAgilSystem:
+    return BancoAgilSystem()
+
+
+def medir(criar, sessoes: int):
+    """Retorna (sessões/s, bytes por sessão) mantendo todas as sessões vivas"""
+    criar()  # aquece caches e singletons
+    gc.collect()
+
+    inicio = time.perf_counter()
+    for _ in range(sessoes):
+        criar()
+    por_segundo = sessoes / (time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    vivas = [criar() for _ in range(sessoes)]
+    por_sessao = (tracemalloc.get_traced_memory()[0] - base) / len(vivas)
+    tracemalloc.stop()
+    return por_segundo, por_sessao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    obter_infraestrutura()
+    print(f"{'modo':<14} {'sessões/s':>12} {'bytes/sessão':>14}")
+    for nome, criar in [("por_sessao", criar_por_sessao), ("compartilhado", criar_compartilhado)]:
+        por_segundo, por_sessao = medir(criar, args.sessoes)
+        print(f"{nome:<14} {por_segundo:>12.0f} {por_sessao:>14.0f}")
+    print(f"\nsessão ociosa serializada: {len(serializar(EstadoSessao()))} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Inicialização a frio: CSV via pandas x snapshot binário mapeado em memória
+
+Mede o tempo até a primeira busca de cliente (abrir + buscar) e a latência
+das buscas seguintes em cada backend.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_snapshot --tamanhos 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from armazenamento import ArmazenamentoCSV
+from benchmarks.bench_atualizacao import gerar_clientes
+from snapshot_clientes import ArmazenamentoSnapshot, converter
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(criar, quantidade: int, buscas: int):
+    """Retorna (ms até a primeira busca, mediana das buscas seguintes em µs)"""
+    inicio = time.perf_counter()
+    armazenamento = criar()
+    armazenamento.buscar(f"{random.randint(1, quantidade):011d}")
+    partida = (time.perf_counter() - inicio) * 1000
+
+    latencias = []
+    for _ in range(buscas):
+        cpf = f"{random.randint(1, quantidade):011d}"
+        inicio = time.perf_counter()
+        armazenamento.buscar(cpf)
+        latencias.append((time.perf_counter() - inicio) * 1e6)
+    return partida, statistics.median(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--buscas", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'backend':<9} {'clientes':>10} {'partida (ms)':>13} {'busca (µs)':>11}")
+    for quantidade in args.tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_csv = os.path.join(diretorio, "clientes.csv")
+            caminho_snapshot = os.path.join(diretorio, "clientes.snap")
+            gerar_clientes(caminho_csv, quantidade)
+            converter(caminho_csv, os.path.join(RAIZ, "score_limite.csv"), caminho_snapshot)
+
+            for nome, criar in (("csv", lambda: ArmazenamentoCSV(caminho_csv)),
+                                ("snapshot", lambda: ArmazenamentoSnapshot(caminho_snapshot))):
+                partida, busca = medir(criar, quantidade, args.buscas)
+                print(f"{nome:<9} {quantidade:>10} {partida:>13.1f} {busca:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Cache das respostas do LLM aos prompts de classificação (negativa e intenção)
+
+A chave é (prompt, contexto da pergunta, mensagem normalizada): "Não, obrigado!"
+e "nao obrigado" caem na mesma entrada. Opcionalmente, uma mensagem sem
+entrada exata reaproveita a resposta de uma mensagem parecida, medida pela
+similaridade de cosseno dos trigramas de caracteres, desde que ambas tenham
+(ou não tenham) negação. As entradas ficam em memória com limite LRU e, com
+um caminho de banco, também em SQLite, sobrevivendo a reinícios.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from classificador import contem_negacao, normalizar
+from metricas import metricas
+
+METRICA_CACHE = "cache_classificacao_total"
+
+# (prompt, contexto, mensagem normalizada)
+Chave = Tuple[str, str, str]
+
+_PONTUACAO = re.compile(r"[^\w ]+")
+
+
+def normalizar_mensagem(mensagem: str) -> str:
+    """Sem acentos, maiúsculas, pontuação e espaços repetidos"""
+    return " ".join(_PONTUACAO.sub(" ", normalizar(mensagem)).split())
+
+
+def trigramas(texto: str) -> FrozenSet[str]:
+    """Trigramas de caracteres do texto normalizado, com bordas marcadas"""
+    texto = f" {texto} "
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+class CacheClassificacao:
+    """Cache LRU de respostas por chave exata, com busca por similaridade opcional"""
+
+    def __init__(self, capacidade: int = 10_000, similaridade: float = 0.0, caminho: Optional[str] = None):
+        """
+        similaridade: cosseno mínimo entre trigramas para reaproveitar a resposta de
+            outra mensagem (0 desliga; valores baixos trocam acerto por risco de erro)
+        caminho: arquivo SQLite para persistir as entradas (None: só memória)
+        """
+        self.capacidade = capacidade
+        self.similaridade = similaridade
+        self.caminho = caminho
+        self._entradas: "OrderedDict[Chave, str]" = OrderedDict()
+        # Índice invertido (prompt, contexto, trigrama) -> chaves, usado na busca por similaridade
+        self._indice: Dict[Tuple[str, str, str], Set[Chave]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if caminho:
+            with self._conexao() as conexao:
+                conexao.execute("""
+                    CREATE TABLE IF NOT EXISTS cache_classificacao (
+                        prompt TEXT NOT NULL,
+                        contexto TEXT NOT NULL,
+                        mensagem TEXT NOT NULL,
+                        resposta TEXT NOT NULL,
+                        usado_em REAL NOT NULL,
+                        PRIMARY KEY (prompt, contexto, mensagem)
+                    )
+                """)
+                linhas = conexao.execute(
+                    "SELECT prompt, contexto, mensagem, resposta FROM cache_classificacao "
+                    "ORDER BY usado_em DESC LIMIT ?", (capacidade,)
+                ).fetchall()
+            # Mais recentes por último, como no LRU em memória
+            for prompt, contexto, mensagem, resposta in reversed(linhas):
+                self._inserir((prompt, contexto, mensagem), resposta)
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão própria de cada thread"""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def _inserir(self, chave: Chave, resposta: str) -> Optional[Chave]:
+        """Insere em memória (com o lock); retorna a chave descartada pelo LRU, se houver"""
+        if chave not in self._entradas and self.similaridade:
+            for trigrama in trigramas(chave[2]):
+                self._indice[(chave[0], chave[1], trigrama)].add(chave)
+        self._entradas[chave] = resposta
+        self._entradas.move_to_end(chave)
+        if len(self._entradas) <= self.capacidade:
+            return None
+        descartada, _ = self._entradas.popitem(last=False)
+        if self.similaridade:
+            for trigrama in trigramas(descartada[2]):
+                chaves = self._indice.get((descartada[0], descartada[1], trigrama))
+                if chaves is not None:
+                    chaves.discard(descartada)
+                    if not chaves:
+                        del self._indice[(descartada[0], descartada[1], trigrama)]
+        return descartada
+
+    def _mais_parecida(self, prompt: str, contexto: str, mensagem: str) -> Optional[Chave]:
+        """Entrada com maior cosseno de trigramas acima do limiar, com a mesma polaridade"""
+        consulta = trigramas(mensagem)
+        comuns: Dict[Chave, int] = defaultdict(int)
+        for trigrama in consulta:
+            for chave in self._indice.get((prompt, contexto, trigrama), ()):
+                comuns[chave] += 1
+
+        negacao = contem_negacao(mensagem)
+        melhor, melhor_similaridade = None, self.similaridade
+        for chave, quantidade in comuns.items():
+            similaridade = quantidade / math.sqrt(len(consulta) * len(trigramas(chave[2])))
+            if similaridade >= melhor_similaridade and contem_negacao(chave[2]) == negacao:
+                melhor, melhor_similaridade = chave, similaridade
+        return melhor
+
+    def obter(self, prompt: str, contexto: str, mensagem: str) -> Optional[str]:
+        """Resposta em cache para a mensagem (exata ou, se ativado, parecida) ou None"""
+        chave = (prompt, contexto, normalizar_mensagem(mensagem))
+        resultado = "falta"
+        with self._lock:
+            resposta = self._entradas.get(chave)
+            if resposta is not None:
+                resultado = "exato"
+            elif self.similaridade:
+                parecida = self._mais_parecida(*chave)
+                if parecida is not None:
+                    chave, resposta, resultado = parecida, self._entradas[parecida], "similar"
+            if resposta is not None:
+                self._entradas.move_to_end(chave)
+        metricas.incrementar(METRICA_CACHE, prompt=prompt, resultado=resultado)
+        return resposta
+
+    def definir(self, prompt: str, contexto: str, mensagem: str, resposta: str):
+        chave = (prompt, contexto, normalizar_mensagem(mensagem))
+        with self._lock:
+            descartada = self._inserir(chave, resposta)
+        if self.caminho:
+            with self._conexao() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO cache_classificacao (prompt, contexto, mensagem, resposta, usado_em) "
+                    "VALUES (?, ?, ?, ?, ?)", (*chave, resposta, time.time())
+                )
+                if descartada is not None:
+                    conexao.execute(
+                        "DELETE FROM cache_classificacao WHERE prompt = ? AND contexto = ? AND mensagem = ?",
+                        descartada
+                    )
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._indice.clear()
+        if self.caminho:
+            with self._conexao() as conexao:
+                conexao.execute("DELETE FROM cache_classificacao")
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def taxa_acerto() -> Dict[str, float]:
+    """Fração das consultas atendidas pelo cache (exato + similar), por prompt"""
+    totais: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for rotulos, valor in metricas.contadores(METRICA_CACHE).items():
+        rotulos = dict(rotulos)
+        totais[rotulos["prompt"]][rotulos["resultado"]] = valor
+    return {
+        prompt: (resultados.get("exato", 0) + resultados.get("similar", 0)) / sum(resultados.values())
+        for prompt, resultados in totais.items()
+    }
+
+
+_cache: Optional[CacheClassificacao] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_classificacao() -> CacheClassificacao:
+    """Retorna o cache compartilhado pelo processo
+
+    Configurável por BANCO_AGIL_CACHE_LLM_DB (arquivo SQLite; sem ela, só memória),
+    BANCO_AGIL_CACHE_LLM_MAX (entradas) e BANCO_AGIL_CACHE_LLM_SIMILARIDADE
+    (cosseno mínimo para mensagens parecidas; 0 desliga).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheClassificacao(
+                capacidade=int(os.getenv("BANCO_AGIL_CACHE_LLM_MAX", "10000")),
+                similaridade=float(os.getenv("BANCO_AGIL_CACHE_LLM_SIMILARIDADE", "0")),
+                caminho=os.getenv("BANCO_AGIL_CACHE_LLM_DB")
+            )
+        return _cache
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generator, Optional, Tuple
+
+from metricas import metricas
+
+METRICA_CACHE = "cache_cotacoes_total"
+
+
+class _Entrada:
+    __slots__ = ("valor", "criado_em")
+
+    def __init__(self, valor: str, criado_em: float):
+        self.valor = valor
+        self.criado_em = criado_em
+
+
+class _Voo:
+    """Busca em andamento de uma moeda, compartilhada pelas requisições concorrentes"""
+    __slots__ = ("evento", "valor", "erro")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class CacheCotacoes:
+    """Cache de cotações por moeda com TTL, limite LRU e coalescência de buscas
+
+    Falhas concorrentes para a mesma moeda compartilham uma única busca (tanto
+    entre threads, em obter, quanto entre tarefas asyncio, em obter_async). Com
+    servir_expirado=True (stale-while-revalidate), uma cotação vencida é
+    devolvida imediatamente enquanto a atualização roda em segundo plano.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        tamanho_maximo: int = 32,
+        servir_expirado: bool = False,
+        relogio: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self.servir_expirado = servir_expirado
+        self._relogio = relogio
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._em_voo: Dict[str, _Voo] = {}
+        self._em_voo_async: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, moeda: str, carregar: Callable[[], str]) -> str:
+        """Retorna a cotação da moeda, chamando carregar() apenas quando necessário"""
+        with self._lock:
+            entrada = self._entradas.get(moeda)
+            if entrada is not None:
+                self._entradas.move_to_end(moeda)
+                if self._relogio() - entrada.criado_em < self.ttl:
+                    metricas.incrementar(METRICA_CACHE, resultado="hit")
+                    return entrada.valor
+
+                if self.servir_expirado:
+                    metricas.incrementar(METRICA_CACHE, resultado="expirado")
+                    if moeda not in self._em_voo:
+                        voo = self._em_voo[moeda] = _Voo()
+                        threading.Thread(
+                            target=self._executar_voo, args=(moeda, voo, carregar), daemon=True
+                        ).start()
+                    return entrada.valor
+
+            voo = self._em_voo.get(moeda)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[moeda] = _Voo()
+            metricas.incrementar(METRICA_CACHE, resultado="miss" if lider else "coalescido")
+
+        if lider:
+            self._executar_voo(moeda, voo, carregar)
+
+        voo.evento.wait()
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.valor
+
+    def _executar_voo(self, moeda: str, voo: _Voo, carregar: Callable[[], str]):
+        """Executa a busca e publica o resultado para todas as requisições em espera"""
+        try:
+            voo.valor = carregar()
+            self.definir(moeda, voo.valor)
+        except Exception as e:
+            voo.erro = e
+        finally:
+            with self._lock:
+                self._em_voo.pop(moeda, None)
+            voo.evento.set()
+
+    def obter_transmitindo(
+        self, moeda: str, carregar: Callable[[], Generator[Any, None, str]]
+    ) -> Generator[Any, None, str]:
+        """Versão de obter para buscas em streaming: carregar() é um gerador cujo valor
+        de retorno é a cotação
+
+        Quem dispara a busca repassa os trechos gerados; as requisições coalescidas
+        esperam só o valor final. Uma cotação vencida é sempre buscada de novo (com
+        servir_expirado, o chamador usa obter enquanto disponivel() for True).
+        """
+        with self._lock:
+            entrada = self._entradas.get(moeda)
+            if entrada is not None and self._relogio() - entrada.criado_em < self.ttl:
+                self._entradas.move_to_end(moeda)
+                metricas.incrementar(METRICA_CACHE, resultado="hit")
+                return entrada.valor
+
+            voo = self._em_voo.get(moeda)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[moeda] = _Voo()
+            metricas.incrementar(METRICA_CACHE, resultado="miss" if lider else "coalescido")
+
+        if lider:
+            try:
+                voo.valor = yield from carregar()
+                self.definir(moeda, voo.valor)
+            except Exception as e:
+                voo.erro = e
+                raise
+            except BaseException:
+                # Stream abandonado pelo consumidor: quem esperava não recebe um valor parcial
+                voo.erro = ConnectionAbortedError(f"Busca da cotação de {moeda} interrompida")
+                raise
+            finally:
+                with self._lock:
+                    self._em_voo.pop(moeda, None)
+                voo.evento.set()
+            return voo.valor
+
+        voo.evento.wait()
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.valor
+
+    async def obter_async(self, moeda: str, carregar: Callable[[], Awaitable[str]]) -> str:
+        """Versão assíncrona de obter: carregar() é uma corrotina"""
+        laco = asyncio.get_running_loop()
+        chave = (laco, moeda)
+
+        with self._lock:
+            entrada = self._entradas.get(moeda)
+            if entrada is not None:
+                self._entradas.move_to_end(moeda)
+                if self._relogio() - entrada.criado_em < self.ttl:
+                    metricas.incrementar(METRICA_CACHE, resultado="hit")
+                    return entrada.valor
+
+                if self.servir_expirado:
+                    metricas.incrementar(METRICA_CACHE, resultado="expirado")
+                    if chave not in self._em_voo_async:
+                        tarefa = laco.create_task(self._carregar_async(chave, carregar))
+                        # Ninguém aguarda a atualização em segundo plano: consome eventual erro
+                        tarefa.add_done_callback(lambda t: t.cancelled() or t.exception())
+                        self._em_voo_async[chave] = tarefa
+                    return entrada.valor
+
+            tarefa = self._em_voo_async.get(chave)
+            lider = tarefa is None
+            if lider:
+                tarefa = self._em_voo_async[chave] = laco.create_task(self._carregar_async(chave, carregar))
+            metricas.incrementar(METRICA_CACHE, resultado="miss" if lider else "coalescido")
+
+        # shield: o cancelamento de quem espera não cancela a busca compartilhada
+        return await asyncio.shield(tarefa)
+
+    async def _carregar_async(self, chave, carregar: Callable[[], Awaitable[str]]) -> str:
+        try:
+            valor = await carregar()
+            self.definir(chave[1], valor)
+            return valor
+        finally:
+            with self._lock:
+                self._em_voo_async.pop(chave, None)
+
+    def definir(self, moeda: str, valor: str):
+        """Armazena uma cotação, descartando a menos usada se o cache estiver cheio"""
+        with self._lock:
+            self._entradas[moeda] = _Entrada(valor, self._relogio())
+            self._entradas.move_to_end(moeda)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+    def disponivel(self, moeda: str) -> bool:
+        """True se obter() responderia sem esperar uma busca (válida ou servível expirada)"""
+        idade = self.idade(moeda)
+        return idade is not None and (idade < self.ttl or self.servir_expirado)
+
+    def idade(self, moeda: str) -> Optional[float]:
+        """Segundos desde a última atualização da moeda (None se nunca carregada)"""
+        with self._lock:
+            entrada = self._entradas.get(moeda)
+            return None if entrada is None else self._relogio() - entrada.criado_em
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+_cache: Optional[CacheCotacoes] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_cotacoes() -> CacheCotacoes:
+    """Retorna o cache compartilhado pelo processo
+
+    Configurável por BANCO_AGIL_COTACAO_TTL (segundos), BANCO_AGIL_COTACAO_MAX
+    (entradas) e BANCO_AGIL_COTACAO_SWR=1 (servir cotação expirada).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheCotacoes(
+                ttl=float(os.getenv("BANCO_AGIL_COTACAO_TTL", "60")),
+                tamanho_maximo=int(os.getenv("BANCO_AGIL_COTACAO_MAX", "32")),
+                servir_expirado=os.getenv("BANCO_AGIL_COTACAO_SWR") == "1"
+            )
+        return _cache
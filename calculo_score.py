@@ -0,0 +1,145 @@
+"""Fórmula de score da entrevista de crédito: escalar (chat) e vetorizada (lote)
+
+A versão vetorizada reproduz a escalar linha a linha: mesma ordem das
+operações em float64, truncamento em direção a zero (int()) e limite 0-1000.
+
+Uso em lote (re-score noturno):
+    python calculo_score.py --entrada entrevistas.csv
+    python calculo_score.py --entrada entrevistas.csv --simular --saida novos_scores.csv
+
+O arquivo de entrada tem as colunas cpf, renda_mensal, tipo_emprego,
+despesas_fixas, dependentes (0, 1, 2 ou 3+) e dividas (sim/não).
+"""
+import argparse
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+PESO_RENDA = 30
+PESO_EMPREGO = {
+    "formal": 300,
+    "autônomo": 200,
+    "desempregado": 0
+}
+PESO_DEPENDENTES = {
+    "0": 100,
+    "1": 80,
+    "2": 60,
+    "3+": 30
+}
+PESO_DIVIDAS = {
+    "sim": -100,
+    "não": 100
+}
+SCORE_MINIMO, SCORE_MAXIMO = 0, 1000
+
+COLUNAS_ENTREVISTA = ["cpf", "renda_mensal", "tipo_emprego", "despesas_fixas", "dependentes", "dividas"]
+
+# Grafias aceitas nos arquivos de lote, além das usadas pelo chat
+_SINONIMOS = {"autonomo": "autônomo", "nao": "não"}
+
+
+def calcular_score(renda_mensal: float, tipo_emprego: str, despesas_fixas: float,
+                   dependentes: Any, dividas: str) -> int:
+    """Score de uma entrevista (0 a 1000), como calculado no chat"""
+    score = (
+        (renda_mensal / (despesas_fixas + 1)) * PESO_RENDA +
+        PESO_EMPREGO[tipo_emprego] +
+        PESO_DEPENDENTES[str(dependentes)] +
+        PESO_DIVIDAS[dividas]
+    )
+    return max(SCORE_MINIMO, min(SCORE_MAXIMO, int(score)))
+
+
+def _normalizar_categoria(coluna: pd.Series) -> pd.Series:
+    texto = coluna.astype(str).str.strip().str.lower()
+    return texto.replace(_SINONIMOS)
+
+
+def calcular_scores(entrevistas: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Versão vetorizada de calcular_score para um bloco de entrevistas
+
+    Retorna (scores int64, máscara de linhas válidas). Linhas com renda ou
+    despesas ausentes/negativas ou categorias desconhecidas são inválidas e
+    têm score 0 no array (devem ser filtradas pela máscara).
+    """
+    renda = pd.to_numeric(entrevistas["renda_mensal"], errors="coerce").to_numpy(dtype=np.float64)
+    despesas = pd.to_numeric(entrevistas["despesas_fixas"], errors="coerce").to_numpy(dtype=np.float64)
+    emprego = _normalizar_categoria(entrevistas["tipo_emprego"]).map(PESO_EMPREGO).to_numpy(dtype=np.float64)
+    dependentes = _normalizar_categoria(entrevistas["dependentes"]).map(PESO_DEPENDENTES).to_numpy(dtype=np.float64)
+    dividas = _normalizar_categoria(entrevistas["dividas"]).map(PESO_DIVIDAS).to_numpy(dtype=np.float64)
+
+    validas = (
+        (renda >= 0) & (despesas >= 0) &
+        ~np.isnan(emprego) & ~np.isnan(dependentes) & ~np.isnan(dividas)
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (renda / (despesas + 1)) * PESO_RENDA + emprego + dependentes + dividas
+    score = np.where(validas, score, 0.0)
+    scores = np.clip(np.trunc(score), SCORE_MINIMO, SCORE_MAXIMO).astype(np.int64)
+    return scores, validas
+
+
+def ler_entrevistas(caminho: str, tamanho_bloco: int = 500_000) -> Iterator[pd.DataFrame]:
+    """Lê o arquivo de entrevistas em blocos"""
+    return pd.read_csv(
+        caminho,
+        usecols=COLUNAS_ENTREVISTA,
+        dtype={"cpf": str, "tipo_emprego": str, "dependentes": str, "dividas": str},
+        chunksize=tamanho_bloco
+    )
+
+
+def recalcular_blocos(caminho: str, tamanho_bloco: int = 500_000) -> Iterator[Tuple[Dict[str, int], int]]:
+    """Calcula os novos scores bloco a bloco
+
+    Para cada bloco, retorna ({cpf: score} das linhas válidas, quantidade de
+    linhas inválidas). Quem consome grava cada bloco antes de pedir o próximo,
+    então a memória fica limitada a um bloco. Se um CPF aparecer mais de uma
+    vez, vale a última linha: no mesmo bloco pelo dicionário, entre blocos pela
+    ordem de gravação.
+    """
+    for bloco in ler_entrevistas(caminho, tamanho_bloco):
+        valores, validas = calcular_scores(bloco)
+        scores = dict(zip(bloco["cpf"].to_numpy()[validas], valores[validas].tolist()))
+        yield scores, int((~validas).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula em lote o score dos clientes a partir de entrevistas")
+    parser.add_argument("--entrada", required=True, help="CSV com os atributos das entrevistas")
+    parser.add_argument("--clientes", default="clientes.csv",
+                        help="base de clientes (ignorado se BANCO_AGIL_DB estiver definida)")
+    parser.add_argument("--tamanho-bloco", type=int, default=500_000)
+    parser.add_argument("--simular", action="store_true", help="calcula sem gravar na base")
+    parser.add_argument("--saida", help="grava também os novos scores (cpf,score) neste CSV")
+    args = parser.parse_args()
+
+    repositorio = None
+    if not args.simular:
+        from repositorio_clientes import obter_repositorio_clientes
+        repositorio = obter_repositorio_clientes(args.clientes)
+
+    inicio = time.perf_counter()
+    calculados = invalidas = atualizados = 0
+    for i, (scores, invalidas_bloco) in enumerate(recalcular_blocos(args.entrada, args.tamanho_bloco)):
+        calculados += len(scores)
+        invalidas += invalidas_bloco
+        if args.saida:
+            pd.DataFrame({"cpf": list(scores), "score": list(scores.values())}).to_csv(
+                args.saida, mode="w" if i == 0 else "a", header=i == 0, index=False
+            )
+        if repositorio is not None:
+            atualizados += repositorio.atualizar_scores(scores)
+
+    print(f"{calculados} scores calculados ({invalidas} linhas inválidas) "
+          f"em {time.perf_counter() - inicio:.1f}s")
+    if repositorio is not None:
+        print(f"{atualizados} clientes atualizados ({calculados - atualizados} CPFs não encontrados)")
+
+
+if __name__ == "__main__":
+    main()
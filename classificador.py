@@ -0,0 +1,140 @@
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, NamedTuple, Optional
+
+from metricas import metricas
+
+METRICA_CAMADAS = "classificacao_turnos_total"
+INTENCOES = ("credito", "cambio", "outros")
+
+
+class Classificacao(NamedTuple):
+    """Resultado da classificação combinada de uma mensagem"""
+    intencao: str  # credito, cambio ou outros
+    negativa: bool
+    camada: str  # llm, cache ou fallback
+
+
+def normalizar(mensagem: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados"""
+    sem_acentos = unicodedata.normalize("NFKD", mensagem.lower())
+    sem_acentos = "".join(c for c in sem_acentos if not unicodedata.combining(c))
+    return " ".join(sem_acentos.split())
+
+
+# Respostas que, sozinhas, são claramente negativas
+_NEGATIVA_COMPLETA = re.compile(r"""
+    ^(?:
+        n | nao | nop | nope | nada | nenhum(?:a)?
+      | nao[ ,]+obrigad[oa]s?
+      | nao[ ,]+(?:quero|preciso|precisa)(?:[ ,]+obrigad[oa]s?)?
+      | agora[ ]+nao
+      | deixa[ ]+(?:pra|para)[ ]+depois
+      | (?:e[ ]+)?so[ ]+isso(?:[ ]+mesmo)?(?:[ ,]+obrigad[oa]s?)?
+      | ta[ ]+bom[ ]+assim
+      | (?:nao[ ,]+)?obrigad[oa]s?[ ,]+(?:e[ ]+)?so[ ]+isso
+    )[.!]*$
+""", re.VERBOSE)
+
+# Respostas que, sozinhas, são claramente afirmativas
+_AFIRMATIVA_COMPLETA = re.compile(
+    r"^(?:sim|s|claro|ok|okay|pode|pode ser|quero|vamos|aceito|bora|com certeza|"
+    r"sim(?:[ ,]+(?:quero|claro|pode|por favor|vamos|aceito))+)[.!]*$"
+)
+
+_NEGACAO = re.compile(r"\b(?:nao|nem|nunca|nada|nenhum|nenhuma|depois)\b")
+_PALAVRAS_CREDITO = re.compile(r"\b(?:limite|credito|aumento|aumentar|cartao|elevar)\b")
+_PALAVRAS_CAMBIO = re.compile(r"\b(?:cotacao|cambio|moedas?|dolar|dolares|euros?|libras?|pesos?|usd|eur|gbp)\b")
+_OBJETO_JSON = re.compile(r"\{.*?\}", re.DOTALL)
+
+
+def contem_negacao(texto: str) -> bool:
+    """True se o texto, já normalizado (ver normalizar), tem palavra de negação"""
+    return _NEGACAO.search(texto) is not None
+
+
+# Fallback usado quando o LLM falha
+_PALAVRAS_NEGATIVAS_FALLBACK = ["não", "nao", "nada", "agora não", "deixa", "só isso", "é só isso"]
+
+
+class ClassificadorRegras:
+    """Classificador local por regras: responde apenas os casos de alta confiança
+
+    Cada método devolve None quando a mensagem é ambígua e precisa do LLM.
+    """
+
+    def negativa(self, mensagem: str) -> Optional[bool]:
+        """True/False se a mensagem for claramente negativa/não negativa"""
+        texto = normalizar(mensagem)
+
+        if _NEGATIVA_COMPLETA.match(texto):
+            return True
+        if _AFIRMATIVA_COMPLETA.match(texto):
+            return False
+        # Pedido explícito de um serviço, sem nenhuma negação, não é negativa
+        if not _NEGACAO.search(texto) and (
+            _PALAVRAS_CREDITO.search(texto) or _PALAVRAS_CAMBIO.search(texto)
+        ):
+            return False
+        return None
+
+    def intencao(self, mensagem: str) -> Optional[str]:
+        """'credito' ou 'cambio' quando a mensagem menciona apenas um dos serviços"""
+        texto = normalizar(mensagem)
+        if _NEGACAO.search(texto):
+            return None
+
+        credito = _PALAVRAS_CREDITO.search(texto) is not None
+        cambio = _PALAVRAS_CAMBIO.search(texto) is not None
+        if credito and not cambio:
+            return "credito"
+        if cambio and not credito:
+            return "cambio"
+        return None
+
+
+def negativa_por_palavras(mensagem: str) -> bool:
+    """Heurística simples de negativa por palavras-chave (fallback do LLM)"""
+    return any(neg in mensagem.lower() for neg in _PALAVRAS_NEGATIVAS_FALLBACK)
+
+
+def classificacao_fallback(mensagem: str) -> Classificacao:
+    """Classificação por palavras-chave usada quando o LLM falha"""
+    return Classificacao("outros", negativa_por_palavras(mensagem), "fallback")
+
+
+def interpretar_classificacao(texto: str) -> Classificacao:
+    """Converte a resposta JSON do LLM em Classificacao; ValueError se inválida"""
+    match = _OBJETO_JSON.search(texto)
+    if not match:
+        raise ValueError(f"Resposta sem JSON: {texto!r}")
+
+    dados = json.loads(match.group(0))
+    intencao = normalizar(str(dados.get("intencao", "outros")))
+    if intencao not in INTENCOES:
+        intencao = "outros"
+
+    negativa = dados.get("negativa", False)
+    if isinstance(negativa, str):
+        negativa = normalizar(negativa) in ("true", "sim")
+    return Classificacao(intencao, bool(negativa), "llm")
+
+
+def registrar_camada(decisao: str, camada: str):
+    """Contabiliza qual camada (regras, cache, llm ou fallback) respondeu uma decisão"""
+    metricas.incrementar(METRICA_CAMADAS, decisao=decisao, camada=camada)
+
+
+def fracoes_por_camada() -> Dict[str, Dict[str, float]]:
+    """Fração das decisões atendidas por cada camada, agrupada por decisão"""
+    totais: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for rotulos, valor in metricas.contadores(METRICA_CAMADAS).items():
+        rotulos = dict(rotulos)
+        totais[rotulos["decisao"]][rotulos["camada"]] = valor
+
+    return {
+        decisao: {camada: valor / sum(camadas.values()) for camada, valor in camadas.items()}
+        for decisao, camadas in totais.items()
+    }
@@ -0,0 +1,59 @@
+import json
+from typing import Iterator
+
+import requests
+
+
+class SessaoRemota:
+    """Conversa atendida pela API HTTP (api.py), com a mesma interface do BancoAgilSystem
+
+    A primeira chamada a processar_mensagem cria a sessão no servidor e
+    retorna a saudação; as seguintes enviam as mensagens do usuário.
+    """
+
+    def __init__(self, url_base: str, timeout: float = 120):
+        self.url_base = url_base.rstrip("/")
+        self.timeout = timeout
+        self.id_sessao = None
+        self.conversa_encerrada = False
+        self._http = requests.Session()
+
+    def processar_mensagem(self, mensagem: str) -> str:
+        if self.id_sessao is None:
+            resposta = self._http.post(f"{self.url_base}/sessoes", timeout=self.timeout)
+        else:
+            resposta = self._http.post(
+                f"{self.url_base}/sessoes/{self.id_sessao}/mensagens",
+                json={"mensagem": mensagem},
+                timeout=self.timeout
+            )
+        resposta.raise_for_status()
+        dados = resposta.json()
+        self.id_sessao = dados.get("id", self.id_sessao)
+        self.conversa_encerrada = dados["encerrada"]
+        return dados["resposta"]
+
+    def transmitir_mensagem(self, mensagem: str) -> Iterator[str]:
+        """Recebe a resposta em trechos (NDJSON de /sessoes/{id}/mensagens?stream=1)"""
+        if self.id_sessao is None:
+            yield self.processar_mensagem(mensagem)
+            return
+
+        with self._http.post(
+            f"{self.url_base}/sessoes/{self.id_sessao}/mensagens",
+            params={"stream": "1"},
+            json={"mensagem": mensagem},
+            timeout=self.timeout,
+            stream=True
+        ) as resposta:
+            resposta.raise_for_status()
+            for linha in resposta.iter_lines(decode_unicode=True):
+                if not linha:
+                    continue
+                evento = json.loads(linha)
+                if "trecho" in evento:
+                    yield evento["trecho"]
+                elif "erro" in evento:
+                    raise RuntimeError(evento["erro"])
+                else:
+                    self.conversa_encerrada = evento["encerrada"]
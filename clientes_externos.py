@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+import aiohttp
+import requests
+from langchain_google_genai import ChatGoogleGenerativeAI
+from requests.adapters import HTTPAdapter
+
+TAMANHO_POOL = int(os.getenv("BANCO_AGIL_POOL_CONEXOES", "100"))
+
+# Endpoint da API REST de busca da Tavily (o mesmo usado pelo tavily-python)
+URL_BUSCA_TAVILY = "https://api.tavily.com/search"
+
+
+class ClienteTavily:
+    """Cliente da API de busca da Tavily com conexões reaproveitadas (keep-alive)
+
+    Fala diretamente com a API REST, sem depender de detalhes internos do
+    TavilyClient; oferece o mesmo search(query, search_depth, **kwargs) e a
+    versão assíncrona asearch. As chamadas síncronas usam uma requests.Session
+    com pool de conexões; as assíncronas, uma aiohttp.ClientSession por event
+    loop, descartada junto com o loop (fechar_async a fecha antes disso).
+    """
+
+    def __init__(self, api_key, tamanho_pool: int = TAMANHO_POOL, url: str = URL_BUSCA_TAVILY):
+        self.api_key = api_key
+        self.url = url
+        self.tamanho_pool = tamanho_pool
+        self._sessao = requests.Session()
+        self._sessao.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool))
+        self._sessoes_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _dados(self, query, search_depth: str, max_results: int, kwargs: dict) -> dict:
+        return {
+            "query": query,
+            "search_depth": search_depth,
+            "max_results": max_results,
+            "api_key": self.api_key,
+            **kwargs,
+        }
+
+    def search(self, query, search_depth="basic", max_results=5, timeout=100, **kwargs) -> dict:
+        """Busca na Tavily; kwargs são os demais parâmetros da API (topic, include_answer...)"""
+        resposta = self._sessao.post(
+            self.url, json=self._dados(query, search_depth, max_results, kwargs), timeout=timeout
+        )
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def _sessao_async(self) -> aiohttp.ClientSession:
+        """Sessão aiohttp do event loop atual (criada na primeira chamada)"""
+        laco = asyncio.get_running_loop()
+        sessao = self._sessoes_async.get(laco)
+        if sessao is None or sessao.closed:
+            sessao = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.tamanho_pool, keepalive_timeout=30)
+            )
+            self._sessoes_async[laco] = sessao
+        return sessao
+
+    async def asearch(self, query, search_depth="basic", max_results=5, timeout=100, **kwargs) -> dict:
+        """Mesmos parâmetros e retorno de search, sem bloquear o event loop"""
+        async with self._sessao_async().post(
+            self.url, json=self._dados(query, search_depth, max_results, kwargs),
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as resposta:
+            resposta.raise_for_status()
+            return await resposta.json()
+
+    async def fechar_async(self):
+        """Fecha a sessão aiohttp do event loop atual"""
+        sessao = self._sessoes_async.pop(asyncio.get_running_loop(), None)
+        if sessao is not None:
+            await sessao.close()
+
+
+_llm: Optional[ChatGoogleGenerativeAI] = None
+_busca: Optional[ClienteTavily] = None
+_lock = threading.Lock()
+
+
+def obter_llm() -> ChatGoogleGenerativeAI:
+    """Cliente Gemini compartilhado pelo processo"""
+    global _llm
+    with _lock:
+        if _llm is None:
+            _llm = ChatGoogleGenerativeAI(
+                model="gemini-2.5-flash",
+                google_api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=0.3
+            )
+        return _llm
+
+
+def obter_cliente_busca() -> ClienteTavily:
+    """Cliente Tavily compartilhado pelo processo"""
+    global _busca
+    with _lock:
+        if _busca is None:
+            _busca = ClienteTavily(api_key=os.getenv("TAVILY_API_KEY"))
+        return _busca
@@ -0,0 +1,150 @@
+"""Clientes externos falsos e determinísticos, para testes e benchmarks locais"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from classificador import ClassificadorRegras, negativa_por_palavras
+
+
+def _sortear_latencia(cliente) -> float:
+    """Latência normal ou, numa fração taxa_lentidao das chamadas, latencia_lenta"""
+    if cliente.taxa_lentidao and cliente._aleatorio.random() < cliente.taxa_lentidao:
+        return cliente.latencia_lenta
+    return cliente.latencia
+
+
+class BuscaFalsa:
+    """Substituto local do TavilyClient com latência e falhas configuráveis
+
+    Uma fração `taxa_lentidao` das chamadas leva `latencia_lenta` segundos
+    (simula incidentes no provedor, para exercitar prazos e disjuntor).
+    """
+
+    COTACOES = {
+        "dólar": "5,00",
+        "euro": "5,40",
+        "libra": "6,30",
+        "peso argentino": "0,005",
+    }
+
+    def __init__(self, latencia: float = 0.0, taxa_falha: float = 0.0, semente: Optional[int] = None,
+                 taxa_lentidao: float = 0.0, latencia_lenta: float = 0.0):
+        self.latencia = latencia
+        self.taxa_falha = taxa_falha
+        self.taxa_lentidao = taxa_lentidao
+        self.latencia_lenta = latencia_lenta
+        self.chamadas = 0
+        self._aleatorio = random.Random(semente)
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> dict:
+        espera = _sortear_latencia(self)
+        if espera:
+            time.sleep(espera)
+        return self._resultado(query, max_results)
+
+    async def asearch(self, query: str, max_results: int = 5, **kwargs) -> dict:
+        espera = _sortear_latencia(self)
+        if espera:
+            await asyncio.sleep(espera)
+        return self._resultado(query, max_results)
+
+    def _resultado(self, query: str, max_results: int) -> dict:
+        self.chamadas += 1
+        if self._aleatorio.random() < self.taxa_falha:
+            raise ConnectionError("Falha simulada na busca")
+
+        moeda = next((m for m in self.COTACOES if m in query), "dólar")
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Cotação {moeda} hoje",
+                    "url": f"https://exemplo.local/{i}",
+                    "content": f"O {moeda} está cotado a R$ {self.COTACOES[moeda]}.",
+                }
+                for i in range(max_results)
+            ],
+        }
+
+
+class LLMFalso:
+    """Substituto local do ChatGoogleGenerativeAI para os prompts de agents.py
+
+    Responde de forma determinística aos prompts de negativa, classificação e
+    extração de cotação. `latencia` é o tempo até o primeiro token e
+    `latencia_token` o intervalo entre tokens em stream/astream; uma fração
+    `taxa_lentidao` das chamadas espera `latencia_lenta` em vez de `latencia`.
+    """
+
+    def __init__(self, latencia: float = 0.0, latencia_token: float = 0.0,
+                 taxa_falha: float = 0.0, semente: Optional[int] = None,
+                 taxa_lentidao: float = 0.0, latencia_lenta: float = 0.0):
+        self.latencia = latencia
+        self.latencia_token = latencia_token
+        self.taxa_falha = taxa_falha
+        self.taxa_lentidao = taxa_lentidao
+        self.latencia_lenta = latencia_lenta
+        self.chamadas = 0
+        self._aleatorio = random.Random(semente)
+        self._regras = ClassificadorRegras()
+
+    def invoke(self, mensagens, **kwargs) -> AIMessage:
+        espera = _sortear_latencia(self)
+        if espera:
+            time.sleep(espera)
+        return AIMessage(content=self._responder(mensagens))
+
+    async def ainvoke(self, mensagens, **kwargs) -> AIMessage:
+        espera = _sortear_latencia(self)
+        if espera:
+            await asyncio.sleep(espera)
+        return AIMessage(content=self._responder(mensagens))
+
+    def stream(self, mensagens, **kwargs) -> Iterator[AIMessageChunk]:
+        primeira = _sortear_latencia(self)
+        tokens = self._tokens(self._responder(mensagens))
+        for i, token in enumerate(tokens):
+            espera = primeira if i == 0 else self.latencia_token
+            if espera:
+                time.sleep(espera)
+            yield AIMessageChunk(content=token)
+
+    async def astream(self, mensagens, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        primeira = _sortear_latencia(self)
+        tokens = self._tokens(self._responder(mensagens))
+        for i, token in enumerate(tokens):
+            espera = primeira if i == 0 else self.latencia_token
+            if espera:
+                await asyncio.sleep(espera)
+            yield AIMessageChunk(content=token)
+
+    @staticmethod
+    def _tokens(texto: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", texto)
+
+    def _responder(self, mensagens) -> str:
+        self.chamadas += 1
+        if self._aleatorio.random() < self.taxa_falha:
+            raise ConnectionError("Falha simulada no LLM")
+
+        prompt = "\n".join(m.content for m in mensagens) if isinstance(mensagens, list) else str(mensagens)
+        mensagem = re.search(r"(?:Resposta do usuário|Mensagem do cliente): (.*)", prompt)
+        mensagem = mensagem.group(1) if mensagem else ""
+
+        if "SIM ou NAO" in prompt:
+            return "SIM" if negativa_por_palavras(mensagem) else "NAO"
+        if "JSON no formato" in prompt:
+            return json.dumps({
+                "intencao": self._regras.intencao(mensagem) or "outros",
+                "negativa": negativa_por_palavras(mensagem),
+            })
+
+        moeda = re.search(r"cotação atual do (.+?) em reais", prompt)
+        moeda = moeda.group(1) if moeda else "dólar"
+        valor = BuscaFalsa.COTACOES.get(moeda, BuscaFalsa.COTACOES["dólar"])
+        return f"A cotação atual do {moeda} é de R$ {valor} por unidade, segundo as fontes consultadas."
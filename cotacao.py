@@ -0,0 +1,35 @@
+"""Busca de cotações: Tavily seguido de extração do valor pelo LLM
+
+O prompt e a formatação dos resultados são usados pelo fluxo de câmbio das
+sessões (agents.py) e por buscar_cotacao, que não depende de sessão e é a
+função entregue ao agendador de prefetch pela infraestrutura.
+"""
+from langchain.prompts import ChatPromptTemplate
+
+PROMPT_COTACAO = ChatPromptTemplate.from_template("""
+Com base nos seguintes resultados de busca, extraia a cotação atual do {moeda} em reais brasileiros.
+
+Resultados:
+{resultados}
+
+Responda de forma clara e direta, informando o valor da cotação.
+""")
+
+
+def consulta_cotacao(moeda: str) -> str:
+    return f"cotação {moeda} hoje Brasil"
+
+
+def texto_resultados(resultado: dict) -> str:
+    """Resultados da Tavily no formato esperado pelo PROMPT_COTACAO"""
+    return "\n\n".join([
+        f"Fonte: {r.get('title', 'N/A')}\n{r.get('content', '')}"
+        for r in resultado.get('results', [])
+    ])
+
+
+def buscar_cotacao(llm, tavily_client, moeda: str) -> str:
+    """Busca a cotação de uma moeda com os clientes compartilhados (sem sessão)"""
+    resultado = tavily_client.search(consulta_cotacao(moeda), max_results=3)
+    mensagens = PROMPT_COTACAO.format_messages(moeda=moeda, resultados=texto_resultados(resultado))
+    return llm.invoke(mensagens).content
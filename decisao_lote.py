@@ -0,0 +1,139 @@
+"""Decisão em lote de aumentos de limite (campanhas pré-aprovadas)
+
+Para cada cliente da base, compara o limite alvo da campanha com o limite
+máximo permitido pelo score (score_limite.csv) e grava as decisões no log de
+solicitações, com o mesmo critério do chat: aprovado se alvo <= permitido.
+
+Os clientes são lidos em blocos e cada bloco é decidido vetorialmente, sem
+laço por linha; a memória fica limitada ao tamanho do bloco.
+
+Uso:
+    python decisao_lote.py --novo-limite 10000
+    python decisao_lote.py --fator 1.5 --tamanho-bloco 1000000 --simular
+
+Clientes cujo score não pertence a nenhuma faixa e clientes cujo limite alvo
+não é maior que o atual não geram solicitação (são apenas contados).
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazenamentoClientes, criar_armazenamento
+from rastreamento import rastrear
+from registro_solicitacoes import RegistroSolicitacoes, obter_registro_solicitacoes
+from tabela_score import TabelaScoreLimite, obter_tabela_score
+
+
+def decidir_bloco(
+    clientes: pd.DataFrame,
+    tabela: TabelaScoreLimite,
+    timestamp: str,
+    novo_limite: Optional[float] = None,
+    fator: Optional[float] = None
+) -> Dict[str, object]:
+    """Decide um bloco de clientes
+
+    O limite alvo é novo_limite (fixo) ou limite atual * fator. Retorna
+    {"solicitacoes": DataFrame no formato do log, "fora_da_faixa": n, "sem_aumento": n}.
+    """
+    atuais = clientes["limite_credito"].to_numpy(dtype=np.float64)
+    if novo_limite is not None:
+        alvos = np.full(len(clientes), float(novo_limite))
+    else:
+        alvos = np.round(atuais * fator, 2)
+
+    permitidos = tabela.limites_para(clientes["score"].to_numpy(dtype=np.float64), fora_da_faixa="nan")
+    na_faixa = ~np.isnan(permitidos)
+    aumento = alvos > atuais
+    selecionados = na_faixa & aumento
+
+    solicitacoes = pd.DataFrame({
+        "cpf_cliente": clientes["cpf"].to_numpy()[selecionados],
+        "data_hora_solicitacao": timestamp,
+        "limite_atual": atuais[selecionados],
+        "novo_limite_solicitado": alvos[selecionados],
+        "status_pedido": np.where(alvos[selecionados] <= permitidos[selecionados], "aprovado", "rejeitado"),
+    })
+    return {
+        "solicitacoes": solicitacoes,
+        "fora_da_faixa": int((~na_faixa).sum()),
+        "sem_aumento": int((na_faixa & ~aumento).sum()),
+    }
+
+
+def decidir_campanha(
+    novo_limite: Optional[float] = None,
+    fator: Optional[float] = None,
+    armazenamento: Optional[ArmazenamentoClientes] = None,
+    tabela: Optional[TabelaScoreLimite] = None,
+    registro: Optional[RegistroSolicitacoes] = None,
+    tamanho_bloco: int = 500_000,
+    simular: bool = False
+) -> Dict[str, int]:
+    """Decide a campanha para toda a base e grava as decisões no log em lotes
+
+    Retorna os totais: clientes, aprovados, rejeitados, fora_da_faixa e sem_aumento.
+    """
+    if (novo_limite is None) == (fator is None):
+        raise ValueError("Informe exatamente um entre novo_limite e fator")
+
+    armazenamento = armazenamento or criar_armazenamento()
+    tabela = tabela or obter_tabela_score()
+    if not simular:
+        registro = registro or obter_registro_solicitacoes()
+
+    # Um único instante para toda a campanha
+    timestamp = datetime.now().isoformat()
+    totais = dict.fromkeys(("clientes", "aprovados", "rejeitados", "fora_da_faixa", "sem_aumento"), 0)
+
+    for clientes in armazenamento.blocos(tamanho_bloco):
+        with rastrear("lote", operacao="decidir_bloco", linhas=len(clientes)):
+            decisao = decidir_bloco(clientes, tabela, timestamp, novo_limite, fator)
+            solicitacoes = decisao["solicitacoes"]
+            if not simular:
+                registro.registrar_lote(solicitacoes)
+
+        aprovados = int((solicitacoes["status_pedido"] == "aprovado").sum())
+        totais["clientes"] += len(clientes)
+        totais["aprovados"] += aprovados
+        totais["rejeitados"] += len(solicitacoes) - aprovados
+        totais["fora_da_faixa"] += decisao["fora_da_faixa"]
+        totais["sem_aumento"] += decisao["sem_aumento"]
+
+    return totais
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decide em lote aumentos de limite para uma campanha")
+    alvo = parser.add_mutually_exclusive_group(required=True)
+    alvo.add_argument("--novo-limite", type=float, help="limite alvo igual para todos os clientes")
+    alvo.add_argument("--fator", type=float, help="limite alvo = limite atual * fator")
+    parser.add_argument("--clientes", default="clientes.csv",
+                        help="base de clientes (ignorado se BANCO_AGIL_DB estiver definida)")
+    parser.add_argument("--tabela", default="score_limite.csv")
+    parser.add_argument("--registro", default="solicitacoes_aumento_limite.csv")
+    parser.add_argument("--tamanho-bloco", type=int, default=500_000)
+    parser.add_argument("--simular", action="store_true", help="decide sem gravar no log de solicitações")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    totais = decidir_campanha(
+        novo_limite=args.novo_limite,
+        fator=args.fator,
+        armazenamento=criar_armazenamento(args.clientes),
+        tabela=obter_tabela_score(args.tabela),
+        registro=None if args.simular else obter_registro_solicitacoes(args.registro),
+        tamanho_bloco=args.tamanho_bloco,
+        simular=args.simular
+    )
+    print(f"{totais['clientes']} clientes em {time.perf_counter() - inicio:.1f}s: "
+          f"{totais['aprovados']} aprovados, {totais['rejeitados']} rejeitados, "
+          f"{totais['fora_da_faixa']} com score fora da tabela, {totais['sem_aumento']} sem aumento")
+
+
+if __name__ == "__main__":
+    main()
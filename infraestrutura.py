@@ -0,0 +1,62 @@
+import functools
+import os
+import threading
+from typing import Optional
+
+from cache_classificacao import obter_cache_classificacao
+from cache_cotacoes import obter_cache_cotacoes
+from classificador import ClassificadorRegras
+from cotacao import buscar_cotacao
+from clientes_externos import obter_cliente_busca, obter_llm
+from limitador import obter_limitador
+from prefetch_cotacoes import iniciar_agendador_cotacoes
+from registro_solicitacoes import obter_registro_solicitacoes
+from repositorio_clientes import obter_repositorio_clientes
+from resiliencia import envolver_busca, envolver_llm
+from roteador import MOEDAS_SUPORTADAS
+from sessao import obter_armazenamento_sessoes
+from tabela_score import obter_tabela_score
+
+
+class Infraestrutura:
+    """Dependências pesadas compartilhadas por todas as sessões do processo
+
+    Clientes de LLM e busca, repositório de clientes, log de solicitações,
+    tabela de score, caches de cotações e de classificações, store de sessões
+    e limitador de tentativas de autenticação. Cada BancoAgilSystem guarda apenas
+    o estado da conversa e referências a esta infraestrutura.
+    """
+
+    def __init__(self, llm=None, tavily_client=None):
+        # Prazos, novas tentativas e disjuntor em todas as chamadas externas (resiliencia.py)
+        self.llm = envolver_llm(llm if llm is not None else obter_llm())
+        self.tavily_client = envolver_busca(tavily_client if tavily_client is not None else obter_cliente_busca())
+        self.repositorio_clientes = obter_repositorio_clientes()
+        self.registro_solicitacoes = obter_registro_solicitacoes()
+        # Com snapshot, a tabela score x limite vem do mesmo arquivo dos clientes
+        self.tabela_score = obter_tabela_score(os.getenv("BANCO_AGIL_SNAPSHOT") or "score_limite.csv")
+        self.classificador_regras = ClassificadorRegras()
+        self.cache_cotacoes = obter_cache_cotacoes()
+        self.cache_classificacao = obter_cache_classificacao()
+        self.armazenamento_sessoes = obter_armazenamento_sessoes()
+        self.limitador_autenticacao = obter_limitador()
+
+        # Atualização das cotações em segundo plano (opcional), com os clientes
+        # compartilhados: o agendador não guarda referência a nenhuma sessão
+        if os.getenv("BANCO_AGIL_PREFETCH_COTACOES") == "1":
+            iniciar_agendador_cotacoes(
+                functools.partial(buscar_cotacao, self.llm, self.tavily_client), MOEDAS_SUPORTADAS
+            )
+
+
+_infraestrutura: Optional[Infraestrutura] = None
+_infraestrutura_lock = threading.Lock()
+
+
+def obter_infraestrutura() -> Infraestrutura:
+    """Retorna a infraestrutura compartilhada pelo processo (criada na primeira chamada)"""
+    global _infraestrutura
+    with _infraestrutura_lock:
+        if _infraestrutura is None:
+            _infraestrutura = Infraestrutura()
+        return _infraestrutura
@@ -0,0 +1,260 @@
+"""Limite de tentativas de autenticação, compartilhado entre sessões e workers
+
+Cada chave (ex.: "cpf:12345678901", "origem:10.0.0.1") tem um contador de
+janela deslizante aproximada: guarda só a contagem da janela atual e da
+anterior, e estima as tentativas nos últimos `janela` segundos ponderando a
+anterior pela fração ainda coberta. O estado por chave é constante (três
+números), e o store em memória descarta as chaves menos usadas (LRU).
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+# (índice da janela, tentativas na janela atual, tentativas na anterior)
+Contador = Tuple[int, int, int]
+
+# Tentativas permitidas por janela, por tipo de chave
+LIMITE_CPF = int(os.getenv("BANCO_AGIL_AUTH_LIMITE_CPF", "5"))
+LIMITE_ORIGEM = int(os.getenv("BANCO_AGIL_AUTH_LIMITE_ORIGEM", "20"))
+JANELA_SEGUNDOS = float(os.getenv("BANCO_AGIL_AUTH_JANELA", "900"))
+
+
+def _avancar(contador: Optional[Contador], indice: int) -> Contador:
+    """Contador trazido para a janela `indice`"""
+    if contador is None:
+        return indice, 0, 0
+    indice_anterior, atual, anterior = contador
+    if indice == indice_anterior:
+        return contador
+    if indice == indice_anterior + 1:
+        return indice, 0, atual
+    return indice, 0, 0
+
+
+def _estimativa(contador: Contador, fracao: float) -> float:
+    """Tentativas estimadas nos últimos `janela` segundos"""
+    _, atual, anterior = contador
+    return atual + anterior * (1 - fracao)
+
+
+def _descontar(contador: Contador) -> Contador:
+    """Contador com uma tentativa a menos (da janela atual ou, se vazia, da anterior)"""
+    indice, atual, anterior = contador
+    if atual > 0:
+        return indice, atual - 1, anterior
+    return indice, 0, max(0, anterior - 1)
+
+
+class LimitadorTentativas(ABC):
+    """Interface dos stores de contadores"""
+
+    def __init__(self, janela: float = JANELA_SEGUNDOS):
+        self.janela = janela
+
+    def _instante(self) -> Tuple[int, float]:
+        agora = time.time() / self.janela
+        return int(agora), agora - int(agora)
+
+    def _espera(self, contadores: Sequence[Contador], limites: Sequence[int], fracao: float) -> float:
+        """Segundos até a tentativa caber no limite de todas as chaves (0 se já cabe)"""
+        espera = 0.0
+        for contador, limite in zip(contadores, limites):
+            if _estimativa(contador, fracao) + 1 <= limite:
+                continue
+            _, atual, anterior = contador
+            if atual + 1 > limite:
+                # Só cabe quando a janela atual virar a anterior e for se esvaziando
+                restante = 1 - fracao
+                excesso = atual + 1 - limite
+                espera = max(espera, (restante + excesso / max(atual, 1)) * self.janela)
+            else:
+                # A parcela da janela anterior ainda coberta precisa cair o suficiente
+                fracao_necessaria = 1 - (limite - 1 - atual) / anterior
+                espera = max(espera, (fracao_necessaria - fracao) * self.janela)
+        return espera
+
+    @abstractmethod
+    def consumir(self, limites: Dict[str, int]) -> float:
+        """Registra uma tentativa em todas as chaves se todas estiverem abaixo do
+        limite; senão não registra nada e retorna os segundos de espera"""
+
+    @abstractmethod
+    def liberar(self, chave: str):
+        """Zera o contador da chave (ex.: após autenticação bem-sucedida)"""
+
+    @abstractmethod
+    def devolver(self, chave: str):
+        """Desconta uma tentativa registrada na chave, sem zerar as demais
+        (ex.: login bem-sucedido não conta contra a origem)"""
+
+
+class LimitadorMemoria(LimitadorTentativas):
+    """Contadores na memória do processo, com no máximo `capacidade` chaves (LRU)"""
+
+    def __init__(self, janela: float = JANELA_SEGUNDOS, capacidade: int = 100_000):
+        super().__init__(janela)
+        self.capacidade = capacidade
+        self._contadores: "OrderedDict[str, Contador]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, limites: Dict[str, int]) -> float:
+        indice, fracao = self._instante()
+        with self._lock:
+            contadores = [_avancar(self._contadores.get(chave), indice) for chave in limites]
+            espera = self._espera(contadores, list(limites.values()), fracao)
+            if espera > 0:
+                return espera
+            for chave, (_, atual, anterior) in zip(limites, contadores):
+                self._contadores[chave] = (indice, atual + 1, anterior)
+                self._contadores.move_to_end(chave)
+            while len(self._contadores) > self.capacidade:
+                self._contadores.popitem(last=False)
+            return 0.0
+
+    def liberar(self, chave: str):
+        with self._lock:
+            self._contadores.pop(chave, None)
+
+    def devolver(self, chave: str):
+        indice, _ = self._instante()
+        with self._lock:
+            contador = self._contadores.get(chave)
+            if contador is not None:
+                self._contadores[chave] = _descontar(_avancar(contador, indice))
+
+    def __len__(self):
+        return len(self._contadores)
+
+
+class LimitadorSQLite(LimitadorTentativas):
+    """Contadores em SQLite (modo WAL), compartilhados entre processos da mesma máquina"""
+
+    def __init__(self, caminho: str = "sessoes.db", janela: float = JANELA_SEGUNDOS):
+        super().__init__(janela)
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS tentativas_autenticacao (
+                    chave TEXT PRIMARY KEY,
+                    indice INTEGER NOT NULL,
+                    atual INTEGER NOT NULL,
+                    anterior INTEGER NOT NULL
+                )
+            """)
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão própria de cada thread"""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def consumir(self, limites: Dict[str, int]) -> float:
+        indice, fracao = self._instante()
+        conexao = self._conexao()
+        # BEGIN IMMEDIATE serializa leitura e escrita entre workers
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            contadores = []
+            for chave in limites:
+                linha = conexao.execute(
+                    "SELECT indice, atual, anterior FROM tentativas_autenticacao WHERE chave = ?", (chave,)
+                ).fetchone()
+                contadores.append(_avancar(tuple(linha) if linha else None, indice))
+
+            espera = self._espera(contadores, list(limites.values()), fracao)
+            if espera == 0:
+                conexao.executemany(
+                    "INSERT OR REPLACE INTO tentativas_autenticacao (chave, indice, atual, anterior) VALUES (?, ?, ?, ?)",
+                    [(chave, indice, atual + 1, anterior) for chave, (_, atual, anterior) in zip(limites, contadores)]
+                )
+            conexao.execute("COMMIT")
+            return espera
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def liberar(self, chave: str):
+        self._conexao().execute("DELETE FROM tentativas_autenticacao WHERE chave = ?", (chave,))
+
+    def devolver(self, chave: str):
+        indice, _ = self._instante()
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                "SELECT indice, atual, anterior FROM tentativas_autenticacao WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha:
+                conexao.execute(
+                    "UPDATE tentativas_autenticacao SET indice = ?, atual = ?, anterior = ? WHERE chave = ?",
+                    (*_descontar(_avancar(tuple(linha), indice)), chave)
+                )
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def remover_expirados(self) -> int:
+        """Remove contadores sem tentativas nas duas últimas janelas"""
+        indice, _ = self._instante()
+        cursor = self._conexao().execute(
+            "DELETE FROM tentativas_autenticacao WHERE indice < ?", (indice - 1,)
+        )
+        return cursor.rowcount
+
+
+def chave_cpf(cpf: str) -> str:
+    return f"cpf:{cpf}"
+
+
+def chave_origem(origem: str) -> str:
+    return f"origem:{origem}"
+
+
+def limites_autenticacao(cpf: str, origem: Optional[str] = None) -> Dict[str, int]:
+    """Chaves e limites verificados a cada tentativa de autenticação"""
+    limites = {chave_cpf(cpf): LIMITE_CPF}
+    if origem:
+        limites[chave_origem(origem)] = LIMITE_ORIGEM
+    return limites
+
+
+def registrar_sucesso(limitador: LimitadorTentativas, cpf: str, origem: Optional[str] = None):
+    """Após autenticação bem-sucedida: zera o CPF e devolve a tentativa à origem,
+    para que só as falhas contem contra ela (ex.: vários clientes atrás do mesmo NAT)"""
+    limitador.liberar(chave_cpf(cpf))
+    if origem:
+        limitador.devolver(chave_origem(origem))
+
+
+def minutos_de_espera(segundos: float) -> int:
+    return max(1, math.ceil(segundos / 60))
+
+
+_limitador: Optional[LimitadorTentativas] = None
+_limitador_lock = threading.Lock()
+
+
+def obter_limitador() -> LimitadorTentativas:
+    """Limitador do processo: SQLite se BANCO_AGIL_LIMITADOR_DB (ou BANCO_AGIL_SESSOES_DB)
+    estiver definida, senão memória"""
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            caminho = os.getenv("BANCO_AGIL_LIMITADOR_DB") or os.getenv("BANCO_AGIL_SESSOES_DB")
+            if caminho:
+                _limitador = LimitadorSQLite(caminho)
+            else:
+                capacidade = int(os.getenv("BANCO_AGIL_LIMITADOR_MAX", "100000"))
+                _limitador = LimitadorMemoria(capacidade=capacidade)
+        return _limitador
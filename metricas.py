@@ -0,0 +1,77 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class Resumo:
+    """Contagem, soma e máximo das observações de uma métrica"""
+    __slots__ = ("contagem", "soma", "maximo")
+
+    def __init__(self, contagem: int = 0, soma: float = 0.0, maximo: float = 0.0):
+        self.contagem = contagem
+        self.soma = soma
+        self.maximo = maximo
+
+    @property
+    def media(self) -> float:
+        return self.soma / self.contagem if self.contagem else 0.0
+
+    def __repr__(self):
+        return f"Resumo(contagem={self.contagem}, media={self.media:.6f}, maximo={self.maximo:.6f})"
+
+
+class RegistroMetricas:
+    """Registro de contadores e observações em memória, seguro para várias threads"""
+
+    def __init__(self):
+        self._contadores: Dict[str, Dict[Rotulos, float]] = defaultdict(lambda: defaultdict(float))
+        self._resumos: Dict[str, Dict[Rotulos, Resumo]] = defaultdict(lambda: defaultdict(Resumo))
+        self._lock = threading.Lock()
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        """Soma valor ao contador identificado por nome e rótulos"""
+        chave = tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+        with self._lock:
+            self._contadores[nome][chave] += valor
+
+    def contadores(self, nome: str) -> Dict[Rotulos, float]:
+        """Retorna uma cópia dos valores de um contador, por combinação de rótulos"""
+        with self._lock:
+            return dict(self._contadores.get(nome, {}))
+
+    def observar(self, nome: str, valor: float, **rotulos):
+        """Registra uma observação (ex.: latência em segundos)"""
+        chave = tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+        with self._lock:
+            resumo = self._resumos[nome][chave]
+            resumo.contagem += 1
+            resumo.soma += valor
+            resumo.maximo = max(resumo.maximo, valor)
+
+    def resumos(self, nome: str) -> Dict[Rotulos, Resumo]:
+        """Retorna uma cópia dos resumos de uma métrica, por combinação de rótulos"""
+        with self._lock:
+            return {
+                chave: Resumo(r.contagem, r.soma, r.maximo)
+                for chave, r in self._resumos.get(nome, {}).items()
+            }
+
+    def todos_contadores(self) -> Dict[str, Dict[Rotulos, float]]:
+        with self._lock:
+            return {nome: dict(valores) for nome, valores in self._contadores.items()}
+
+    def todos_resumos(self) -> Dict[str, Dict[Rotulos, Resumo]]:
+        with self._lock:
+            nomes = list(self._resumos)
+        return {nome: self.resumos(nome) for nome in nomes}
+
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._resumos.clear()
+
+
+# Registro compartilhado pelo processo
+metricas = RegistroMetricas()
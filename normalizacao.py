@@ -0,0 +1,115 @@
+"""Normalização das entradas do usuário: CPF, datas e valores em reais
+
+Os padrões são compilados uma única vez, no carregamento do módulo, e os
+resultados das mensagens já vistas ficam em cache (as funções são puras).
+"""
+import functools
+import os
+import re
+from typing import Optional
+
+_NAO_DIGITO = re.compile(r"\D")
+_DATA_BR = re.compile(r"(\d{2})[/-](\d{2})[/-](\d{4})")
+_DATA_ISO = re.compile(r"(\d{4})[/-](\d{2})[/-](\d{2})")
+# Primeiro número da mensagem, com separadores de milhar/decimal e "mil" opcional
+_VALOR = re.compile(r"(\d[\d.,]*)(\s*mil\b)?", re.IGNORECASE)
+# Dígitos separados por "." ou ",", sem separadores seguidos
+_NUMERO = re.compile(r"\d+(?:[.,]\d+)*")
+_GRUPOS_MILHAR = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+
+_TAMANHO_CACHE = 4096
+
+
+def cpf_valido(cpf: str) -> bool:
+    """Confere os dígitos verificadores de um CPF com 11 dígitos"""
+    if len(cpf) != 11 or not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    digitos = [int(d) for d in cpf]
+    for posicao in (9, 10):
+        soma = sum(digito * (posicao + 1 - i) for i, digito in enumerate(digitos[:posicao]))
+        if (soma * 10) % 11 % 10 != digitos[posicao]:
+            return False
+    return True
+
+
+def validacao_cpf_ativa() -> bool:
+    """Dígitos verificadores só são exigidos com BANCO_AGIL_VALIDAR_CPF=1
+    (os CPFs de teste da base de exemplo não são válidos)"""
+    return os.getenv("BANCO_AGIL_VALIDAR_CPF") == "1"
+
+
+def extrair_cpf(mensagem: str, validar: Optional[bool] = None) -> Optional[str]:
+    """Os 11 dígitos do CPF informado, ou None se não houver 11 dígitos (ou, com
+    validação, se os dígitos verificadores não conferirem)"""
+    cpf = _NAO_DIGITO.sub("", mensagem)
+    if len(cpf) != 11:
+        return None
+    if validar is None:
+        validar = validacao_cpf_ativa()
+    if validar and not cpf_valido(cpf):
+        return None
+    return cpf
+
+
+@functools.lru_cache(maxsize=_TAMANHO_CACHE)
+def extrair_data(mensagem: str) -> Optional[str]:
+    """Data no formato AAAA-MM-DD a partir de DD/MM/AAAA ou AAAA-MM-DD"""
+    match = _DATA_BR.search(mensagem)
+    if match:
+        dia, mes, ano = match.groups()
+        return f"{ano}-{mes}-{dia}"
+
+    match = _DATA_ISO.search(mensagem)
+    if match:
+        return match.group(0).replace("/", "-")
+    return None
+
+
+def _converter_numero(texto: str) -> Optional[float]:
+    """Número em formato brasileiro ("10.000,50") ou simples ("7000.50"); None se malformado"""
+    texto = texto.rstrip(".,")
+    if not _NUMERO.fullmatch(texto):
+        # Separadores repetidos ou vazios ("1.000,,00")
+        return None
+    try:
+        return _converter_grupos(texto)
+    except ValueError:
+        # Separadores misturados sem formato reconhecível ("1,2.3,4")
+        return None
+
+
+def _converter_grupos(texto: str) -> float:
+    if "." in texto and "," in texto:
+        # O último separador é o decimal
+        decimal = "," if texto.rfind(",") > texto.rfind(".") else "."
+        milhar = "." if decimal == "," else ","
+        return float(texto.replace(milhar, "").replace(decimal, "."))
+
+    separador = "," if "," in texto else "." if "." in texto else None
+    if separador is None:
+        return float(texto)
+    # Grupos de 3 dígitos indicam milhar quando o separador é "." ("7.000") ou se
+    # repete ("1,000,000"); uma vírgula só é decimal ("1,500") e parte inteira 0
+    # nunca tem milhar ("0,005", "0.005")
+    if (
+        _GRUPOS_MILHAR.fullmatch(texto)
+        and (separador == "." or texto.count(",") > 1)
+        and int(texto.split(separador, 1)[0]) != 0
+    ):
+        return float(texto.replace(separador, ""))
+    inteiro, _, fracao = texto.rpartition(separador)
+    return float(f"{inteiro.replace(separador, '')}.{fracao}")
+
+
+@functools.lru_cache(maxsize=_TAMANHO_CACHE)
+def extrair_valor(mensagem: str) -> Optional[float]:
+    """Primeiro valor monetário da mensagem ("R$ 10.000,50", "7000", "5 mil"), ou None"""
+    match = _VALOR.search(mensagem)
+    if not match:
+        return None
+    valor = _converter_numero(match.group(1))
+    if valor is None:
+        return None
+    if match.group(2):
+        valor *= 1000
+    return valor
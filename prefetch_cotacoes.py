@@ -0,0 +1,121 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from cache_cotacoes import CacheCotacoes, obter_cache_cotacoes
+from metricas import metricas
+
+METRICA_PREFETCH = "prefetch_cotacoes_total"
+
+
+class AgendadorCotacoes:
+    """Atualiza em segundo plano as cotações de um conjunto fixo de moedas
+
+    Cada moeda tem seu próprio agendamento: após sucesso, a próxima busca
+    ocorre em intervalo ± jitter; após falhas, o intervalo cresce
+    exponencialmente até backoff_maximo.
+    """
+
+    def __init__(
+        self,
+        cache: CacheCotacoes,
+        buscar: Callable[[str], str],
+        moedas: Iterable[str],
+        intervalo: float = 30.0,
+        jitter: float = 0.1,
+        backoff_inicial: float = 1.0,
+        backoff_maximo: float = 300.0
+    ):
+        """
+        buscar: função que recebe a moeda e devolve o texto da cotação
+        jitter: fração aleatória (±) aplicada a cada espera
+        """
+        self.cache = cache
+        self.buscar = buscar
+        self.moedas = list(moedas)
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+
+        self._falhas: Dict[str, int] = {moeda: 0 for moeda in self.moedas}
+        self._proxima: Dict[str, float] = {moeda: 0.0 for moeda in self.moedas}
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        """Inicia a thread de atualização (a primeira rodada busca todas as moedas)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name="prefetch-cotacoes", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def atualizar_agora(self, moeda: str) -> bool:
+        """Busca a cotação de uma moeda imediatamente; retorna True em caso de sucesso"""
+        agora = time.monotonic()
+        try:
+            self.cache.definir(moeda, self.buscar(moeda))
+        except Exception as e:
+            self._falhas[moeda] += 1
+            espera = min(self.backoff_maximo, self.backoff_inicial * 2 ** (self._falhas[moeda] - 1))
+            self._proxima[moeda] = agora + self._com_jitter(espera)
+            metricas.incrementar(METRICA_PREFETCH, moeda=moeda, resultado="falha")
+            print(f"Erro ao atualizar cotação de {moeda}: {e}")
+            return False
+
+        self._falhas[moeda] = 0
+        self._proxima[moeda] = agora + self._com_jitter(self.intervalo)
+        metricas.incrementar(METRICA_PREFETCH, moeda=moeda, resultado="sucesso")
+        return True
+
+    def idades(self) -> Dict[str, Optional[float]]:
+        """Idade (s) da cotação em cache de cada moeda, para monitoramento"""
+        return {moeda: self.cache.idade(moeda) for moeda in self.moedas}
+
+    def falhas_consecutivas(self) -> Dict[str, int]:
+        return dict(self._falhas)
+
+    def _com_jitter(self, segundos: float) -> float:
+        return segundos * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _executar(self):
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            for moeda in self.moedas:
+                if self._proxima[moeda] <= agora and not self._parar.is_set():
+                    self.atualizar_agora(moeda)
+
+            espera = min(self._proxima.values()) - time.monotonic()
+            self._parar.wait(max(0.0, espera))
+
+
+_agendador: Optional[AgendadorCotacoes] = None
+_agendador_lock = threading.Lock()
+
+
+def iniciar_agendador_cotacoes(buscar: Callable[[str], str], moedas: Iterable[str]) -> AgendadorCotacoes:
+    """Inicia (uma única vez por processo) o agendador sobre o cache compartilhado
+
+    O intervalo vem de BANCO_AGIL_PREFETCH_INTERVALO (padrão: metade do TTL do
+    cache), para que as cotações nunca expirem entre duas atualizações.
+    """
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None:
+            cache = obter_cache_cotacoes()
+            intervalo = float(os.getenv("BANCO_AGIL_PREFETCH_INTERVALO", cache.ttl / 2))
+            _agendador = AgendadorCotacoes(cache, buscar, moedas, intervalo=intervalo)
+            _agendador.iniciar()
+        return _agendador
+
+
+def obter_agendador_cotacoes() -> Optional[AgendadorCotacoes]:
+    """Retorna o agendador do processo, ou None se não foi iniciado"""
+    return _agendador
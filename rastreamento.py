@@ -0,0 +1,268 @@
+"""Spans de tempo em handlers, armazenamento e chamadas externas
+
+Uso:
+    with rastrear("llm", agente="cambio", prompt="cotacao") as span:
+        resposta = llm.invoke(...)
+        span.definir(tokens_saida=...)
+
+Sem destinos configurados, rastrear() devolve um span nulo compartilhado e o
+custo é o de uma chamada de função. Os destinos são escolhidos por
+BANCO_AGIL_RASTREAMENTO (lista separada por vírgulas de "log" e "histograma")
+ou por configurar_rastreamento().
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from metricas import RegistroMetricas, metricas
+
+# Atributos usados como rótulos nos histogramas (os demais só vão para o log)
+ROTULOS_HISTOGRAMA = ("agente", "prompt", "operacao", "cache", "erro")
+
+# Limites dos buckets de duração, em segundos
+LIMITES_PADRAO = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Span:
+    """Trecho medido: nome, atributos e duração (preenchida ao sair do with)"""
+    __slots__ = ("nome", "atributos", "inicio", "duracao", "_rastreador")
+
+    def __init__(self, nome: str, atributos: dict, rastreador: "Rastreador"):
+        self.nome = nome
+        self.atributos = atributos
+        self.inicio = 0.0
+        self.duracao = 0.0
+        self._rastreador = rastreador
+
+    def definir(self, **atributos):
+        self.atributos.update(atributos)
+
+    def __enter__(self) -> "Span":
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, traceback):
+        self.duracao = time.perf_counter() - self.inicio
+        if tipo is not None:
+            # GeneratorExit/StopIteration não são falhas do trecho medido
+            if not issubclass(tipo, (GeneratorExit, StopIteration)):
+                self.atributos["erro"] = tipo.__name__
+        self._rastreador.publicar(self)
+        return False
+
+
+class _SpanNulo:
+    """Span usado com o rastreamento desligado: não mede nem publica nada"""
+    __slots__ = ()
+
+    def definir(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, traceback):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class DestinoLog:
+    """Escreve uma linha de log por span"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, nivel: int = logging.INFO):
+        self.logger = logger or logging.getLogger("banco_agil.rastreamento")
+        self.nivel = nivel
+
+    def registrar(self, span: Span):
+        if not self.logger.isEnabledFor(self.nivel):
+            return
+        atributos = " ".join(f"{chave}={valor}" for chave, valor in span.atributos.items())
+        self.logger.log(self.nivel, "span=%s duracao_ms=%.3f %s", span.nome, span.duracao * 1000, atributos)
+
+
+class _Histograma:
+    __slots__ = ("buckets", "soma", "contagem")
+
+    def __init__(self, tamanho: int):
+        self.buckets = [0] * tamanho
+        self.soma = 0.0
+        self.contagem = 0
+
+
+class DestinoHistograma:
+    """Histogramas de duração em memória por nome do span e rótulos
+
+    Também soma os atributos tokens_entrada/tokens_saida de cada span.
+    """
+
+    def __init__(self, limites: Sequence[float] = LIMITES_PADRAO):
+        self.limites = tuple(limites)
+        self._histogramas: Dict[Tuple[str, tuple], _Histograma] = {}
+        self._tokens: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def registrar(self, span: Span):
+        rotulos = tuple(
+            (chave, str(span.atributos[chave])) for chave in ROTULOS_HISTOGRAMA if chave in span.atributos
+        )
+        chave = (span.nome, rotulos)
+        indice = bisect.bisect_left(self.limites, span.duracao)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = _Histograma(len(self.limites) + 1)
+            histograma.buckets[indice] += 1
+            histograma.soma += span.duracao
+            histograma.contagem += 1
+            for tipo in ("entrada", "saida"):
+                tokens = span.atributos.get(f"tokens_{tipo}")
+                if tokens:
+                    self._tokens[(span.nome, tipo)] += tokens
+
+    def percentil(self, nome: str, p: float, **rotulos) -> Optional[float]:
+        """Limite superior do bucket que contém o percentil p (None se não houver dados)"""
+        with self._lock:
+            buckets = [0] * (len(self.limites) + 1)
+            for (nome_span, chave), histograma in self._histogramas.items():
+                if nome_span == nome and all(dict(chave).get(k) == str(v) for k, v in rotulos.items()):
+                    buckets = [a + b for a, b in zip(buckets, histograma.buckets)]
+        total = sum(buckets)
+        if not total:
+            return None
+        alvo = p / 100 * total
+        acumulado = 0
+        for indice, quantidade in enumerate(buckets):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                return self.limites[indice] if indice < len(self.limites) else float("inf")
+        return float("inf")
+
+    def texto_prometheus(self) -> str:
+        """Histogramas e totais de tokens no formato de exposição do Prometheus"""
+        linhas = [
+            "# HELP banco_agil_span_segundos Duração dos spans em segundos",
+            "# TYPE banco_agil_span_segundos histogram",
+        ]
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            tokens = sorted(self._tokens.items())
+        for (nome, rotulos), histograma in histogramas:
+            base = (("span", nome),) + rotulos
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (float("inf"),), histograma.buckets):
+                acumulado += quantidade
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"banco_agil_span_segundos_bucket{_rotulos(base + (('le', le),))} {acumulado}")
+            linhas.append(f"banco_agil_span_segundos_sum{_rotulos(base)} {histograma.soma}")
+            linhas.append(f"banco_agil_span_segundos_count{_rotulos(base)} {histograma.contagem}")
+
+        linhas.append("# HELP banco_agil_tokens_total Tokens de LLM por span")
+        linhas.append("# TYPE banco_agil_tokens_total counter")
+        for (nome, tipo), total in tokens:
+            linhas.append(f"banco_agil_tokens_total{_rotulos((('span', nome), ('tipo', tipo)))} {total}")
+        return "\n".join(linhas) + "\n"
+
+    def limpar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._tokens.clear()
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(pares) -> str:
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{chave}="{_escapar(valor)}"' for chave, valor in pares) + "}"
+
+
+class Rastreador:
+    """Distribui os spans concluídos para os destinos configurados"""
+
+    def __init__(self, destinos: Sequence = ()):
+        self.destinos: List = list(destinos)
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.destinos)
+
+    def publicar(self, span: Span):
+        for destino in self.destinos:
+            try:
+                destino.registrar(span)
+            except Exception as e:
+                print(f"Erro ao registrar span: {e}")
+
+    def histograma(self) -> Optional[DestinoHistograma]:
+        """Primeiro destino de histogramas configurado (None se não houver)"""
+        return next((d for d in self.destinos if isinstance(d, DestinoHistograma)), None)
+
+
+def _destinos_do_ambiente() -> list:
+    destinos = []
+    for nome in filter(None, (n.strip() for n in os.getenv("BANCO_AGIL_RASTREAMENTO", "").split(","))):
+        if nome == "log":
+            destinos.append(DestinoLog())
+        elif nome == "histograma":
+            destinos.append(DestinoHistograma())
+        else:
+            print(f"Erro: destino de rastreamento desconhecido: {nome}")
+    return destinos
+
+
+# Rastreador compartilhado pelo processo
+rastreador = Rastreador(_destinos_do_ambiente())
+
+
+def configurar_rastreamento(*destinos):
+    """Substitui os destinos do rastreador do processo (sem argumentos, desliga)"""
+    rastreador.destinos = list(destinos)
+
+
+def rastrear(nome: str, **atributos):
+    """Context manager que mede o trecho e publica o span ao sair"""
+    if not rastreador.destinos:
+        return _SPAN_NULO
+    return Span(nome, atributos, rastreador)
+
+
+def texto_prometheus(registro: RegistroMetricas = metricas) -> str:
+    """Contadores do registro de métricas e histogramas de spans, no formato do Prometheus"""
+    linhas = []
+    for nome, valores in sorted(registro.todos_contadores().items()):
+        linhas.append(f"# TYPE banco_agil_{nome} counter")
+        for rotulos, valor in sorted(valores.items()):
+            linhas.append(f"banco_agil_{nome}{_rotulos(rotulos)} {valor}")
+    for nome, resumos in sorted(registro.todos_resumos().items()):
+        linhas.append(f"# TYPE banco_agil_{nome} summary")
+        for rotulos, resumo in sorted(resumos.items()):
+            linhas.append(f"banco_agil_{nome}_sum{_rotulos(rotulos)} {resumo.soma}")
+            linhas.append(f"banco_agil_{nome}_count{_rotulos(rotulos)} {resumo.contagem}")
+    texto = "\n".join(linhas) + "\n" if linhas else ""
+
+    histograma = rastreador.histograma()
+    if histograma is not None:
+        texto += histograma.texto_prometheus()
+    return texto
+
+
+def contar_tokens(mensagens, resposta) -> Dict[str, int]:
+    """Tokens de entrada e saída de uma chamada ao LLM
+
+    Usa usage_metadata quando o cliente o fornece; senão estima ~4 caracteres
+    por token a partir do texto das mensagens e da resposta.
+    """
+    uso = getattr(resposta, "usage_metadata", None)
+    if uso:
+        return {"tokens_entrada": uso.get("input_tokens", 0), "tokens_saida": uso.get("output_tokens", 0)}
+    texto_entrada = sum(len(getattr(m, "content", "")) for m in mensagens)
+    texto_saida = len(getattr(resposta, "content", resposta) or "")
+    return {"tokens_entrada": texto_entrada // 4, "tokens_saida": texto_saida // 4, "tokens_estimados": True}
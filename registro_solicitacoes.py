@@ -0,0 +1,314 @@
+import atexit
+import csv
+import gzip
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional
+
+from rastreamento import rastrear
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, apenas a thread escritora
+    fcntl = None
+
+COLUNAS_SOLICITACOES = [
+    "cpf_cliente", "data_hora_solicitacao", "limite_atual",
+    "novo_limite_solicitado", "status_pedido"
+]
+
+
+class _Comando:
+    """Comando de controle enviado à thread escritora"""
+
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.concluido = threading.Event()
+
+
+class _Bloco(_Comando):
+    """Bloco de linhas já formatadas em CSV, gravado de uma vez pela thread escritora"""
+
+    def __init__(self, conteudo: str, linhas: int):
+        super().__init__("bloco")
+        self.conteudo = conteudo
+        self.linhas = linhas
+
+
+class RegistroSolicitacoes:
+    """Log append-only de solicitações de aumento de limite
+
+    Todas as gravações passam por uma única thread escritora que mantém o
+    arquivo aberto e agrupa as linhas pendentes em lotes. Entre processos,
+    cada lote é gravado sob trava exclusiva do arquivo (quando disponível).
+    """
+
+    def __init__(
+        self,
+        caminho: str = "solicitacoes_aumento_limite.csv",
+        tamanho_lote: int = 100,
+        intervalo_flush: Optional[float] = None,
+        fsync: bool = False,
+        tamanho_maximo: Optional[int] = None,
+        comprimir_rotacionados: bool = False
+    ):
+        """
+        tamanho_lote: máximo de linhas gravadas de uma vez
+        intervalo_flush: espera máxima (s) para completar um lote; None grava assim que a fila esvazia
+        fsync: força os dados para o disco a cada lote
+        tamanho_maximo: tamanho (bytes) a partir do qual o arquivo é rotacionado
+        comprimir_rotacionados: comprime com gzip os arquivos rotacionados
+        """
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self.fsync = fsync
+        self.tamanho_maximo = tamanho_maximo
+        self.comprimir_rotacionados = comprimir_rotacionados
+
+        self._arquivo = None
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._executar, name="registro-solicitacoes", daemon=True
+        )
+        self._thread.start()
+
+    def registrar(self, cpf, timestamp, limite_atual, novo_limite, status):
+        """Enfileira uma solicitação para gravação (não bloqueia)"""
+        self._fila.put((cpf, timestamp, limite_atual, novo_limite, status))
+
+    def registrar_lote(self, solicitacoes: "pd.DataFrame"):
+        """Grava um lote de solicitações de uma vez (bloqueia até a gravação)
+
+        solicitacoes: DataFrame com as colunas de COLUNAS_SOLICITACOES. O CSV é
+        montado na thread de quem chama, sem laço por linha; esperar a gravação
+        limita a memória a um lote mesmo quando o chamador produz mais rápido
+        do que o disco grava.
+        """
+        if solicitacoes.empty:
+            return
+        conteudo = solicitacoes[COLUNAS_SOLICITACOES].to_csv(
+            index=False, header=False, lineterminator="\n"
+        )
+        bloco = _Bloco(conteudo, len(solicitacoes))
+        self._fila.put(bloco)
+        bloco.concluido.wait()
+
+    def flush(self):
+        """Bloqueia até que todas as solicitações enfileiradas sejam gravadas"""
+        self._enviar_comando("flush")
+
+    def rotacionar(self):
+        """Fecha o arquivo atual, renomeia-o com data/hora e inicia um novo"""
+        self._enviar_comando("rotacionar")
+
+    def fechar(self):
+        """Grava as pendências e encerra a thread escritora"""
+        if self._thread.is_alive():
+            self._enviar_comando("fechar")
+            self._thread.join()
+
+    def _enviar_comando(self, tipo: str):
+        comando = _Comando(tipo)
+        self._fila.put(comando)
+        comando.concluido.wait()
+
+    def _executar(self):
+        """Laço da thread escritora"""
+        pendentes = []
+        inicio_lote = time.monotonic()
+
+        while True:
+            timeout = None
+            if pendentes:
+                if self.intervalo_flush is None:
+                    timeout = 0
+                else:
+                    timeout = max(0.0, self.intervalo_flush - (time.monotonic() - inicio_lote))
+
+            try:
+                item = self._fila.get(timeout=timeout) if timeout != 0 else self._fila.get_nowait()
+            except queue.Empty:
+                # Fila vazia ou prazo do lote expirado
+                self._gravar(pendentes)
+                pendentes = []
+                continue
+
+            if isinstance(item, _Comando):
+                self._gravar(pendentes)
+                pendentes = []
+                if item.tipo == "bloco":
+                    self._gravar_bloco(item)
+                elif item.tipo == "rotacionar":
+                    self._rotacionar()
+                elif item.tipo == "fechar":
+                    self._fechar_arquivo()
+                item.concluido.set()
+                if item.tipo == "fechar":
+                    return
+                continue
+
+            if not pendentes:
+                inicio_lote = time.monotonic()
+            pendentes.append(item)
+
+            if len(pendentes) >= self.tamanho_lote:
+                self._gravar(pendentes)
+                pendentes = []
+
+    def _gravar(self, linhas):
+        """Grava um lote de linhas no final do arquivo"""
+        if not linhas:
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(linhas)
+
+        try:
+            with rastrear("registro", operacao="gravar_lote", linhas=len(linhas)):
+                self._gravar_travado(buffer.getvalue())
+        except Exception as e:
+            print(f"Erro ao salvar solicitação: {e}")
+
+    def _gravar_bloco(self, bloco: _Bloco):
+        try:
+            with rastrear("registro", operacao="gravar_bloco", linhas=bloco.linhas):
+                self._gravar_travado(bloco.conteudo)
+        except Exception as e:
+            print(f"Erro ao salvar lote de solicitações: {e}")
+
+    def _gravar_travado(self, conteudo: str):
+        """Escreve o conteúdo sob a trava do arquivo, rotacionando se passar do tamanho máximo"""
+        rotacionado = None
+        self._travar()
+        try:
+            self._arquivo.write(conteudo)
+            self._arquivo.flush()
+            if self.fsync:
+                os.fsync(self._arquivo.fileno())
+
+            if self.tamanho_maximo and self._arquivo.tell() >= self.tamanho_maximo:
+                rotacionado = self._rotacionar_travado()
+        finally:
+            self._destravar()
+        if rotacionado is not None:
+            self._comprimir(rotacionado)
+
+    def _abrir(self):
+        """Abre o arquivo em modo append, escrevendo o cabeçalho se estiver vazio"""
+        self._arquivo = open(self.caminho, "a+", newline="", encoding="utf-8")
+        tamanho = self._arquivo.seek(0, os.SEEK_END)
+
+        if tamanho == 0:
+            self._arquivo.write(",".join(COLUNAS_SOLICITACOES) + "\n")
+        else:
+            # Garante que a primeira linha gravada não se junte à última existente
+            with open(self.caminho, "rb") as leitura:
+                leitura.seek(-1, os.SEEK_END)
+                if leitura.read(1) != b"\n":
+                    self._arquivo.write("\n")
+        self._arquivo.flush()
+
+    def _travar(self):
+        """Obtém a trava do arquivo, reabrindo-o se outro processo o rotacionou"""
+        while True:
+            if self._arquivo is None:
+                self._abrir()
+            if fcntl is None:
+                return
+
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+            try:
+                atual = os.stat(self.caminho)
+                aberto = os.fstat(self._arquivo.fileno())
+                if (atual.st_dev, atual.st_ino) == (aberto.st_dev, aberto.st_ino):
+                    return
+            except FileNotFoundError:
+                pass
+
+            self._destravar()
+            self._fechar_arquivo()
+
+    def _destravar(self):
+        if fcntl is not None and self._arquivo is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+
+    def _fechar_arquivo(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def _rotacionar(self):
+        try:
+            self._travar()
+            try:
+                rotacionado = self._rotacionar_travado()
+            finally:
+                self._destravar()
+            self._comprimir(rotacionado)
+        except Exception as e:
+            print(f"Erro ao rotacionar registro de solicitações: {e}")
+
+    def _rotacionar_travado(self) -> str:
+        """Renomeia o arquivo atual e abre um novo (chamado com a trava obtida); retorna o renomeado"""
+        base, extensao = os.path.splitext(self.caminho)
+        destino = f"{base}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}{extensao}"
+
+        os.rename(self.caminho, destino)
+        self._destravar()
+        self._fechar_arquivo()
+        self._abrir()
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+        return destino
+
+    def _comprimir(self, rotacionado: str):
+        """Comprime o arquivo rotacionado, fora da trava: as gravações seguem no arquivo novo
+
+        Enquanto o .gz é escrito, o original completo continua no disco (é o que
+        o relatório lê); só é removido depois.
+        """
+        if not self.comprimir_rotacionados:
+            return
+        with open(rotacionado, "rb") as origem, gzip.open(rotacionado + ".gz", "wb") as comprimido:
+            shutil.copyfileobj(origem, comprimido)
+        os.remove(rotacionado)
+
+
+_registros: Dict[str, RegistroSolicitacoes] = {}
+_registros_lock = threading.Lock()
+
+
+def obter_registro_solicitacoes(caminho: str = "solicitacoes_aumento_limite.csv") -> RegistroSolicitacoes:
+    """Retorna o registro compartilhado pelo processo para o arquivo informado
+
+    Lote, intervalo, fsync e rotação vêm das variáveis BANCO_AGIL_REGISTRO_*.
+    """
+    chave = os.path.abspath(caminho)
+    with _registros_lock:
+        if chave not in _registros:
+            intervalo_flush = os.getenv("BANCO_AGIL_REGISTRO_FLUSH")
+            tamanho_maximo = os.getenv("BANCO_AGIL_REGISTRO_TAMANHO_MAX")
+            _registros[chave] = RegistroSolicitacoes(
+                chave,
+                tamanho_lote=int(os.getenv("BANCO_AGIL_REGISTRO_LOTE", "100")),
+                intervalo_flush=float(intervalo_flush) if intervalo_flush else None,
+                fsync=os.getenv("BANCO_AGIL_REGISTRO_FSYNC") == "1",
+                tamanho_maximo=int(tamanho_maximo) if tamanho_maximo else None,
+                comprimir_rotacionados=os.getenv("BANCO_AGIL_REGISTRO_COMPRIMIR") == "1"
+            )
+        return _registros[chave]
+
+
+@atexit.register
+def _fechar_registros():
+    for registro in list(_registros.values()):
+        registro.fechar()
@@ -0,0 +1,273 @@
+"""Relatório incremental do log de solicitações de aumento de limite
+
+Calcula taxa de aprovação, aumento médio solicitado e volume por hora em uma
+única passada pelo CSV, lido em blocos de bytes (memória limitada ao bloco).
+
+Um checkpoint em JSON guarda os agregados, a posição (byte) já processada do
+arquivo e o último arquivo rotacionado já contabilizado; cada execução lê
+apenas as linhas novas. Se o log foi rotacionado (registro_solicitacoes.py
+renomeia o arquivo com data e hora e, opcionalmente, comprime com gzip), os
+arquivos rotacionados mais novos que o checkpoint são lidos em ordem (o
+primeiro a partir da posição salva, os demais inteiros) antes do arquivo atual.
+
+Uso:
+    python relatorio_solicitacoes.py
+    python relatorio_solicitacoes.py --checkpoint relatorio.json --json
+    python relatorio_solicitacoes.py --do-zero
+"""
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from registro_solicitacoes import COLUNAS_SOLICITACOES
+
+CHECKPOINT_PADRAO = "relatorio_solicitacoes.json"
+
+
+class AgregadosSolicitacoes:
+    """Totais por hora: [solicitações, aprovadas, soma do aumento solicitado]"""
+
+    def __init__(self, por_hora: Optional[Dict[str, List[float]]] = None, invalidas: int = 0):
+        self.por_hora = por_hora or {}
+        self.invalidas = invalidas
+
+    def adicionar(self, bloco: pd.DataFrame):
+        """Acumula um bloco de linhas do log (colunas de COLUNAS_SOLICITACOES)"""
+        atual = pd.to_numeric(bloco["limite_atual"], errors="coerce")
+        novo = pd.to_numeric(bloco["novo_limite_solicitado"], errors="coerce")
+        hora = bloco["data_hora_solicitacao"].astype(str).str.slice(0, 13)
+        validas = (atual.notna() & novo.notna() & (hora.str.len() == 13)).to_numpy()
+        self.invalidas += int((~validas).sum())
+        if not validas.any():
+            return
+
+        grupos = pd.DataFrame({
+            "hora": hora[validas],
+            "aprovadas": (bloco["status_pedido"][validas] == "aprovado").astype(np.int64),
+            "aumento": (novo - atual)[validas],
+        }).groupby("hora", sort=False).agg(
+            solicitacoes=("aprovadas", "size"), aprovadas=("aprovadas", "sum"), aumento=("aumento", "sum")
+        )
+        for hora_bloco, solicitacoes, aprovadas, aumento in zip(
+            grupos.index, grupos["solicitacoes"].tolist(), grupos["aprovadas"].tolist(), grupos["aumento"].tolist()
+        ):
+            totais = self.por_hora.setdefault(hora_bloco, [0, 0, 0.0])
+            totais[0] += solicitacoes
+            totais[1] += aprovadas
+            totais[2] += aumento
+
+    def resumo(self) -> dict:
+        solicitacoes = sum(t[0] for t in self.por_hora.values())
+        aprovadas = sum(t[1] for t in self.por_hora.values())
+        aumento = sum(t[2] for t in self.por_hora.values())
+        return {
+            "solicitacoes": solicitacoes,
+            "aprovadas": aprovadas,
+            "taxa_aprovacao": aprovadas / solicitacoes if solicitacoes else 0.0,
+            "aumento_medio": aumento / solicitacoes if solicitacoes else 0.0,
+            "linhas_invalidas": self.invalidas,
+            "por_hora": {
+                hora: {"solicitacoes": t[0], "aprovadas": t[1], "aumento_medio": t[2] / t[0]}
+                for hora, t in sorted(self.por_hora.items())
+            },
+        }
+
+
+def _ler_blocos(arquivo, tamanho_bloco: int, pular_cabecalho: bool):
+    """Lê linhas completas a partir da posição atual do arquivo binário
+
+    Gera (DataFrame, bytes consumidos). Uma linha final sem quebra de linha
+    (gravação em andamento) fica para a próxima execução.
+    """
+    resto = b""
+    while True:
+        dados = arquivo.read(tamanho_bloco)
+        if not dados:
+            return
+        dados = resto + dados
+        fim = dados.rfind(b"\n") + 1
+        if fim == 0:
+            resto = dados
+            continue
+        completas, resto = dados[:fim], dados[fim:]
+        consumidos = len(completas)
+
+        if pular_cabecalho:
+            completas = completas[completas.find(b"\n") + 1:]
+            pular_cabecalho = False
+
+        bloco = pd.read_csv(
+            io.BytesIO(completas), header=None, names=COLUNAS_SOLICITACOES,
+            dtype=str, skip_blank_lines=True
+        ) if completas.strip() else pd.DataFrame(columns=COLUNAS_SOLICITACOES)
+        yield bloco, consumidos
+
+
+def _processar_arquivo(arquivo, posicao: int, agregados: AgregadosSolicitacoes,
+                       tamanho_bloco: int) -> int:
+    """Acumula as linhas do arquivo aberto (binário) a partir de posicao e retorna a nova posição"""
+    arquivo.seek(posicao)
+    for bloco, consumidos in _ler_blocos(arquivo, tamanho_bloco, pular_cabecalho=posicao == 0):
+        agregados.adicionar(bloco)
+        posicao += consumidos
+    return posicao
+
+
+def _abrir_segmento(caminho: str):
+    """Abre um arquivo rotacionado, comprimido (.gz) ou não; posições são do conteúdo descomprimido"""
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rb")
+    try:
+        return open(caminho, "rb")
+    except FileNotFoundError:
+        # Comprimido depois de listado
+        return gzip.open(caminho + ".gz", "rb")
+
+
+def _inode(caminho: str) -> Optional[int]:
+    try:
+        return os.stat(caminho).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _segmentos_rotacionados(caminho: str) -> List[Tuple[str, str]]:
+    """Arquivos rotacionados do log como (nome sem .gz, caminho), do mais antigo ao mais novo
+
+    O nome traz a data e hora da rotação, então a ordem alfabética é a cronológica.
+    Durante a compressão, o arquivo sem .gz (ainda completo) é o escolhido.
+    """
+    base, extensao = os.path.splitext(caminho)
+    padrao = f"{glob.escape(base)}.*{extensao}"
+    segmentos: Dict[str, str] = {}
+    for candidato in glob.glob(padrao + ".gz") + glob.glob(padrao):
+        segmentos[os.path.basename(candidato[:-3] if candidato.endswith(".gz") else candidato)] = candidato
+    return sorted(segmentos.items())
+
+
+def _pendentes(segmentos: List[Tuple[str, str]], ultimo: Optional[str], inode: int) -> List[str]:
+    """Arquivos rotacionados depois do checkpoint; o primeiro é o que estava sendo lido
+
+    Checkpoints sem o nome do último arquivo rotacionado (formato anterior)
+    localizam o arquivo lido pelo inode, o que só funciona sem compressão.
+    """
+    if ultimo is not None:
+        return [caminho for nome, caminho in segmentos if nome > ultimo]
+    for indice, (_, caminho) in enumerate(segmentos):
+        if not caminho.endswith(".gz") and _inode(caminho) == inode:
+            return [caminho for _, caminho in segmentos[indice:]]
+    return []
+
+
+def carregar_checkpoint(caminho: str) -> Tuple[AgregadosSolicitacoes, Optional[int], int, Optional[str]]:
+    """Retorna (agregados, inode, posição, último arquivo rotacionado) do checkpoint,
+    ou vazios se não existir"""
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+    except FileNotFoundError:
+        return AgregadosSolicitacoes(), None, 0, None
+    return (
+        AgregadosSolicitacoes(dados["por_hora"], dados["invalidas"]),
+        dados["inode"], dados["posicao"], dados.get("ultimo_rotacionado")
+    )
+
+
+def salvar_checkpoint(caminho: str, agregados: AgregadosSolicitacoes, inode: Optional[int], posicao: int,
+                      ultimo_rotacionado: Optional[str] = None):
+    """Grava o checkpoint em arquivo temporário e substitui o anterior atomicamente"""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix=".json.tmp")
+    try:
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "inode": inode, "posicao": posicao, "ultimo_rotacionado": ultimo_rotacionado,
+                "por_hora": agregados.por_hora, "invalidas": agregados.invalidas
+            }, arquivo)
+        os.replace(temporario, caminho)
+    except Exception:
+        os.remove(temporario)
+        raise
+
+
+def atualizar_relatorio(
+    caminho_registro: str = "solicitacoes_aumento_limite.csv",
+    caminho_checkpoint: str = CHECKPOINT_PADRAO,
+    tamanho_bloco: int = 16 * 1024 * 1024
+) -> AgregadosSolicitacoes:
+    """Processa as linhas novas do log desde o último checkpoint e o atualiza"""
+    agregados, inode, posicao, ultimo = carregar_checkpoint(caminho_checkpoint)
+
+    try:
+        arquivo = open(caminho_registro, "rb")
+    except FileNotFoundError:
+        return agregados
+
+    with arquivo:
+        # inode e tamanho do arquivo efetivamente aberto, mesmo que ele seja rotacionado agora
+        atual = os.fstat(arquivo.fileno())
+        # O arquivo aberto pode ter acabado de ser rotacionado: é lido abaixo, pelo descritor
+        segmentos = [
+            (nome, caminho) for nome, caminho in _segmentos_rotacionados(caminho_registro)
+            if _inode(caminho) != atual.st_ino
+        ]
+
+        if inode is None:
+            # Sem checkpoint (primeira execução ou --do-zero): todos os rotacionados, do início
+            for _, caminho in segmentos:
+                with _abrir_segmento(caminho) as segmento:
+                    _processar_arquivo(segmento, 0, agregados, tamanho_bloco)
+        elif atual.st_ino != inode or atual.st_size < posicao:
+            # Log rotacionado: lê o restante do arquivo do checkpoint e os rotacionados depois dele
+            pendentes = _pendentes(segmentos, ultimo, inode)
+            if not pendentes:
+                print(f"Aviso: arquivo anterior do log não encontrado; linhas após o byte {posicao} não contabilizadas")
+            for i, caminho in enumerate(pendentes):
+                with _abrir_segmento(caminho) as segmento:
+                    _processar_arquivo(segmento, posicao if i == 0 else 0, agregados, tamanho_bloco)
+            posicao = 0
+
+        posicao = _processar_arquivo(arquivo, posicao, agregados, tamanho_bloco)
+
+    # "" (nenhum rotacionado) distingue do checkpoint no formato anterior (None)
+    ultimo = max([ultimo or ""] + [nome for nome, _ in segmentos])
+    salvar_checkpoint(caminho_checkpoint, agregados, atual.st_ino, posicao, ultimo)
+    return agregados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório incremental do log de solicitações")
+    parser.add_argument("--registro", default="solicitacoes_aumento_limite.csv")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PADRAO)
+    parser.add_argument("--tamanho-bloco", type=int, default=16 * 1024 * 1024, help="bytes lidos por bloco")
+    parser.add_argument("--do-zero", action="store_true", help="descarta o checkpoint e relê o log inteiro")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    if args.do_zero and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    resumo = atualizar_relatorio(args.registro, args.checkpoint, args.tamanho_bloco).resumo()
+    if args.json:
+        print(json.dumps(resumo, ensure_ascii=False, indent=2))
+        return
+
+    print(f"Solicitações: {resumo['solicitacoes']}   aprovadas: {resumo['aprovadas']} "
+          f"({resumo['taxa_aprovacao']:.1%})   aumento médio: R$ {resumo['aumento_medio']:.2f}   "
+          f"linhas inválidas: {resumo['linhas_invalidas']}")
+    print(f"\n{'hora':<14} {'solicitações':>12} {'aprovadas':>10} {'aumento médio':>14}")
+    for hora, totais in resumo["por_hora"].items():
+        print(f"{hora:<14} {totais['solicitacoes']:>12} {totais['aprovadas']:>10} "
+              f"{totais['aumento_medio']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
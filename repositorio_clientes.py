@@ -0,0 +1,55 @@
+import os
+import threading
+from typing import Dict, Optional
+
+from armazenamento import ArmazenamentoClientes, ClienteRegistro, criar_armazenamento
+from rastreamento import rastrear
+
+
+class RepositorioClientes:
+    """Acesso aos clientes por CPF sobre um backend de armazenamento plugável"""
+
+    def __init__(self, armazenamento: ArmazenamentoClientes):
+        self.armazenamento = armazenamento
+
+    def buscar(self, cpf: str) -> Optional[ClienteRegistro]:
+        """Retorna o registro do cliente ou None se o CPF não existir"""
+        with rastrear("armazenamento", operacao="buscar"):
+            return self.armazenamento.buscar(cpf)
+
+    def autenticar(self, cpf: str, data_nascimento: str) -> Optional[ClienteRegistro]:
+        """Retorna o registro se CPF e data de nascimento conferirem"""
+        cliente = self.buscar(cpf)
+        if cliente is not None and cliente.data_nascimento == data_nascimento:
+            return cliente
+        return None
+
+    def atualizar_limite(self, cpf: str, novo_limite: float):
+        """Atualiza o limite de crédito do cliente"""
+        with rastrear("armazenamento", operacao="atualizar_limite"):
+            self.armazenamento.atualizar(cpf, limite_credito=float(novo_limite))
+
+    def atualizar_score(self, cpf: str, novo_score: int):
+        """Atualiza o score do cliente"""
+        with rastrear("armazenamento", operacao="atualizar_score"):
+            self.armazenamento.atualizar(cpf, score=int(novo_score))
+
+    def atualizar_scores(self, scores: Dict[str, int]) -> int:
+        """Atualiza o score de muitos clientes numa única gravação; retorna quantos existiam"""
+        with rastrear("armazenamento", operacao="atualizar_scores", clientes=len(scores)):
+            return self.armazenamento.atualizar_em_lote(
+                "score", {cpf: int(score) for cpf, score in scores.items()}
+            )
+
+
+_repositorios: Dict[str, RepositorioClientes] = {}
+_repositorios_lock = threading.Lock()
+
+
+def obter_repositorio_clientes(caminho: str = "clientes.csv") -> RepositorioClientes:
+    """Retorna o repositório compartilhado pelo processo para o arquivo informado"""
+    chave = os.path.abspath(caminho)
+    with _repositorios_lock:
+        if chave not in _repositorios:
+            _repositorios[chave] = RepositorioClientes(criar_armazenamento(chave))
+        return _repositorios[chave]
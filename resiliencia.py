@@ -0,0 +1,375 @@
+"""Prazos, novas tentativas e disjuntor para as chamadas ao Gemini e à Tavily
+
+Os clientes externos são envolvidos por LLMResiliente e BuscaResiliente, com
+a mesma interface (invoke/ainvoke/stream/astream e search/asearch). Cada
+chamada tem um prazo total; falhas são repetidas com backoff e jitter dentro
+desse prazo. Nos streams (stream/astream) o prazo vale para cada trecho, não
+para a resposta inteira, e não há novas tentativas. O disjuntor de cada
+serviço abre quando a taxa de erros ou de chamadas lentas passa do limiar e,
+aberto, recusa as chamadas na hora com DisjuntorAberto: os fluxos de agents.py
+caem no fallback local (palavras-chave) sem esperar o provedor. Depois de
+`tempo_aberto`, uma chamada de teste decide se ele fecha de novo.
+
+As chamadas síncronas rodam nas threads do próprio serviço, em número
+limitado: chamadas travadas de um provedor não ocupam as threads do outro e,
+com todas ocupadas, a chamada é recusada na hora (ServicoSaturado, contada
+como falha no disjuntor) em vez de esperar na fila.
+"""
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from metricas import metricas
+
+METRICA_CHAMADAS = "chamadas_externas_total"
+METRICA_DISJUNTOR = "disjuntor_transicoes_total"
+
+FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+
+
+class DisjuntorAberto(Exception):
+    """O serviço está com o disjuntor aberto; a chamada nem foi feita"""
+
+
+class ServicoSaturado(DisjuntorAberto):
+    """Todas as threads do serviço estão ocupadas; a chamada nem foi feita"""
+
+
+class PrazoExcedido(TimeoutError):
+    """A chamada não terminou dentro do prazo"""
+
+
+class Disjuntor:
+    """Disjuntor por janela das últimas `janela` chamadas de um serviço"""
+
+    def __init__(
+        self,
+        servico: str,
+        janela: int = 20,
+        minimo_chamadas: int = 10,
+        taxa_erros: float = 0.5,
+        taxa_lentas: float = 0.5,
+        limite_lenta: float = 5.0,
+        tempo_aberto: float = 30.0
+    ):
+        """
+        limite_lenta: duração (s) a partir da qual uma chamada bem-sucedida conta como lenta
+        tempo_aberto: segundos com o disjuntor aberto antes da chamada de teste
+        """
+        self.servico = servico
+        self.minimo_chamadas = minimo_chamadas
+        self.taxa_erros = taxa_erros
+        self.taxa_lentas = taxa_lentas
+        self.limite_lenta = limite_lenta
+        self.tempo_aberto = tempo_aberto
+        self.estado = FECHADO
+        # (falhou, lenta) das últimas chamadas
+        self._resultados: deque = deque(maxlen=janela)
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    def _mudar(self, estado: str):
+        self.estado = estado
+        metricas.incrementar(METRICA_DISJUNTOR, servico=self.servico, estado=estado)
+
+    def permitir(self) -> bool:
+        """Levanta DisjuntorAberto se a chamada não deve ser feita agora; retorna
+        True se ela é a chamada de teste do disjuntor meio aberto"""
+        with self._lock:
+            if self.estado == FECHADO:
+                return False
+            if self.estado == ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto:
+                self._mudar(MEIO_ABERTO)
+            if self.estado == MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+        metricas.incrementar(METRICA_CHAMADAS, servico=self.servico, resultado="recusada")
+        raise DisjuntorAberto(f"Serviço {self.servico} indisponível (disjuntor aberto)")
+
+    def liberar_teste(self):
+        """Desiste da chamada de teste sem registrar resultado (ex.: cancelada pelo
+        chamador), para que a próxima chamada possa testar o serviço"""
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def registrar(self, falhou: bool, duracao: float):
+        lenta = not falhou and duracao >= self.limite_lenta
+        with self._lock:
+            if self.estado == MEIO_ABERTO:
+                self._teste_em_andamento = False
+                if falhou or lenta:
+                    self._abrir()
+                else:
+                    self._resultados.clear()
+                    self._mudar(FECHADO)
+                return
+
+            self._resultados.append((falhou, lenta))
+            total = len(self._resultados)
+            if self.estado == FECHADO and total >= self.minimo_chamadas:
+                falhas = sum(1 for f, _ in self._resultados if f)
+                lentas = sum(1 for _, l in self._resultados if l)
+                if falhas / total >= self.taxa_erros or lentas / total >= self.taxa_lentas:
+                    self._abrir()
+
+    def _abrir(self):
+        self._aberto_em = time.monotonic()
+        self._resultados.clear()
+        self._mudar(ABERTO)
+
+
+class Politica:
+    """Prazo total da chamada e novas tentativas com backoff exponencial e jitter"""
+
+    def __init__(self, prazo: float = 10.0, tentativas: int = 2, backoff: float = 0.2, backoff_maximo: float = 2.0):
+        self.prazo = prazo
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.backoff_maximo = backoff_maximo
+
+    def espera(self, tentativa: int) -> float:
+        """Backoff com jitter completo antes da tentativa seguinte (0, 1, ...)"""
+        return random.uniform(0, min(self.backoff_maximo, self.backoff * 2 ** tentativa))
+
+
+class _Executor:
+    """Threads que executam as chamadas síncronas de um serviço com prazo
+
+    Uma chamada travada ocupa sua thread até terminar, mas o turno segue sem
+    ela. Sem thread livre, submeter recusa a chamada em vez de enfileirá-la
+    atrás das travadas.
+    """
+
+    def __init__(self, servico: str, threads: int):
+        self.servico = servico
+        self._vagas = threading.BoundedSemaphore(threads)
+        self._threads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix=f"chamada-{servico}"
+        )
+
+    def submeter(self, funcao: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        if not self._vagas.acquire(blocking=False):
+            raise ServicoSaturado(f"Serviço {self.servico} sem threads livres")
+        try:
+            futuro = self._threads.submit(funcao, *args, **kwargs)
+        except BaseException:
+            self._vagas.release()
+            raise
+        # Também chamado se o futuro for cancelado antes de começar
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro
+
+
+class _Protegido:
+    """Executa chamadas de um serviço sob uma Politica e um Disjuntor"""
+
+    def __init__(self, cliente, servico: str, politica: Politica, disjuntor: Disjuntor, threads: int = 32):
+        """threads: chamadas síncronas simultâneas do serviço (as excedentes são recusadas)"""
+        self.cliente = cliente
+        self.servico = servico
+        self.politica = politica
+        self.disjuntor = disjuntor
+        self._executor = _Executor(servico, threads)
+
+    def __getattr__(self, nome):
+        # Demais atributos (ex.: contadores dos clientes falsos) vêm do cliente original
+        return getattr(self.cliente, nome)
+
+    def _registrar(self, resultado: str, inicio: float):
+        self.disjuntor.registrar(resultado != "ok", time.monotonic() - inicio)
+        metricas.incrementar(METRICA_CHAMADAS, servico=self.servico, resultado=resultado)
+
+    def _cancelar(self, teste: bool):
+        """Chamada interrompida pelo chamador (CancelledError, GeneratorExit, Ctrl+C):
+        não conta como falha do serviço, mas não pode prender a chamada de teste"""
+        if teste:
+            self.disjuntor.liberar_teste()
+        metricas.incrementar(METRICA_CHAMADAS, servico=self.servico, resultado="cancelada")
+
+    def _chamar(self, funcao: Callable, *args, **kwargs) -> Any:
+        limite = time.monotonic() + self.politica.prazo
+        for tentativa in range(max(1, self.politica.tentativas)):
+            teste = self.disjuntor.permitir()
+            inicio = time.monotonic()
+            try:
+                futuro = self._executor.submeter(funcao, *args, **kwargs)
+                resultado = futuro.result(timeout=max(0.0, limite - inicio))
+            except ServicoSaturado:
+                self._registrar("saturado", inicio)
+                raise
+            except concurrent.futures.TimeoutError:
+                futuro.cancel()
+                self._registrar("prazo", inicio)
+                raise PrazoExcedido(f"{self.servico}: sem resposta em {self.politica.prazo:.1f}s")
+            except Exception:
+                self._registrar("erro", inicio)
+                espera = self.politica.espera(tentativa)
+                if tentativa + 1 >= self.politica.tentativas or time.monotonic() + espera >= limite:
+                    raise
+                time.sleep(espera)
+                continue
+            except BaseException:
+                self._cancelar(teste)
+                raise
+            self._registrar("ok", inicio)
+            return resultado
+
+    async def _chamar_async(self, criar: Callable[[], Any]) -> Any:
+        limite = time.monotonic() + self.politica.prazo
+        for tentativa in range(max(1, self.politica.tentativas)):
+            teste = self.disjuntor.permitir()
+            inicio = time.monotonic()
+            try:
+                resultado = await asyncio.wait_for(criar(), max(0.0, limite - inicio))
+            except ServicoSaturado:
+                self._registrar("saturado", inicio)
+                raise
+            except asyncio.TimeoutError:
+                self._registrar("prazo", inicio)
+                raise PrazoExcedido(f"{self.servico}: sem resposta em {self.politica.prazo:.1f}s")
+            except Exception:
+                self._registrar("erro", inicio)
+                espera = self.politica.espera(tentativa)
+                if tentativa + 1 >= self.politica.tentativas or time.monotonic() + espera >= limite:
+                    raise
+                await asyncio.sleep(espera)
+                continue
+            except BaseException:
+                self._cancelar(teste)
+                raise
+            self._registrar("ok", inicio)
+            return resultado
+
+    def _transmitir(self, iterador: Callable[[], Iterator]) -> Iterator:
+        """Stream com prazo por trecho (não há prazo para a resposta inteira);
+        sem novas tentativas depois do primeiro trecho"""
+        teste = self.disjuntor.permitir()
+        inicio = time.monotonic()
+        fim = object()
+        try:
+            trechos = iterador()
+            while True:
+                futuro = self._executor.submeter(next, trechos, fim)
+                try:
+                    trecho = futuro.result(timeout=self.politica.prazo)
+                except concurrent.futures.TimeoutError:
+                    raise PrazoExcedido(f"{self.servico}: trecho não chegou em {self.politica.prazo:.1f}s")
+                if trecho is fim:
+                    break
+                yield trecho
+        except ServicoSaturado:
+            self._registrar("saturado", inicio)
+            raise
+        except PrazoExcedido:
+            self._registrar("prazo", inicio)
+            raise
+        except Exception:
+            self._registrar("erro", inicio)
+            raise
+        except BaseException:
+            # GeneratorExit: o consumidor abandonou o stream antes do fim
+            self._cancelar(teste)
+            raise
+        self._registrar("ok", inicio)
+
+    async def _transmitir_async(self, iterador: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """Versão assíncrona de _transmitir, também com prazo por trecho"""
+        teste = self.disjuntor.permitir()
+        inicio = time.monotonic()
+        try:
+            trechos = iterador().__aiter__()
+            while True:
+                try:
+                    trecho = await asyncio.wait_for(trechos.__anext__(), self.politica.prazo)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise PrazoExcedido(f"{self.servico}: trecho não chegou em {self.politica.prazo:.1f}s")
+                yield trecho
+        except PrazoExcedido:
+            self._registrar("prazo", inicio)
+            raise
+        except Exception:
+            self._registrar("erro", inicio)
+            raise
+        except BaseException:
+            self._cancelar(teste)
+            raise
+        self._registrar("ok", inicio)
+
+
+class LLMResiliente(_Protegido):
+    """Cliente de LLM (interface do ChatGoogleGenerativeAI) com prazo e disjuntor"""
+
+    def invoke(self, mensagens, **kwargs):
+        return self._chamar(self.cliente.invoke, mensagens, **kwargs)
+
+    async def ainvoke(self, mensagens, **kwargs):
+        return await self._chamar_async(lambda: self.cliente.ainvoke(mensagens, **kwargs))
+
+    def stream(self, mensagens, **kwargs) -> Iterator:
+        return self._transmitir(lambda: self.cliente.stream(mensagens, **kwargs))
+
+    def astream(self, mensagens, **kwargs) -> AsyncIterator:
+        return self._transmitir_async(lambda: self.cliente.astream(mensagens, **kwargs))
+
+
+class BuscaResiliente(_Protegido):
+    """Cliente de busca (interface do TavilyClient) com prazo e disjuntor"""
+
+    def search(self, query, **kwargs) -> dict:
+        return self._chamar(self.cliente.search, query, **kwargs)
+
+    async def asearch(self, query, **kwargs) -> dict:
+        asearch = getattr(self.cliente, "asearch", None)
+        if asearch is not None:
+            return await self._chamar_async(lambda: asearch(query, **kwargs))
+        # Cliente sem versão assíncrona: executa nas threads do serviço para não bloquear o loop
+        return await self._chamar_async(
+            lambda: asyncio.wrap_future(self._executor.submeter(self.cliente.search, query, **kwargs))
+        )
+
+
+def _politica_do_ambiente(servico: str, prazo_padrao: float) -> Politica:
+    return Politica(
+        prazo=float(os.getenv(f"BANCO_AGIL_PRAZO_{servico.upper()}", str(prazo_padrao))),
+        tentativas=int(os.getenv("BANCO_AGIL_TENTATIVAS", "2"))
+    )
+
+
+def _threads_do_ambiente() -> int:
+    return int(os.getenv("BANCO_AGIL_RESILIENCIA_THREADS", "16"))
+
+
+def _disjuntor_do_ambiente(servico: str, politica: Politica) -> Disjuntor:
+    return Disjuntor(
+        servico,
+        tempo_aberto=float(os.getenv("BANCO_AGIL_DISJUNTOR_ABERTO", "30")),
+        # Chamadas que gastam mais da metade do prazo contam como lentas
+        limite_lenta=politica.prazo / 2
+    )
+
+
+def envolver_llm(llm) -> LLMResiliente:
+    """LLM com a política do ambiente (BANCO_AGIL_PRAZO_LLM, padrão 15s)"""
+    if isinstance(llm, LLMResiliente):
+        return llm
+    politica = _politica_do_ambiente("llm", 15.0)
+    return LLMResiliente(llm, "llm", politica, _disjuntor_do_ambiente("llm", politica), _threads_do_ambiente())
+
+
+def envolver_busca(cliente) -> BuscaResiliente:
+    """Cliente de busca com a política do ambiente (BANCO_AGIL_PRAZO_BUSCA, padrão 10s)"""
+    if isinstance(cliente, BuscaResiliente):
+        return cliente
+    politica = _politica_do_ambiente("busca", 10.0)
+    return BuscaResiliente(
+        cliente, "busca", politica, _disjuntor_do_ambiente("busca", politica), _threads_do_ambiente()
+    )
@@ -0,0 +1,153 @@
+"""Roteamento declarativo do atendimento
+
+Os agentes (estados) e as trocas de agente disparadas por palavras-chave ficam
+numa tabela. As palavras-chave de todas as categorias são compiladas num único
+casador, que percorre cada mensagem uma vez e devolve as categorias presentes;
+novos agentes e categorias entram na tabela, sem outra varredura por turno.
+"""
+import functools
+import re
+import threading
+from types import GeneratorType
+from typing import Any, Dict, FrozenSet, Generator, Iterable, NamedTuple, Optional, Tuple
+
+Fluxo = Generator[Any, Any, Any]
+
+# Categorias de palavras-chave (casamento por substring na mensagem em minúsculas)
+PALAVRAS_CHAVE: Dict[str, Tuple[str, ...]] = {
+    "encerrar": ("tchau", "encerrar", "sair", "finalizar", "desligar", "até logo", "adeus"),
+    "aumento": ("aumento", "aumentar", "solicitar", "elevar", "novo limite"),
+    "afirmativa": ("sim", "quero", "aceito", "vamos", "pode", "prosseguir"),
+    "credito": ("limite", "aumento", "credito", "crédito", "cartão"),
+    "cambio": ("cotação", "cotacao", "cambio", "câmbio", "moeda", "dolar", "euro", "libra", "peso"),
+    "moeda_dolar": ("dolar", "dólar", "usd"),
+    "moeda_euro": ("euro", "eur"),
+    "moeda_libra": ("libra", "gbp"),
+    "moeda_peso": ("peso",),
+}
+
+# Moeda de cada categoria, em ordem de prioridade quando a mensagem cita mais de uma
+MOEDAS_POR_CATEGORIA = (
+    ("moeda_dolar", "dólar"),
+    ("moeda_euro", "euro"),
+    ("moeda_libra", "libra"),
+    ("moeda_peso", "peso argentino"),
+)
+
+# Moedas reconhecidas pelo atendimento de câmbio (e atualizadas pelo prefetch)
+MOEDAS_SUPORTADAS = tuple(moeda for _, moeda in MOEDAS_POR_CATEGORIA)
+
+
+class CasadorPalavras:
+    """Uma única regex com todas as palavras-chave, da mais longa para a mais curta
+
+    A busca é feita com lookahead em cada posição, então palavras sobrepostas
+    são encontradas. Numa posição a regex casa a palavra mais longa; as mais
+    curtas que também casam ali são prefixos dela, e por isso cada palavra
+    carrega as categorias dos seus prefixos.
+    """
+
+    def __init__(self, categorias: Dict[str, Iterable[str]], tamanho_cache: int = 4096):
+        palavras: Dict[str, set] = {}
+        for categoria, lista in categorias.items():
+            for palavra in lista:
+                palavras.setdefault(palavra.lower(), set()).add(categoria)
+
+        self._categorias_por_palavra = {
+            palavra: frozenset().union(*(cats for outra, cats in palavras.items() if palavra.startswith(outra)))
+            for palavra in palavras
+        }
+        alternativas = "|".join(re.escape(p) for p in sorted(palavras, key=len, reverse=True))
+        self._regex = re.compile(f"(?=({alternativas}))") if alternativas else None
+        # A mesma mensagem é consultada por vários handlers no turno: a varredura acontece uma vez
+        self.categorias = functools.lru_cache(maxsize=tamanho_cache)(self._varrer)
+
+    def _varrer(self, mensagem: str) -> FrozenSet[str]:
+        """Categorias cujas palavras-chave aparecem na mensagem"""
+        if not mensagem or self._regex is None:
+            return frozenset()
+        encontradas = set()
+        for match in self._regex.finditer(mensagem.lower()):
+            encontradas |= self._categorias_por_palavra[match.group(1)]
+        return frozenset(encontradas)
+
+    def menciona(self, mensagem: str, categoria: str) -> bool:
+        return categoria in self.categorias(mensagem)
+
+
+class Transicao(NamedTuple):
+    """Troca de agente quando a mensagem cita uma categoria e o contexto tem a marca"""
+    categoria: str
+    destino: str
+    entrada: str  # método do BancoAgilSystem chamado ao entrar no destino
+    condicao: str  # chave do contexto exigida (e removida ao transitar)
+    repassar_mensagem: bool = False
+
+
+class Estado(NamedTuple):
+    """Agente: método que processa a mensagem e transições verificadas antes dele"""
+    handler: str
+    transicoes: Tuple[Transicao, ...] = ()
+
+
+ESTADOS: Dict[str, Estado] = {
+    "triagem": Estado("_processar_triagem"),
+    "credito": Estado("_processar_credito", (
+        # Após uma solicitação, pedir câmbio leva direto à cotação
+        Transicao("cambio", "cambio", "_processar_cambio", "solicitacao_processada", repassar_mensagem=True),
+    )),
+    "entrevista": Estado("_processar_entrevista"),
+    "cambio": Estado("_processar_cambio", (
+        Transicao("credito", "credito", "_iniciar_agente_credito", "cotacao_realizada"),
+    )),
+}
+
+
+def _como_fluxo(resultado) -> Fluxo:
+    """Handlers podem ser geradores (chamam LLM/busca) ou devolver a resposta direto"""
+    if isinstance(resultado, GeneratorType):
+        return (yield from resultado)
+    return resultado
+
+
+class Roteador:
+    """Tabela de estados e casador de palavras-chave compartilhados pelo processo"""
+
+    def __init__(self, estados: Dict[str, Estado], palavras_chave: Dict[str, Iterable[str]]):
+        self._lock = threading.Lock()
+        self.estados = dict(estados)
+        self.palavras_chave = {categoria: tuple(lista) for categoria, lista in palavras_chave.items()}
+        self.casador = CasadorPalavras(self.palavras_chave)
+
+    def registrar(self, agente: str, estado: Estado, palavras_chave: Optional[Dict[str, Iterable[str]]] = None):
+        """Adiciona (ou substitui) um agente e, se informadas, novas categorias de palavras-chave"""
+        with self._lock:
+            self.estados[agente] = estado
+            if palavras_chave:
+                self.palavras_chave.update({c: tuple(lista) for c, lista in palavras_chave.items()})
+                self.casador = CasadorPalavras(self.palavras_chave)
+
+    def categorias(self, mensagem: str) -> FrozenSet[str]:
+        return self.casador.categorias(mensagem)
+
+    def menciona(self, mensagem: str, categoria: str) -> bool:
+        return categoria in self.casador.categorias(mensagem)
+
+    def rotear(self, sistema, mensagem: str) -> Fluxo:
+        """Executa o agente atual do sistema (ou a transição disparada pela mensagem)"""
+        estado = self.estados.get(sistema.agente_atual)
+        if estado is None:
+            return "Desculpe, ocorreu um erro. Por favor, reinicie o atendimento."
+
+        categorias = self.casador.categorias(mensagem)
+        for transicao in estado.transicoes:
+            if transicao.categoria in categorias and sistema.contexto.get(transicao.condicao):
+                sistema.agente_atual = transicao.destino
+                sistema.contexto.pop(transicao.condicao, None)
+                argumentos = (mensagem,) if transicao.repassar_mensagem else ()
+                return (yield from _como_fluxo(getattr(sistema, transicao.entrada)(*argumentos)))
+
+        return (yield from _como_fluxo(getattr(sistema, estado.handler)(mensagem)))
+
+
+roteador = Roteador(ESTADOS, PALAVRAS_CHAVE)
@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from armazenamento import ClienteRegistro
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional: sem ele, usa JSON compacto
+    msgpack = None
+
+_FORMATO_MSGPACK = b"\x01"
+_FORMATO_JSON = b"\x02"
+
+# Número máximo de mensagens (usuário + assistente) mantidas em memória por sessão
+MAXIMO_HISTORICO = int(os.getenv("BANCO_AGIL_HISTORICO_MAX", "40"))
+
+
+class HistoricoConversa:
+    """Histórico em buffer circular: guarda só as últimas `maximo` mensagens
+
+    A última mensagem do usuário fica disponível em O(1). Mensagens que saem
+    do buffer são entregues a `ao_descartar` (ex.: arquivamento no store de
+    sessões) ou simplesmente descartadas. A lista interna só cresce até
+    `maximo`; a partir daí as posições são reaproveitadas.
+    """
+    __slots__ = ("_mensagens", "_inicio", "_maximo", "ultima_mensagem_usuario", "ao_descartar")
+
+    def __init__(
+        self,
+        mensagens: Iterable[Dict[str, str]] = (),
+        maximo: Optional[int] = None,
+        ao_descartar: Optional[Callable[[Dict[str, str]], None]] = None
+    ):
+        maximo = MAXIMO_HISTORICO if maximo is None else maximo
+        if maximo < 2:
+            raise ValueError("O histórico precisa guardar ao menos 2 mensagens")
+        self._mensagens: List[Dict[str, str]] = []
+        self._inicio = 0
+        self._maximo = maximo
+        self.ultima_mensagem_usuario = ""
+        self.ao_descartar = None
+        for mensagem in mensagens:
+            self.append(mensagem)
+        self.ao_descartar = ao_descartar
+
+    @property
+    def maximo(self) -> int:
+        return self._maximo
+
+    def append(self, mensagem: Dict[str, str]):
+        if len(self._mensagens) < self._maximo:
+            self._mensagens.append(mensagem)
+        else:
+            if self.ao_descartar is not None:
+                self.ao_descartar(self._mensagens[self._inicio])
+            self._mensagens[self._inicio] = mensagem
+            self._inicio = (self._inicio + 1) % self._maximo
+        if mensagem["role"] == "user":
+            self.ultima_mensagem_usuario = mensagem["content"]
+
+    def __len__(self):
+        return len(self._mensagens)
+
+    def __iter__(self):
+        yield from self._mensagens[self._inicio:]
+        yield from self._mensagens[:self._inicio]
+
+    def __reversed__(self):
+        yield from reversed(self._mensagens[:self._inicio])
+        yield from reversed(self._mensagens[self._inicio:])
+
+    def __getitem__(self, indice: int) -> Dict[str, str]:
+        tamanho = len(self._mensagens)
+        if not -tamanho <= indice < tamanho:
+            raise IndexError("índice fora do histórico")
+        return self._mensagens[(self._inicio + indice) % tamanho]
+
+    def __repr__(self):
+        return f"HistoricoConversa({list(self)!r}, maximo={self._maximo})"
+
+
+class SessaoConcorrente(Exception):
+    """A sessão foi salva por outra requisição depois de carregada; a alteração foi descartada"""
+
+
+class EstadoSessao:
+    """Estado de uma conversa: compacto (__slots__) e serializável
+
+    cliente_dados guarda apenas o ClienteRegistro do cliente autenticado.
+    versao é a versão lida do store (0 se nova), usada para detectar escritas
+    concorrentes; não faz parte da serialização.
+    """
+    __slots__ = (
+        "id", "agente_atual", "cliente_autenticado", "cliente_dados",
+        "tentativas_auth", "conversa_encerrada", "contexto", "historico", "versao"
+    )
+
+    def __init__(
+        self,
+        id: Optional[str] = None,
+        agente_atual: str = "triagem",
+        cliente_autenticado: bool = False,
+        cliente_dados: Optional[ClienteRegistro] = None,
+        tentativas_auth: int = 0,
+        conversa_encerrada: bool = False,
+        contexto: Optional[dict] = None,
+        historico: Optional[Iterable[Dict[str, str]]] = None,
+        versao: int = 0
+    ):
+        self.id = id if id is not None else uuid.uuid4().hex
+        self.agente_atual = agente_atual
+        self.cliente_autenticado = cliente_autenticado
+        self.cliente_dados = cliente_dados
+        self.tentativas_auth = tentativas_auth
+        self.conversa_encerrada = conversa_encerrada
+        self.contexto = contexto if contexto is not None else {}
+        if not isinstance(historico, HistoricoConversa):
+            historico = HistoricoConversa(historico or ())
+        self.historico = historico
+        self.versao = versao
+
+    def __repr__(self):
+        return f"EstadoSessao(id={self.id!r}, agente_atual={self.agente_atual!r})"
+
+
+def serializar(estado: EstadoSessao) -> bytes:
+    """Serializa o estado em bytes (msgpack se disponível, senão JSON)"""
+    dados = [
+        estado.id,
+        estado.agente_atual,
+        estado.cliente_autenticado,
+        list(estado.cliente_dados) if estado.cliente_dados is not None else None,
+        estado.tentativas_auth,
+        estado.conversa_encerrada,
+        estado.contexto,
+        [[msg["role"], msg["content"]] for msg in estado.historico],
+    ]
+    if msgpack is not None:
+        return _FORMATO_MSGPACK + msgpack.packb(dados, use_bin_type=True)
+    return _FORMATO_JSON + json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def desserializar(dados: bytes) -> EstadoSessao:
+    """Reconstrói um EstadoSessao a partir de serializar()"""
+    formato, corpo = dados[:1], dados[1:]
+    if formato == _FORMATO_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Sessão serializada com msgpack, mas o pacote não está instalado")
+        campos = msgpack.unpackb(corpo, raw=False, strict_map_key=False)
+    elif formato == _FORMATO_JSON:
+        campos = json.loads(corpo.decode("utf-8"))
+    else:
+        raise ValueError(f"Formato de sessão desconhecido: {formato!r}")
+
+    id, agente_atual, autenticado, cliente, tentativas, encerrada, contexto, historico = campos
+    return EstadoSessao(
+        id=id,
+        agente_atual=agente_atual,
+        cliente_autenticado=autenticado,
+        cliente_dados=ClienteRegistro(*cliente) if cliente is not None else None,
+        tentativas_auth=tentativas,
+        conversa_encerrada=encerrada,
+        contexto=contexto,
+        historico=[{"role": papel, "content": conteudo} for papel, conteudo in historico],
+    )
+
+
+class ArmazenamentoSessoes(ABC):
+    """Interface dos stores de sessão (qualquer worker pode retomar qualquer conversa)"""
+
+    @abstractmethod
+    def obter(self, id: str) -> Optional[EstadoSessao]:
+        """Estado da sessão com a versão gravada (None se não existir)"""
+
+    @abstractmethod
+    def salvar(self, estado: EstadoSessao):
+        """Grava o estado se a sessão no store ainda estiver na versão estado.versao
+        (compare-and-swap) e incrementa a versão; senão levanta SessaoConcorrente"""
+
+    @abstractmethod
+    def remover(self, id: str):
+        """Remove a sessão e o seu histórico arquivado"""
+
+    @abstractmethod
+    def arquivar(self, id: str, mensagem: Dict[str, str]):
+        """Guarda uma mensagem que saiu do histórico em memória da sessão"""
+
+    @abstractmethod
+    def historico_arquivado(self, id: str) -> List[Dict[str, str]]:
+        """Mensagens arquivadas da sessão, da mais antiga para a mais recente"""
+
+
+class ArmazenamentoSessoesMemoria(ArmazenamentoSessoes):
+    """Store em memória do processo, com descarte LRU acima da capacidade"""
+
+    def __init__(self, capacidade: int = 100_000):
+        self.capacidade = capacidade
+        # id -> (versão, estado serializado)
+        self._sessoes: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        self._arquivo: Dict[str, List[Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, id: str) -> Optional[EstadoSessao]:
+        with self._lock:
+            registro = self._sessoes.get(id)
+            if registro is None:
+                return None
+            self._sessoes.move_to_end(id)
+        versao, dados = registro
+        estado = desserializar(dados)
+        estado.versao = versao
+        return estado
+
+    def salvar(self, estado: EstadoSessao):
+        dados = serializar(estado)
+        with self._lock:
+            registro = self._sessoes.get(estado.id)
+            # Sessão ausente (nova ou descartada pelo LRU) é gravada de novo
+            if registro is not None and registro[0] != estado.versao:
+                raise SessaoConcorrente(f"Sessão {estado.id} alterada por outra requisição")
+            self._sessoes[estado.id] = (estado.versao + 1, dados)
+            self._sessoes.move_to_end(estado.id)
+            estado.versao += 1
+            while len(self._sessoes) > self.capacidade:
+                descartada, _ = self._sessoes.popitem(last=False)
+                self._arquivo.pop(descartada, None)
+
+    def remover(self, id: str):
+        with self._lock:
+            self._sessoes.pop(id, None)
+            self._arquivo.pop(id, None)
+
+    def arquivar(self, id: str, mensagem: Dict[str, str]):
+        with self._lock:
+            self._arquivo.setdefault(id, []).append(mensagem)
+
+    def historico_arquivado(self, id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self._arquivo.get(id, ()))
+
+    def __len__(self):
+        return len(self._sessoes)
+
+
+class ArmazenamentoSessoesSQLite(ArmazenamentoSessoes):
+    """Store em SQLite (modo WAL), compartilhável entre processos da mesma máquina"""
+
+    def __init__(self, caminho: str = "sessoes.db"):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS sessoes (
+                    id TEXT PRIMARY KEY,
+                    dados BLOB NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    versao INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Bancos criados antes da coluna de versão
+            colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(sessoes)")}
+            if "versao" not in colunas:
+                conexao.execute("ALTER TABLE sessoes ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS historico_arquivado (
+                    id_sessao TEXT NOT NULL,
+                    papel TEXT NOT NULL,
+                    conteudo TEXT NOT NULL
+                )
+            """)
+            conexao.execute(
+                "CREATE INDEX IF NOT EXISTS idx_historico_sessao ON historico_arquivado (id_sessao)"
+            )
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão própria de cada thread"""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def obter(self, id: str) -> Optional[EstadoSessao]:
+        linha = self._conexao().execute("SELECT dados, versao FROM sessoes WHERE id = ?", (id,)).fetchone()
+        if not linha:
+            return None
+        estado = desserializar(linha[0])
+        estado.versao = linha[1]
+        return estado
+
+    def salvar(self, estado: EstadoSessao):
+        valores = (serializar(estado), time.time(), estado.versao + 1)
+        with self._conexao() as conexao:
+            # Só grava sobre a versão que foi lida: entre workers, a última escrita não vence
+            cursor = conexao.execute(
+                "UPDATE sessoes SET dados = ?, atualizado_em = ?, versao = ? WHERE id = ? AND versao = ?",
+                (*valores, estado.id, estado.versao)
+            )
+            if cursor.rowcount == 0:
+                cursor = conexao.execute(
+                    "INSERT OR IGNORE INTO sessoes (dados, atualizado_em, versao, id) VALUES (?, ?, ?, ?)",
+                    (*valores, estado.id)
+                )
+                if cursor.rowcount == 0:
+                    raise SessaoConcorrente(f"Sessão {estado.id} alterada por outra requisição")
+        estado.versao += 1
+
+    def remover(self, id: str):
+        with self._conexao() as conexao:
+            conexao.execute("DELETE FROM sessoes WHERE id = ?", (id,))
+            conexao.execute("DELETE FROM historico_arquivado WHERE id_sessao = ?", (id,))
+
+    def arquivar(self, id: str, mensagem: Dict[str, str]):
+        with self._conexao() as conexao:
+            conexao.execute(
+                "INSERT INTO historico_arquivado (id_sessao, papel, conteudo) VALUES (?, ?, ?)",
+                (id, mensagem["role"], mensagem["content"])
+            )
+
+    def historico_arquivado(self, id: str) -> List[Dict[str, str]]:
+        linhas = self._conexao().execute(
+            "SELECT papel, conteudo FROM historico_arquivado WHERE id_sessao = ? ORDER BY rowid", (id,)
+        ).fetchall()
+        return [{"role": papel, "content": conteudo} for papel, conteudo in linhas]
+
+    def remover_inativas(self, idade_maxima: float) -> int:
+        """Remove sessões sem atualização há mais de idade_maxima segundos"""
+        with self._conexao() as conexao:
+            limite = time.time() - idade_maxima
+            conexao.execute(
+                "DELETE FROM historico_arquivado WHERE id_sessao IN "
+                "(SELECT id FROM sessoes WHERE atualizado_em < ?)", (limite,)
+            )
+            cursor = conexao.execute("DELETE FROM sessoes WHERE atualizado_em < ?", (limite,))
+            return cursor.rowcount
+
+
+_armazenamento_sessoes: Optional[ArmazenamentoSessoes] = None
+_armazenamento_lock = threading.Lock()
+
+
+def obter_armazenamento_sessoes() -> ArmazenamentoSessoes:
+    """Store de sessões do processo: SQLite se BANCO_AGIL_SESSOES_DB estiver definida, senão memória"""
+    global _armazenamento_sessoes
+    with _armazenamento_lock:
+        if _armazenamento_sessoes is None:
+            caminho = os.getenv("BANCO_AGIL_SESSOES_DB")
+            if caminho:
+                _armazenamento_sessoes = ArmazenamentoSessoesSQLite(caminho)
+            else:
+                capacidade = int(os.getenv("BANCO_AGIL_SESSOES_MAX", "100000"))
+                _armazenamento_sessoes = ArmazenamentoSessoesMemoria(capacidade)
+        return _armazenamento_sessoes
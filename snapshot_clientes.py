@@ -0,0 +1,347 @@
+"""Snapshot binário colunar de clientes e da tabela score x limite
+
+Os workers mapeiam o arquivo em memória (mmap) na inicialização, sem parsing:
+o custo de abrir é o de ler o cabeçalho, e as páginas são compartilhadas entre
+processos (inclusive os criados por fork). Limite e score são atualizados no
+próprio arquivo, sob trava entre processos; nome e data de nascimento são fixos.
+
+Formato (little-endian; cada seção começa em múltiplo de 8 bytes):
+    cabeçalho   magic "BAGSNAP1", versão, nº de clientes, nº de faixas, bytes de nomes
+    cpf         uint64[n]   ordenado (busca binária)
+    limite      float64[n]
+    score       int64[n]
+    nascimento  S10[n]      "AAAA-MM-DD"
+    nome_inicio uint64[n+1] posições no heap de nomes
+    faixas      float64[k] x 3 (score_min, score_max, limite_maximo)
+    nomes       heap UTF-8
+
+Uso:
+    python snapshot_clientes.py converter --clientes clientes.csv --tabela score_limite.csv --saida banco_agil.snap
+    python snapshot_clientes.py verificar --snapshot banco_agil.snap --clientes clientes.csv --tabela score_limite.csv
+    export BANCO_AGIL_SNAPSHOT=banco_agil.snap
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import COLUNAS_CLIENTES, ArmazenamentoClientes, ClienteRegistro, _trava_arquivo
+
+MAGIC = b"BAGSNAP1"
+VERSAO = 1
+_CABECALHO = struct.Struct("<8sIIQQQ")
+_TAMANHO_CABECALHO = 64
+_TAMANHO_DATA = 10
+
+# Campos que podem ser atualizados no arquivo (largura fixa)
+_CAMPOS_ATUALIZAVEIS = {"limite_credito": "limite", "score": "score"}
+
+
+def _alinhar(posicao: int) -> int:
+    return (posicao + 7) & ~7
+
+
+def _layout(clientes: int, faixas: int) -> Dict[str, int]:
+    """Posição de cada seção no arquivo"""
+    secoes = [
+        ("cpf", clientes * 8), ("limite", clientes * 8), ("score", clientes * 8),
+        ("nascimento", clientes * _TAMANHO_DATA), ("nome_inicio", (clientes + 1) * 8),
+        ("faixa_min", faixas * 8), ("faixa_max", faixas * 8), ("faixa_limite", faixas * 8),
+    ]
+    posicoes = {}
+    posicao = _TAMANHO_CABECALHO
+    for nome, tamanho in secoes:
+        posicoes[nome] = posicao
+        posicao = _alinhar(posicao + tamanho)
+    posicoes["nomes"] = posicao
+    return posicoes
+
+
+def _cpfs_para_inteiros(cpfs: pd.Series) -> np.ndarray:
+    """Converte CPFs (texto com 11 dígitos) para uint64, validando o formato"""
+    cpfs = cpfs.astype(str)
+    invalidos = ~cpfs.str.fullmatch(r"\d{11}")
+    if invalidos.any():
+        raise ValueError(f"CPF(s) fora do formato de 11 dígitos: {cpfs[invalidos].head().tolist()}")
+    return cpfs.astype(np.uint64).to_numpy()
+
+
+def _ler_fontes(caminho_clientes: str, caminho_tabela: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Clientes (sem CPFs repetidos, vale a última linha, ordenados) e faixas da tabela"""
+    clientes = pd.read_csv(caminho_clientes, dtype={"cpf": str, "data_nascimento": str, "nome": str})
+    clientes = clientes.drop_duplicates("cpf", keep="last")
+    clientes["cpf_numero"] = _cpfs_para_inteiros(clientes["cpf"])
+    clientes = clientes.sort_values("cpf_numero", kind="stable").reset_index(drop=True)
+    faixas = pd.read_csv(caminho_tabela).sort_values("score_min", kind="stable")
+    return clientes, faixas
+
+
+def converter(caminho_clientes: str, caminho_tabela: str, caminho_snapshot: str) -> int:
+    """Gera o snapshot a partir dos CSVs e o instala atomicamente; retorna o nº de clientes"""
+    clientes, faixas = _ler_fontes(caminho_clientes, caminho_tabela)
+    quantidade, quantidade_faixas = len(clientes), len(faixas)
+
+    datas = clientes["data_nascimento"].astype(str)
+    if (datas.str.len() != _TAMANHO_DATA).any():
+        raise ValueError("data_nascimento deve estar no formato AAAA-MM-DD")
+
+    nomes = [nome.encode("utf-8") for nome in clientes["nome"].astype(str)]
+    inicios = np.zeros(quantidade + 1, dtype="<u8")
+    np.cumsum([len(nome) for nome in nomes], out=inicios[1:])
+    heap = b"".join(nomes)
+
+    posicoes = _layout(quantidade, quantidade_faixas)
+    colunas = {
+        "cpf": clientes["cpf_numero"].to_numpy(dtype="<u8"),
+        "limite": clientes["limite_credito"].to_numpy(dtype="<f8"),
+        "score": clientes["score"].to_numpy(dtype="<i8"),
+        "nascimento": datas.to_numpy(dtype=f"S{_TAMANHO_DATA}"),
+        "nome_inicio": inicios,
+        "faixa_min": faixas["score_min"].to_numpy(dtype="<f8"),
+        "faixa_max": faixas["score_max"].to_numpy(dtype="<f8"),
+        "faixa_limite": faixas["limite_maximo"].to_numpy(dtype="<f8"),
+    }
+
+    diretorio = os.path.dirname(os.path.abspath(caminho_snapshot))
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix=".snap.tmp")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(_CABECALHO.pack(MAGIC, VERSAO, 0, quantidade, quantidade_faixas, len(heap)))
+            for nome, valores in colunas.items():
+                arquivo.seek(posicoes[nome])
+                arquivo.write(valores.tobytes())
+            arquivo.seek(posicoes["nomes"])
+            arquivo.write(heap)
+        os.replace(temporario, caminho_snapshot)
+    except Exception:
+        os.remove(temporario)
+        raise
+    return quantidade
+
+
+class _Mapeamento:
+    """Arquivo mapeado e as colunas (arrays numpy sobre o mmap, sem cópia)"""
+
+    def __init__(self, caminho: str):
+        gravavel = os.access(caminho, os.W_OK)
+        with open(caminho, "r+b" if gravavel else "rb") as arquivo:
+            self.inode = os.fstat(arquivo.fileno()).st_ino
+            self.mmap = mmap.mmap(
+                arquivo.fileno(), 0, access=mmap.ACCESS_WRITE if gravavel else mmap.ACCESS_READ
+            )
+
+        magic, versao, _, self.quantidade, quantidade_faixas, tamanho_heap = _CABECALHO.unpack_from(self.mmap)
+        if magic != MAGIC or versao != VERSAO:
+            raise ValueError(f"{caminho} não é um snapshot de clientes (versão {VERSAO})")
+
+        posicoes = _layout(self.quantidade, quantidade_faixas)
+        n = self.quantidade
+
+        def coluna(nome, dtype, tamanho):
+            return np.frombuffer(self.mmap, dtype=dtype, count=tamanho, offset=posicoes[nome])
+
+        self.cpf = coluna("cpf", "<u8", n)
+        self.limite = coluna("limite", "<f8", n)
+        self.score = coluna("score", "<i8", n)
+        self.nascimento = coluna("nascimento", f"S{_TAMANHO_DATA}", n)
+        self.nome_inicio = coluna("nome_inicio", "<u8", n + 1)
+        self.faixa_min = coluna("faixa_min", "<f8", quantidade_faixas)
+        self.faixa_max = coluna("faixa_max", "<f8", quantidade_faixas)
+        self.faixa_limite = coluna("faixa_limite", "<f8", quantidade_faixas)
+        self.posicao_nomes = posicoes["nomes"]
+        self.tamanho_heap = tamanho_heap
+
+    def indice(self, cpf: str) -> int:
+        """Posição do CPF ou -1 se não existir"""
+        if len(cpf) != 11 or not cpf.isdigit():
+            return -1
+        valor = np.uint64(cpf)
+        i = int(np.searchsorted(self.cpf, valor))
+        return i if i < self.quantidade and self.cpf[i] == valor else -1
+
+    def indices(self, cpfs: pd.Series) -> np.ndarray:
+        """Posições de vários CPFs (-1 para os inexistentes ou mal formatados)"""
+        cpfs = cpfs.astype(str)
+        validos = cpfs.str.fullmatch(r"\d{11}").to_numpy()
+        valores = np.zeros(len(cpfs), dtype=np.uint64)
+        valores[validos] = cpfs[validos].astype(np.uint64).to_numpy()
+        posicoes = np.searchsorted(self.cpf, valores)
+        seguras = np.minimum(posicoes, max(self.quantidade - 1, 0))
+        encontrados = validos & (posicoes < self.quantidade) & (self.cpf[seguras] == valores)
+        return np.where(encontrados, posicoes, -1)
+
+    def nome(self, i: int) -> str:
+        inicio = self.posicao_nomes + int(self.nome_inicio[i])
+        fim = self.posicao_nomes + int(self.nome_inicio[i + 1])
+        return self.mmap[inicio:fim].decode("utf-8")
+
+    def registro(self, i: int) -> ClienteRegistro:
+        return ClienteRegistro(
+            self.nascimento[i].decode("ascii"), self.nome(i), float(self.limite[i]), int(self.score[i])
+        )
+
+
+class ArmazenamentoSnapshot(ArmazenamentoClientes):
+    """Backend sobre o snapshot mapeado em memória
+
+    Se o arquivo for substituído (nova conversão), o mapeamento é refeito na
+    próxima operação. Atualizações de limite e score são escritas no próprio
+    mapeamento (MAP_SHARED), visíveis para os outros processos imediatamente.
+    """
+
+    def __init__(self, caminho: str = "banco_agil.snap"):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._mapeamento = _Mapeamento(caminho)
+
+    def _atual(self) -> _Mapeamento:
+        """Mapeamento vigente, refeito se o arquivo foi substituído"""
+        mapeamento = self._mapeamento
+        if os.stat(self.caminho).st_ino != mapeamento.inode:
+            with self._lock:
+                if os.stat(self.caminho).st_ino != self._mapeamento.inode:
+                    self._mapeamento = _Mapeamento(self.caminho)
+                mapeamento = self._mapeamento
+        return mapeamento
+
+    def buscar(self, cpf: str) -> Optional[ClienteRegistro]:
+        mapeamento = self._atual()
+        i = mapeamento.indice(cpf)
+        return mapeamento.registro(i) if i >= 0 else None
+
+    def atualizar(self, cpf: str, **campos):
+        colunas = {campo: _CAMPOS_ATUALIZAVEIS.get(campo) for campo in campos}
+        if None in colunas.values():
+            raise ValueError(f"Campos não atualizáveis no snapshot: {sorted(c for c, v in colunas.items() if v is None)}")
+
+        with self._lock, _trava_arquivo(self.caminho + ".lock"):
+            mapeamento = self._atual()
+            i = mapeamento.indice(cpf)
+            if i < 0:
+                raise KeyError(f"CPF não encontrado: {cpf}")
+            for campo, coluna in colunas.items():
+                getattr(mapeamento, coluna)[i] = campos[campo]
+            mapeamento.mmap.flush()
+
+    def atualizar_em_lote(self, campo: str, valores: Dict[str, Any]) -> int:
+        coluna = _CAMPOS_ATUALIZAVEIS.get(campo)
+        if coluna is None:
+            raise ValueError(f"Campo não atualizável no snapshot: {campo}")
+
+        with self._lock, _trava_arquivo(self.caminho + ".lock"):
+            mapeamento = self._atual()
+            indices = mapeamento.indices(pd.Series(list(valores), dtype=str))
+            encontrados = indices >= 0
+            getattr(mapeamento, coluna)[indices[encontrados]] = np.asarray(list(valores.values()))[encontrados]
+            mapeamento.mmap.flush()
+            return int(encontrados.sum())
+
+    def registros(self) -> Iterator[Tuple[str, ClienteRegistro]]:
+        mapeamento = self._atual()
+        for i in range(mapeamento.quantidade):
+            yield f"{int(mapeamento.cpf[i]):011d}", mapeamento.registro(i)
+
+    def blocos(self, tamanho_bloco: int = 500_000) -> Iterator[pd.DataFrame]:
+        mapeamento = self._atual()
+        for inicio in range(0, mapeamento.quantidade, tamanho_bloco):
+            fim = min(inicio + tamanho_bloco, mapeamento.quantidade)
+            yield pd.DataFrame({
+                "cpf": np.char.zfill(mapeamento.cpf[inicio:fim].astype("U11"), 11),
+                "data_nascimento": mapeamento.nascimento[inicio:fim].astype("U10"),
+                "nome": [mapeamento.nome(i) for i in range(inicio, fim)],
+                "limite_credito": mapeamento.limite[inicio:fim].copy(),
+                "score": mapeamento.score[inicio:fim].copy(),
+            }, columns=COLUNAS_CLIENTES)
+
+    def faixas(self) -> pd.DataFrame:
+        """Tabela score x limite gravada no snapshot"""
+        mapeamento = self._atual()
+        return pd.DataFrame({
+            "score_min": mapeamento.faixa_min.copy(),
+            "score_max": mapeamento.faixa_max.copy(),
+            "limite_maximo": mapeamento.faixa_limite.copy(),
+        })
+
+
+_snapshots: Dict[str, ArmazenamentoSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def obter_snapshot(caminho: str) -> ArmazenamentoSnapshot:
+    """Snapshot compartilhado pelo processo (um único mapeamento por arquivo),
+    usado pelo backend de clientes e pela tabela score x limite"""
+    chave = os.path.abspath(caminho)
+    with _snapshots_lock:
+        if chave not in _snapshots:
+            _snapshots[chave] = ArmazenamentoSnapshot(chave)
+        return _snapshots[chave]
+
+
+def verificar(caminho_snapshot: str, caminho_clientes: str, caminho_tabela: str) -> List[str]:
+    """Compara o snapshot com os CSVs de origem; retorna a lista de divergências"""
+    mapeamento = _Mapeamento(caminho_snapshot)
+    clientes, faixas = _ler_fontes(caminho_clientes, caminho_tabela)
+    divergencias = []
+
+    if mapeamento.quantidade != len(clientes):
+        return [f"quantidade de clientes: snapshot {mapeamento.quantidade}, CSV {len(clientes)}"]
+
+    nomes = [nome.encode("utf-8") for nome in clientes["nome"].astype(str)]
+    heap = mapeamento.mmap[mapeamento.posicao_nomes:mapeamento.posicao_nomes + mapeamento.tamanho_heap]
+    comparacoes = {
+        "cpf": mapeamento.cpf == clientes["cpf_numero"].to_numpy(dtype=np.uint64),
+        "limite_credito": mapeamento.limite == clientes["limite_credito"].to_numpy(dtype=np.float64),
+        "score": mapeamento.score == clientes["score"].to_numpy(dtype=np.int64),
+        "data_nascimento": mapeamento.nascimento == clientes["data_nascimento"].astype(str).to_numpy(dtype="S10"),
+        "nome": np.diff(mapeamento.nome_inicio) == np.fromiter(map(len, nomes), dtype=np.uint64, count=len(nomes)),
+    }
+    for campo, iguais in comparacoes.items():
+        if not iguais.all():
+            exemplos = clientes["cpf"].to_numpy()[~iguais][:5].tolist()
+            divergencias.append(f"{campo}: {int((~iguais).sum())} cliente(s) divergente(s) (ex.: {exemplos})")
+    if comparacoes["nome"].all() and heap != b"".join(nomes):
+        divergencias.append("nome: conteúdo do heap de nomes difere do CSV")
+
+    for campo, coluna in (("score_min", mapeamento.faixa_min), ("score_max", mapeamento.faixa_max),
+                          ("limite_maximo", mapeamento.faixa_limite)):
+        origem = faixas[campo].to_numpy(dtype=np.float64)
+        if len(origem) != len(coluna) or not (origem == coluna).all():
+            divergencias.append(f"tabela score x limite: coluna {campo} difere")
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot binário de clientes e da tabela score x limite")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    for nome, ajuda in (("converter", "Gera o snapshot a partir dos CSVs"),
+                        ("verificar", "Confere se o snapshot corresponde aos CSVs")):
+        subcomando = subcomandos.add_parser(nome, help=ajuda)
+        subcomando.add_argument("--clientes", default="clientes.csv")
+        subcomando.add_argument("--tabela", default="score_limite.csv")
+        subcomando.add_argument("--snapshot", "--saida", dest="snapshot",
+                                default=os.getenv("BANCO_AGIL_SNAPSHOT", "banco_agil.snap"))
+    args = parser.parse_args()
+
+    if args.comando == "converter":
+        total = converter(args.clientes, args.tabela, args.snapshot)
+        print(f"{total} clientes gravados em {args.snapshot}")
+        return
+
+    divergencias = verificar(args.snapshot, args.clientes, args.tabela)
+    if divergencias:
+        print(f"Snapshot {args.snapshot} difere da origem:")
+        for divergencia in divergencias:
+            print(f"  {divergencia}")
+        sys.exit(1)
+    print(f"Snapshot {args.snapshot} confere com {args.clientes} e {args.tabela}")
+
+
+if __name__ == "__main__":
+    main()
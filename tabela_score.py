@@ -0,0 +1,116 @@
+import os
+import threading
+from bisect import bisect_right
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+class ScoreForaDaFaixaError(ValueError):
+    """Score não pertence a nenhuma faixa da tabela score x limite"""
+
+
+class _Faixas:
+    """Faixas ordenadas por score mínimo (listas para bisect, arrays para busca vetorizada)"""
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.sort_values("score_min", kind="stable")
+        self.minimos = df["score_min"].to_numpy(dtype=float)
+        self.maximos = df["score_max"].to_numpy(dtype=float)
+        self.limites = df["limite_maximo"].to_numpy(dtype=float)
+
+        if (self.minimos > self.maximos).any():
+            raise ValueError("Tabela score x limite possui faixa com score_min maior que score_max")
+        if (self.minimos[1:] <= self.maximos[:-1]).any():
+            raise ValueError("Tabela score x limite possui faixas sobrepostas")
+
+        self.minimos_lista = self.minimos.tolist()
+        self.maximos_lista = self.maximos.tolist()
+        self.limites_lista = self.limites.tolist()
+
+
+def _ler_tabela(caminho: str) -> pd.DataFrame:
+    """Lê a tabela do CSV ou, para arquivos .snap, do snapshot compartilhado (snapshot_clientes.py)"""
+    if caminho.endswith(".snap"):
+        from snapshot_clientes import obter_snapshot
+        return obter_snapshot(caminho).faixas()
+    return pd.read_csv(caminho)
+
+
+def _versao(caminho: str) -> int:
+    """Muda quando a tabela pode ter mudado: o mtime do CSV ou o inode do snapshot
+
+    As atualizações de limite e score gravadas no snapshot mudam o mtime, mas
+    não as faixas; uma nova tabela só chega ao snapshot substituindo o arquivo.
+    """
+    estado = os.stat(caminho)
+    return estado.st_ino if caminho.endswith(".snap") else estado.st_mtime_ns
+
+
+class TabelaScoreLimite:
+    """Tabela score x limite carregada uma vez e recarregada quando o arquivo muda"""
+
+    def __init__(self, caminho: str = "score_limite.csv"):
+        self.caminho = caminho
+        self._faixas = None
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def _obter_faixas(self) -> _Faixas:
+        """Retorna as faixas atuais, recarregando se o arquivo mudou (ver _versao)"""
+        versao = _versao(self.caminho)
+        if versao != self._versao:
+            with self._lock:
+                if versao != self._versao:
+                    self._faixas = _Faixas(_ler_tabela(self.caminho))
+                    self._versao = versao
+        return self._faixas
+
+    def limite_para(self, score: float) -> float:
+        """Retorna o limite máximo permitido para um score"""
+        faixas = self._obter_faixas()
+        i = bisect_right(faixas.minimos_lista, score) - 1
+
+        if i < 0 or score > faixas.maximos_lista[i]:
+            raise ScoreForaDaFaixaError(
+                f"Score {score} não pertence a nenhuma faixa da tabela score x limite"
+            )
+        return faixas.limites_lista[i]
+
+    def limites_para(self, scores, fora_da_faixa: str = "erro") -> np.ndarray:
+        """Calcula vetorialmente o limite permitido para um array de scores
+
+        fora_da_faixa: "erro" levanta ScoreForaDaFaixaError; "nan" devolve NaN nessas posições
+        """
+        faixas = self._obter_faixas()
+        scores = np.asarray(scores, dtype=float)
+
+        indices = np.searchsorted(faixas.minimos, scores, side="right") - 1
+        seguros = np.clip(indices, 0, None)
+        validos = (indices >= 0) & (scores <= faixas.maximos[seguros])
+
+        if not validos.all():
+            if fora_da_faixa == "erro":
+                invalidos = scores[~validos]
+                raise ScoreForaDaFaixaError(
+                    f"{invalidos.size} score(s) fora das faixas da tabela score x limite "
+                    f"(ex.: {invalidos[:5].tolist()})"
+                )
+            if fora_da_faixa != "nan":
+                raise ValueError(f"Opção fora_da_faixa inválida: {fora_da_faixa}")
+
+        return np.where(validos, faixas.limites[seguros], np.nan)
+
+
+_tabelas: Dict[str, TabelaScoreLimite] = {}
+_tabelas_lock = threading.Lock()
+
+
+def obter_tabela_score(caminho: str = "score_limite.csv") -> TabelaScoreLimite:
+    """Retorna a tabela compartilhada pelo processo para o arquivo informado"""
+    chave = os.path.abspath(caminho)
+    with _tabelas_lock:
+        if chave not in _tabelas:
+            _tabelas[chave] = TabelaScoreLimite(chave)
+        return _tabelas[chave]
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_google_genai")
+
+from agents import BancoAgilSystem
+from clientes_falsos import BuscaFalsa, LLMFalso
+from infraestrutura import Infraestrutura
+from sessao import ArmazenamentoSessoesMemoria, SessaoConcorrente
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVOS_DADOS = ("clientes.csv", "score_limite.csv")
+
+ENCERRAMENTO = "Obrigado por utilizar o Banco Ágil! Até logo! 👋"
+
+# (mensagens, agente depois de cada turno)
+CONVERSAS = {
+    "credito_entrevista": (
+        ["", "11122233344", "10/03/1992", "quero aumento de limite para 8000", "sim",
+         "9000", "1", "1000", "0", "não", "12000", "tchau"],
+        ["triagem", "triagem", "triagem", "credito", "entrevista",
+         "entrevista", "entrevista", "entrevista", "entrevista", "credito", "credito", "credito"],
+    ),
+    "cambio_para_credito": (
+        ["", "55566677788", "30/11/1988", "qual a cotação do peso argentino?", "e o dólar?",
+         "agora quero ver meu limite", "quero aumentar para 25000", "tchau"],
+        ["triagem", "triagem", "triagem", "cambio", "cambio",
+         "credito", "credito", "credito"],
+    ),
+    "credito_para_cambio": (
+        ["", "12345678901", "15/05/1990", "quero aumentar meu limite para 7000",
+         "qual a cotação do euro?", "não"],
+        ["triagem", "triagem", "triagem", "credito", "cambio", "cambio"],
+    ),
+}
+
+
+def _sincrono(sistema, mensagem):
+    return sistema.processar_mensagem(mensagem)
+
+
+def _transmitindo(sistema, mensagem):
+    return "".join(sistema.transmitir_mensagem(mensagem))
+
+
+def _conversar(sistema, mensagens, responder):
+    transcricao = []
+    for mensagem in mensagens:
+        resposta = responder(sistema, mensagem)
+        transcricao.append((resposta, sistema.agente_atual))
+    return transcricao
+
+
+def _conversar_async(sistema, mensagens):
+    async def conversar():
+        transcricao = []
+        for mensagem in mensagens:
+            resposta = await sistema.processar_mensagem_async(mensagem)
+            transcricao.append((resposta, sistema.agente_atual))
+        return transcricao
+
+    return asyncio.run(conversar())
+
+
+EXECUTORES = {
+    "sync": lambda sistema, mensagens: _conversar(sistema, mensagens, _sincrono),
+    "async": _conversar_async,
+    "stream": lambda sistema, mensagens: _conversar(sistema, mensagens, _transmitindo),
+}
+
+
+@pytest.fixture
+def conversar(tmp_path, monkeypatch):
+    """Executa a conversa com clientes falsos, cada vez sobre uma cópia nova da base"""
+    for variavel in ("BANCO_AGIL_DB", "BANCO_AGIL_SNAPSHOT", "BANCO_AGIL_ARQUIVAR_HISTORICO"):
+        monkeypatch.delenv(variavel, raising=False)
+
+    def executar(executor: str, mensagens):
+        diretorio = tmp_path / executor
+        diretorio.mkdir()
+        for nome in ARQUIVOS_DADOS:
+            shutil.copy(os.path.join(RAIZ, nome), diretorio)
+        monkeypatch.chdir(diretorio)
+
+        infraestrutura = Infraestrutura(llm=LLMFalso(semente=1), tavily_client=BuscaFalsa(semente=1))
+        # Cada executor passa pelo LLM e pela busca, sem respostas deixadas pelo anterior
+        infraestrutura.cache_cotacoes.limpar()
+        infraestrutura.cache_classificacao.limpar()
+        try:
+            return EXECUTORES[executor](BancoAgilSystem(infraestrutura), mensagens)
+        finally:
+            infraestrutura.registro_solicitacoes.flush()
+
+    return executar
+
+
+@pytest.mark.parametrize("nome", sorted(CONVERSAS))
+def test_executores_produzem_a_mesma_conversa(conversar, nome):
+    mensagens, agentes = CONVERSAS[nome]
+    sincrono = conversar("sync", mensagens)
+
+    assert [agente for _, agente in sincrono] == agentes
+    assert sincrono[-1][0] == ENCERRAMENTO
+    assert conversar("async", mensagens) == sincrono
+    assert conversar("stream", mensagens) == sincrono
+
+
+def test_entrevista_reavalia_score_e_aprova_novo_pedido(conversar):
+    mensagens, _ = CONVERSAS["credito_entrevista"]
+    respostas = [resposta for resposta, _ in conversar("sync", mensagens)]
+
+    assert "Autenticação realizada com sucesso" in respostas[2]
+    assert "não pode ser aprovada" in respostas[3]
+    assert "R$ 7000.00" in respostas[3]
+    assert "Primeira pergunta" in respostas[4]
+    assert "Seu score foi atualizado de 550 para 769" in respostas[9]
+    # Com o novo score a faixa permite até R$ 15000,00
+    assert "APROVADA" in respostas[10]
+    assert "R$ 12000.00" in respostas[10]
+
+
+def test_transicoes_do_roteador_levam_a_cotacao_e_ao_limite(conversar):
+    mensagens, _ = CONVERSAS["cambio_para_credito"]
+    respostas = [resposta for resposta, _ in conversar("sync", mensagens)]
+
+    assert "Qual moeda você gostaria de consultar?" in respostas[3]
+    assert "DÓLAR" in respostas[4] and "R$ 5,00" in respostas[4]
+    # cambio -> credito pela tabela de transições, depois da primeira cotação
+    assert "limite de crédito atual é de R$ 20000.00" in respostas[5]
+
+    mensagens, _ = CONVERSAS["credito_para_cambio"]
+    respostas = [resposta for resposta, _ in conversar("async", mensagens)]
+    assert "APROVADA" in respostas[3]
+    # credito -> cambio repassa a mensagem: a cotação vem no mesmo turno
+    assert "EURO" in respostas[4] and "R$ 5,40" in respostas[4]
+
+
+def test_historico_so_e_arquivado_quando_a_sessao_e_salva(tmp_path, monkeypatch):
+    monkeypatch.setenv("BANCO_AGIL_ARQUIVAR_HISTORICO", "1")
+    monkeypatch.chdir(tmp_path)
+    infraestrutura = Infraestrutura(llm=LLMFalso(semente=1), tavily_client=BuscaFalsa(semente=1))
+    store = infraestrutura.armazenamento_sessoes = ArmazenamentoSessoesMemoria()
+
+    sistema = BancoAgilSystem(infraestrutura)
+    sistema.salvar()
+    outro = BancoAgilSystem.retomar(sistema.id_sessao, infraestrutura)
+    outro.salvar()
+
+    historico = sistema.estado.historico
+    for i in range(historico.maximo + 1):
+        historico.append({"role": "user", "content": f"m{i}"})
+    # Gravação recusada: a mensagem que saiu do buffer não é arquivada
+    with pytest.raises(SessaoConcorrente):
+        sistema.salvar()
+    assert store.historico_arquivado(sistema.id_sessao) == []
+
+    historico = outro.estado.historico
+    for i in range(historico.maximo + 2):
+        historico.append({"role": "user", "content": f"n{i}"})
+    assert store.historico_arquivado(outro.id_sessao) == []
+    outro.salvar()
+    assert store.historico_arquivado(outro.id_sessao) == [
+        {"role": "user", "content": "n0"}, {"role": "user", "content": "n1"}
+    ]
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from armazenamento import ArmazenamentoSQLite
+
+CABECALHO = "cpf,data_nascimento,nome,limite_credito,score\n"
+
+
+def escrever(caminho, *linhas):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write(CABECALHO + "".join(linha + "\n" for linha in linhas))
+
+
+def test_importar_csv_substitui_a_base(tmp_path):
+    csv = str(tmp_path / "clientes.csv")
+    banco = ArmazenamentoSQLite(str(tmp_path / "banco.db"))
+
+    escrever(csv, "00000000001,1990-01-01,Ana,1000.0,500", "00000000002,1991-02-02,Bia,2000.0,600")
+    assert banco.importar_csv(csv) == 2
+
+    escrever(csv, "00000000002,1991-02-02,Bia,2500.0,650")
+    assert banco.importar_csv(csv) == 1
+
+    assert banco.buscar("00000000001") is None
+    cliente = banco.buscar("00000000002")
+    assert cliente.limite_credito == 2500.0
+    assert cliente.score == 650
+
+
+def test_importar_csv_com_erro_mantem_a_base(tmp_path):
+    csv = str(tmp_path / "clientes.csv")
+    banco = ArmazenamentoSQLite(str(tmp_path / "banco.db"))
+    escrever(csv, "00000000001,1990-01-01,Ana,1000.0,500")
+    banco.importar_csv(csv)
+
+    escrever(csv, "00000000002,1991-02-02,Bia,2000.0,sem-score")
+    with pytest.raises(ValueError):
+        banco.importar_csv(csv)
+
+    assert banco.buscar("00000000001") is not None
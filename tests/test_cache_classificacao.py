@@ -0,0 +1,90 @@
+import pytest
+
+from cache_classificacao import CacheClassificacao, normalizar_mensagem, taxa_acerto, trigramas
+from metricas import metricas
+
+CONTEXTO = "Posso ajudá-lo com algo mais?"
+
+
+@pytest.fixture(autouse=True)
+def metricas_limpas():
+    metricas.limpar()
+    yield
+    metricas.limpar()
+
+
+def test_normalizacao_da_chave():
+    assert normalizar_mensagem("  Não,   obrigado!! ") == "nao obrigado"
+    assert trigramas("ab") == frozenset({" ab", "ab "})
+
+
+def test_chave_exata_normalizada():
+    cache = CacheClassificacao()
+    cache.definir("negativa", CONTEXTO, "Não, obrigado!", "SIM")
+
+    assert cache.obter("negativa", CONTEXTO, "nao obrigado") == "SIM"
+    # Prompt ou contexto diferentes são outras entradas
+    assert cache.obter("classificacao", CONTEXTO, "nao obrigado") is None
+    assert cache.obter("negativa", "Gostaria de consultar outra moeda?", "nao obrigado") is None
+
+
+@pytest.mark.parametrize("consulta, esperado", [
+    # Parecida e sem negação, como a armazenada: reaproveita
+    ("quero ver a cotacao do dolar hoje", "cambio"),
+    ("queria ver a cotação do dólar", "cambio"),
+    # Parecida, mas com negação: polaridade diferente, vai ao LLM
+    ("nao quero ver a cotacao do dolar", None),
+    # Pouco parecida
+    ("quero aumentar meu limite", None),
+])
+def test_similaridade_por_trigramas(consulta, esperado):
+    cache = CacheClassificacao(similaridade=0.6)
+    cache.definir("classificacao", CONTEXTO, "quero ver a cotacao do dolar", "cambio")
+    assert cache.obter("classificacao", CONTEXTO, consulta) == esperado
+
+
+def test_similaridade_desligada():
+    cache = CacheClassificacao()
+    cache.definir("classificacao", CONTEXTO, "quero ver a cotacao do dolar", "cambio")
+    assert cache.obter("classificacao", CONTEXTO, "quero ver a cotacao do dolar hoje") is None
+
+
+def test_lru_descarta_a_menos_usada_e_limpa_o_indice():
+    cache = CacheClassificacao(capacidade=2, similaridade=0.6)
+    cache.definir("negativa", CONTEXTO, "quero ver a cotacao do dolar", "NAO")
+    cache.definir("negativa", CONTEXTO, "quero aumentar meu limite", "NAO")
+    cache.obter("negativa", CONTEXTO, "quero ver a cotacao do dolar")
+    cache.definir("negativa", CONTEXTO, "ta bom assim", "SIM")
+
+    assert len(cache) == 2
+    assert cache.obter("negativa", CONTEXTO, "quero aumentar meu limite") is None
+    assert cache.obter("negativa", CONTEXTO, "quero aumentar meu limite de credito") is None
+    assert cache.obter("negativa", CONTEXTO, "quero ver a cotacao do dolar") == "NAO"
+
+
+def test_taxa_de_acerto_por_prompt():
+    cache = CacheClassificacao(similaridade=0.6)
+    cache.definir("classificacao", CONTEXTO, "quero ver a cotacao do dolar", "cambio")
+    cache.obter("classificacao", CONTEXTO, "quero ver a cotacao do dolar")
+    cache.obter("classificacao", CONTEXTO, "quero ver a cotacao do dolar hoje")
+    cache.obter("classificacao", CONTEXTO, "oi")
+    cache.obter("negativa", CONTEXTO, "oi")
+
+    assert taxa_acerto() == {"classificacao": pytest.approx(2 / 3), "negativa": 0.0}
+
+
+def test_persistencia_em_sqlite(tmp_path):
+    caminho = str(tmp_path / "cache.db")
+    cache = CacheClassificacao(capacidade=2, caminho=caminho)
+    cache.definir("negativa", CONTEXTO, "agora nao", "SIM")
+    cache.definir("negativa", CONTEXTO, "sim", "NAO")
+    cache.definir("negativa", CONTEXTO, "claro", "NAO")
+
+    # Reinício: as entradas que couberam no LRU voltam do banco
+    reaberto = CacheClassificacao(capacidade=2, similaridade=0.6, caminho=caminho)
+    assert len(reaberto) == 2
+    assert reaberto.obter("negativa", CONTEXTO, "agora nao") is None
+    assert reaberto.obter("negativa", CONTEXTO, "Claro!") == "NAO"
+
+    reaberto.limpar()
+    assert len(CacheClassificacao(caminho=caminho)) == 0
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cache_cotacoes import METRICA_CACHE, CacheCotacoes
+from metricas import metricas
+
+
+def coalescidas() -> float:
+    return metricas.contadores(METRICA_CACHE).get((("resultado", "coalescido"),), 0)
+
+
+def trechos_e_valor(cache, carregar):
+    trechos, gerador = [], cache.obter_transmitindo("dólar", carregar)
+    while True:
+        try:
+            trechos.append(next(gerador))
+        except StopIteration as fim:
+            return trechos, fim.value
+
+
+def test_buscas_concorrentes_sao_coalescidas():
+    cache = CacheCotacoes()
+    liberar = threading.Event()
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        liberar.wait(5)
+        return "R$ 5,00"
+
+    resultados = []
+    threads = [
+        threading.Thread(target=lambda: resultados.append(cache.obter("dólar", carregar)))
+        for _ in range(8)
+    ]
+    antes = coalescidas()
+    for thread in threads:
+        thread.start()
+    # Só libera a busca quando as outras 7 threads estão esperando por ela
+    limite = time.monotonic() + 5
+    while coalescidas() - antes < 7 and time.monotonic() < limite:
+        time.sleep(0.001)
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(chamadas) == 1
+    assert resultados == ["R$ 5,00"] * 8
+
+
+def test_erro_da_busca_chega_a_todos_e_nao_fica_em_cache():
+    cache = CacheCotacoes()
+
+    def carregar():
+        raise ConnectionError("fora do ar")
+
+    with pytest.raises(ConnectionError):
+        cache.obter("euro", carregar)
+    assert cache.idade("euro") is None
+    assert cache.obter("euro", lambda: "R$ 5,40") == "R$ 5,40"
+
+
+def test_buscas_assincronas_sao_coalescidas():
+    cache = CacheCotacoes()
+    chamadas = []
+
+    async def carregar():
+        chamadas.append(1)
+        await asyncio.sleep(0.01)
+        return "R$ 6,30"
+
+    async def principal():
+        return await asyncio.gather(*(cache.obter_async("libra", carregar) for _ in range(10)))
+
+    assert asyncio.run(principal()) == ["R$ 6,30"] * 10
+    assert len(chamadas) == 1
+
+
+def test_cancelar_quem_espera_nao_cancela_a_busca_compartilhada():
+    cache = CacheCotacoes()
+
+    async def carregar():
+        await asyncio.sleep(0.01)
+        return "R$ 5,00"
+
+    async def principal():
+        primeira = asyncio.ensure_future(cache.obter_async("dólar", carregar))
+        segunda = asyncio.ensure_future(cache.obter_async("dólar", carregar))
+        await asyncio.sleep(0)
+        primeira.cancel()
+        return await segunda
+
+    assert asyncio.run(principal()) == "R$ 5,00"
+
+
+def test_expira_depois_do_ttl():
+    agora = [0.0]
+    cache = CacheCotacoes(ttl=60, relogio=lambda: agora[0])
+    cache.obter("dólar", lambda: "antiga")
+
+    agora[0] = 59
+    assert cache.obter("dólar", lambda: "nova") == "antiga"
+    agora[0] = 60
+    assert cache.obter("dólar", lambda: "nova") == "nova"
+
+
+def test_busca_transmitida_e_coalescida():
+    cache = CacheCotacoes()
+    liberar = threading.Event()
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        yield "R$ "
+        liberar.wait(5)
+        yield "5,00"
+        return "R$ 5,00"
+
+    lider = cache.obter_transmitindo("dólar", carregar)
+    assert next(lider) == "R$ "
+
+    # Enquanto o líder transmite, outra requisição espera o valor sem nova busca
+    resultados = []
+    antes = coalescidas()
+    seguidora = threading.Thread(target=lambda: resultados.append(trechos_e_valor(cache, carregar)))
+    seguidora.start()
+    limite = time.monotonic() + 5
+    while coalescidas() == antes and time.monotonic() < limite:
+        time.sleep(0.001)
+    liberar.set()
+
+    assert list(lider) == ["5,00"]
+    seguidora.join(5)
+    assert resultados == [([], "R$ 5,00")]
+    assert len(chamadas) == 1
+    assert cache.obter("dólar", lambda: pytest.fail("deveria vir do cache")) == "R$ 5,00"
+
+
+def test_stream_abandonado_falha_para_quem_esperava():
+    cache = CacheCotacoes()
+
+    def carregar():
+        yield "R$ "
+        return "R$ 5,00"
+
+    lider = cache.obter_transmitindo("euro", carregar)
+    next(lider)
+    voo = cache._em_voo["euro"]
+    lider.close()
+
+    assert isinstance(voo.erro, ConnectionAbortedError)
+    assert "euro" not in cache._em_voo
+    assert cache.idade("euro") is None
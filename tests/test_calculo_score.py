@@ -0,0 +1,88 @@
+import itertools
+import random
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import calculo_score
+from calculo_score import (
+    PESO_DEPENDENTES, PESO_DIVIDAS, PESO_EMPREGO, calcular_score, calcular_scores, recalcular_blocos
+)
+
+
+def test_vetorizada_igual_a_escalar():
+    aleatorio = random.Random(7)
+    rendas = [0, 0.5, 999.99, 1500, 5000, 12345.67, 50000, 1e6] + [aleatorio.uniform(0, 30000) for _ in range(40)]
+    despesas = [0, 0.01, 1, 999.99, 1000, 4000, 20000] + [aleatorio.uniform(0, 10000) for _ in range(20)]
+    linhas = [
+        (renda, emprego, despesa, dependentes, dividas)
+        for renda, despesa in zip(rendas, itertools.cycle(despesas))
+        for emprego, dependentes, dividas in itertools.product(PESO_EMPREGO, PESO_DEPENDENTES, PESO_DIVIDAS)
+    ]
+    entrevistas = pd.DataFrame(linhas, columns=[
+        "renda_mensal", "tipo_emprego", "despesas_fixas", "dependentes", "dividas"
+    ])
+
+    scores, validas = calcular_scores(entrevistas)
+
+    assert validas.all()
+    assert scores.tolist() == [calcular_score(*linha) for linha in linhas]
+
+
+def test_linhas_invalidas_e_sinonimos():
+    entrevistas = pd.DataFrame({
+        "renda_mensal": [5000, -1, None, 5000, 5000, "abc", 5000],
+        "tipo_emprego": ["Autonomo", "formal", "formal", "estagiário", "formal", "formal", " FORMAL "],
+        "despesas_fixas": [1000, 1000, 1000, 1000, -5, 1000, 1000],
+        "dependentes": ["3+", "0", "0", "0", "0", "0", "5"],
+        "dividas": ["nao", "sim", "sim", "sim", "sim", "sim", "não"],
+    })
+
+    scores, validas = calcular_scores(entrevistas)
+
+    assert validas.tolist() == [True, False, False, False, False, False, False]
+    assert scores[0] == calcular_score(5000, "autônomo", 1000, "3+", "não")
+    assert (scores[~validas] == 0).all()
+
+
+@pytest.fixture
+def entrevistas_csv(tmp_path):
+    caminho = tmp_path / "entrevistas.csv"
+    caminho.write_text(
+        "cpf,renda_mensal,tipo_emprego,despesas_fixas,dependentes,dividas\n"
+        "00000000001,5000,formal,1000,0,não\n"
+        "00000000002,-1,formal,1000,0,não\n"
+        "00000000003,2000,autônomo,500,2,sim\n"
+        "00000000001,9000,formal,1000,0,não\n"
+        "00000000004,3000,desempregado,3000,3+,sim\n",
+        encoding="utf-8"
+    )
+    return str(caminho)
+
+
+def test_recalcular_em_blocos(entrevistas_csv):
+    blocos = list(recalcular_blocos(entrevistas_csv, tamanho_bloco=2))
+
+    assert [len(scores) for scores, _ in blocos] == [1, 2, 1]
+    assert sum(invalidas for _, invalidas in blocos) == 1
+    # Os CPFs mantêm os zeros à esquerda
+    assert blocos[0][0] == {"00000000001": calcular_score(5000, "formal", 1000, "0", "não")}
+    # A última linha do CPF vem no bloco seguinte e prevalece quando gravada depois
+    assert blocos[1][0]["00000000001"] == calcular_score(9000, "formal", 1000, "0", "não")
+
+
+def test_saida_gravada_bloco_a_bloco(entrevistas_csv, tmp_path, monkeypatch):
+    saida = tmp_path / "novos_scores.csv"
+    monkeypatch.setattr(sys, "argv", [
+        "calculo_score.py", "--entrada", entrevistas_csv, "--tamanho-bloco", "2",
+        "--simular", "--saida", str(saida)
+    ])
+    calculo_score.main()
+
+    gravados = pd.read_csv(saida, dtype={"cpf": str})
+    assert gravados["cpf"].tolist() == ["00000000001", "00000000003", "00000000001", "00000000004"]
+    assert dict(zip(gravados["cpf"], gravados["score"]))["00000000001"] == calcular_score(
+        9000, "formal", 1000, "0", "não"
+    )
@@ -0,0 +1,189 @@
+import os
+import shutil
+
+import pytest
+
+from classificador import (
+    Classificacao, ClassificadorRegras, classificacao_fallback, contem_negacao,
+    fracoes_por_camada, interpretar_classificacao, normalizar, registrar_camada
+)
+from metricas import metricas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+regras = ClassificadorRegras()
+
+
+@pytest.fixture(autouse=True)
+def metricas_limpas():
+    metricas.limpar()
+    yield
+    metricas.limpar()
+
+
+@pytest.mark.parametrize("mensagem, esperado", [
+    ("  Não,   OBRIGADO ", "nao, obrigado"),
+    ("Cotação do dólar", "cotacao do dolar"),
+    ("crédito", "credito"),
+])
+def test_normalizar(mensagem, esperado):
+    assert normalizar(mensagem) == esperado
+
+
+@pytest.mark.parametrize("mensagem, negativa", [
+    # Negativas completas
+    ("não", True),
+    ("n", True),
+    ("Não, obrigado!", True),
+    ("nao quero, obrigada", True),
+    ("agora não", True),
+    ("deixa pra depois", True),
+    ("é só isso mesmo", True),
+    ("tá bom assim", True),
+    ("obrigado, é só isso", True),
+    # Afirmativas completas
+    ("sim", False),
+    ("Claro!", False),
+    ("pode ser", False),
+    ("sim, por favor", False),
+    # Pedido de serviço sem negação
+    ("quero aumentar meu limite", False),
+    ("qual a cotação do euro?", False),
+    # Ambíguas: vão para o LLM
+    ("hmm, não sei bem", None),
+    ("não quero mais o limite, só a cotação", None),
+    ("oi, tudo bem?", None),
+    ("", None),
+])
+def test_negativa(mensagem, negativa):
+    assert regras.negativa(mensagem) is negativa
+
+
+@pytest.mark.parametrize("mensagem, intencao", [
+    ("quero aumentar meu limite", "credito"),
+    ("meu cartão de crédito", "credito"),
+    ("cotação do dólar", "cambio"),
+    ("quanto estão os euros hoje?", "cambio"),
+    # Os dois serviços, nenhum ou com negação: ambíguo
+    ("limite e cotação do dólar", None),
+    ("oi, tudo bem?", None),
+    ("não quero aumento", None),
+    ("nem cotação", None),
+])
+def test_intencao(mensagem, intencao):
+    assert regras.intencao(mensagem) == intencao
+
+
+@pytest.mark.parametrize("texto, negacao", [
+    ("nao quero", True),
+    ("fica para depois", True),
+    ("nenhuma", True),
+    ("quero ver o limite", False),
+    # Só palavras inteiras: "nadando" não é "nada"
+    ("nadando", False),
+])
+def test_contem_negacao(texto, negacao):
+    assert contem_negacao(texto) is negacao
+
+
+def test_fracoes_por_camada():
+    for camada in ("regras", "regras", "regras", "llm"):
+        registrar_camada("negativa", camada)
+    registrar_camada("intencao", "cache")
+
+    assert fracoes_por_camada() == {
+        "negativa": {"regras": 0.75, "llm": 0.25},
+        "intencao": {"cache": 1.0},
+    }
+
+
+def test_fracoes_sem_decisoes():
+    assert fracoes_por_camada() == {}
+
+
+@pytest.mark.parametrize("resposta, esperado", [
+    ('{"intencao": "credito", "negativa": false}', ("credito", False)),
+    ('Classificação:\n```json\n{"intencao": "cambio", "negativa": false}\n```', ("cambio", False)),
+    ('{"intencao": "Crédito", "negativa": "sim"}', ("credito", True)),
+    ('{"intencao": "outros", "negativa": "false"}', ("outros", False)),
+    ('{"intencao": "investimentos", "negativa": true}', ("outros", True)),
+    ('{"negativa": 1}', ("outros", True)),
+])
+def test_interpretar_classificacao(resposta, esperado):
+    assert interpretar_classificacao(resposta) == Classificacao(*esperado, "llm")
+
+
+@pytest.mark.parametrize("resposta", ["credito", "", '{"intencao": credito}'])
+def test_interpretar_classificacao_invalida(resposta):
+    with pytest.raises(ValueError):
+        interpretar_classificacao(resposta)
+
+
+@pytest.mark.parametrize("mensagem, negativa", [
+    ("agora não", True),
+    ("é só isso", True),
+    ("quero ver o limite", False),
+])
+def test_classificacao_fallback(mensagem, negativa):
+    assert classificacao_fallback(mensagem) == Classificacao("outros", negativa, "fallback")
+
+
+@pytest.fixture
+def sistema_autenticado(tmp_path, monkeypatch):
+    """Sessão já autenticada na triagem, com LLM e busca falsos"""
+    pytest.importorskip("langchain")
+    pytest.importorskip("langchain_google_genai")
+    from agents import BancoAgilSystem
+    from clientes_falsos import BuscaFalsa, LLMFalso
+    from infraestrutura import Infraestrutura
+
+    for variavel in ("BANCO_AGIL_DB", "BANCO_AGIL_SNAPSHOT"):
+        monkeypatch.delenv(variavel, raising=False)
+    for nome in ("clientes.csv", "score_limite.csv"):
+        shutil.copy(os.path.join(RAIZ, nome), tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    def criar(taxa_falha: float = 0.0):
+        llm = LLMFalso(taxa_falha=taxa_falha)
+        infraestrutura = Infraestrutura(llm=llm, tavily_client=BuscaFalsa())
+        infraestrutura.cache_classificacao.limpar()
+        sistema = BancoAgilSystem(infraestrutura)
+        sistema.processar_mensagem("")
+        sistema.processar_mensagem("12345678901")
+        sistema.processar_mensagem("15/05/1990")
+        assert sistema.cliente_autenticado
+        metricas.limpar()
+        return sistema, llm
+
+    return criar
+
+
+def test_regras_respondem_sem_chamar_o_llm(sistema_autenticado):
+    sistema, llm = sistema_autenticado()
+    sistema.processar_mensagem("qual a cotação do euro?")
+
+    assert sistema.agente_atual == "cambio"
+    assert llm.chamadas == 0
+    assert fracoes_por_camada() == {"negativa": {"regras": 1.0}, "intencao": {"regras": 1.0}}
+
+
+def test_mensagem_ambigua_vai_ao_llm_numa_chamada(sistema_autenticado):
+    sistema, llm = sistema_autenticado()
+    resposta = sistema.processar_mensagem("oi, tudo bem? queria ver umas coisas")
+
+    # Negativa e intenção na mesma chamada combinada
+    assert llm.chamadas == 1
+    assert sistema.agente_atual == "triagem"
+    assert "Qual serviço você precisa?" in resposta
+    assert fracoes_por_camada() == {"negativa": {"llm": 1.0}, "intencao": {"llm": 1.0}}
+
+
+def test_falha_do_llm_usa_palavras_chave(sistema_autenticado):
+    sistema, llm = sistema_autenticado(taxa_falha=1.0)
+    resposta = sistema.processar_mensagem("hmm, não sei bem")
+
+    assert llm.chamadas >= 1
+    # "não" na mensagem: o fallback entende como negativa e encerra
+    assert sistema.conversa_encerrada
+    assert "Até logo" in resposta
+    assert fracoes_por_camada() == {"negativa": {"fallback": 1.0}}
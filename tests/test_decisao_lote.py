@@ -0,0 +1,104 @@
+import os
+import shutil
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from armazenamento import ArmazenamentoCSV
+from decisao_lote import decidir_bloco, decidir_campanha
+from registro_solicitacoes import RegistroSolicitacoes
+from tabela_score import ScoreForaDaFaixaError, TabelaScoreLimite
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMESTAMP = "2026-10-16T10:00:00"
+
+# Limites por faixa (score_limite.csv): 0-500 3000, 501-650 7000, 651-800 15000, 801-1000 30000
+CLIENTES = pd.DataFrame({
+    "cpf": ["00000000001", "00000000002", "00000000003", "00000000004", "00000000005", "00000000006"],
+    "data_nascimento": ["1990-01-01"] * 6,
+    "nome": ["A", "B", "C", "D", "E", "F"],
+    "limite_credito": [2000.0, 6000.0, 14000.0, 9000.0, 12000.0, 5000.0],
+    "score": [500, 650, 651, 1000, 400, 1200],
+})
+
+
+@pytest.fixture
+def tabela(tmp_path):
+    caminho = str(tmp_path / "score_limite.csv")
+    shutil.copy(os.path.join(RAIZ, "score_limite.csv"), caminho)
+    return TabelaScoreLimite(caminho)
+
+
+def decisao_do_chat(tabela: TabelaScoreLimite, cliente, alvo: float):
+    """Critério de _processar_solicitacao_aumento para um cliente"""
+    try:
+        permitido = tabela.limite_para(cliente.score)
+    except ScoreForaDaFaixaError:
+        return None
+    return "aprovado" if alvo <= permitido else "rejeitado"
+
+
+@pytest.mark.parametrize("novo_limite, fator", [(10000, None), (None, 1.5)])
+def test_bloco_decide_como_o_chat(tabela, novo_limite, fator):
+    decisao = decidir_bloco(CLIENTES, tabela, TIMESTAMP, novo_limite=novo_limite, fator=fator)
+    solicitacoes = decisao["solicitacoes"].set_index("cpf_cliente")
+
+    fora_da_faixa = sem_aumento = 0
+    for cliente in CLIENTES.itertuples():
+        alvo = novo_limite if novo_limite is not None else round(cliente.limite_credito * fator, 2)
+        status = decisao_do_chat(tabela, cliente, alvo)
+        if status is None:
+            fora_da_faixa += 1
+            assert cliente.cpf not in solicitacoes.index
+        elif alvo <= cliente.limite_credito:
+            sem_aumento += 1
+            assert cliente.cpf not in solicitacoes.index
+        else:
+            linha = solicitacoes.loc[cliente.cpf]
+            assert linha["status_pedido"] == status
+            assert linha["novo_limite_solicitado"] == alvo
+            assert linha["limite_atual"] == cliente.limite_credito
+
+    assert decisao["fora_da_faixa"] == fora_da_faixa == 1
+    assert decisao["sem_aumento"] == sem_aumento
+    assert (decisao["solicitacoes"]["data_hora_solicitacao"] == TIMESTAMP).all()
+
+
+def test_exatamente_um_alvo(tabela):
+    with pytest.raises(ValueError):
+        decidir_campanha(tabela=tabela, simular=True)
+    with pytest.raises(ValueError):
+        decidir_campanha(novo_limite=10000, fator=1.5, tabela=tabela, simular=True)
+
+
+@pytest.fixture
+def base(tmp_path):
+    caminho = str(tmp_path / "clientes.csv")
+    CLIENTES.to_csv(caminho, index=False)
+    return ArmazenamentoCSV(caminho)
+
+
+def test_campanha_em_blocos_grava_no_log(base, tabela, tmp_path):
+    caminho_registro = str(tmp_path / "solicitacoes.csv")
+    registro = RegistroSolicitacoes(caminho_registro)
+    try:
+        totais = decidir_campanha(
+            novo_limite=10000, armazenamento=base, tabela=tabela, registro=registro, tamanho_bloco=4
+        )
+    finally:
+        registro.fechar()
+
+    # Alvo 10000: 1 e 2 rejeitados (faixas de 3000 e 7000), 4 aprovado, 3 e 5 já têm mais, 6 fora da tabela
+    assert totais == {"clientes": 6, "aprovados": 1, "rejeitados": 2, "fora_da_faixa": 1, "sem_aumento": 2}
+
+    gravadas = pd.read_csv(caminho_registro, dtype={"cpf_cliente": str})
+    assert gravadas["cpf_cliente"].tolist() == ["00000000001", "00000000002", "00000000004"]
+    assert gravadas["status_pedido"].tolist() == ["rejeitado", "rejeitado", "aprovado"]
+
+
+def test_simulacao_nao_grava(base, tabela, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    totais = decidir_campanha(fator=2, armazenamento=base, tabela=tabela, simular=True, tamanho_bloco=2)
+    assert totais["clientes"] == 6
+    assert not (tmp_path / "solicitacoes_aumento_limite.csv").exists()
@@ -0,0 +1,102 @@
+import pytest
+
+import limitador
+from limitador import LimitadorMemoria, LimitadorSQLite, limites_autenticacao, registrar_sucesso
+
+JANELA = 100.0
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 10 * JANELA
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(limitador.time, "time", relogio)
+    return relogio
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memoria":
+        return LimitadorMemoria(janela=JANELA)
+    return LimitadorSQLite(str(tmp_path / "limitador.db"), janela=JANELA)
+
+
+def test_bloqueia_depois_do_limite_sem_registrar(relogio, store):
+    for _ in range(3):
+        assert store.consumir({"cpf:1": 3}) == 0
+
+    espera = store.consumir({"cpf:1": 3})
+    assert 0 < espera <= 2 * JANELA
+    # A tentativa recusada não conta: o bloqueio não se prolonga a cada recusa
+    assert store.consumir({"cpf:1": 3}) == pytest.approx(espera)
+
+
+def test_janela_anterior_pesa_pela_fracao_ainda_coberta(relogio, store):
+    for _ in range(3):
+        store.consumir({"cpf:1": 3})
+
+    # Metade da janela seguinte: a anterior ainda pesa 3 * 0.5 = 1.5
+    relogio.agora += 1.5 * JANELA
+    assert store.consumir({"cpf:1": 3}) == 0
+    assert store.consumir({"cpf:1": 3}) > 0
+
+    # Duas janelas depois, nada da contagem antiga resta
+    relogio.agora += 2 * JANELA
+    for _ in range(3):
+        assert store.consumir({"cpf:1": 3}) == 0
+
+
+def test_espera_informada_e_suficiente(relogio, store):
+    for _ in range(3):
+        store.consumir({"cpf:1": 3})
+    relogio.agora += 0.25 * JANELA
+
+    espera = store.consumir({"cpf:1": 3})
+    relogio.agora += espera - 1
+    assert store.consumir({"cpf:1": 3}) > 0
+    relogio.agora += 1.01
+    assert store.consumir({"cpf:1": 3}) == 0
+
+
+def test_chave_bloqueada_impede_registro_nas_demais(relogio, store):
+    store.consumir({"cpf:1": 1, "origem:a": 10})
+    assert store.consumir({"cpf:1": 1, "origem:a": 10}) > 0
+
+    # A tentativa recusada não consumiu a origem
+    for _ in range(9):
+        assert store.consumir({"cpf:2": 10, "origem:a": 10}) == 0
+    assert store.consumir({"cpf:3": 10, "origem:a": 10}) > 0
+
+
+def test_liberar_zera_a_chave(relogio, store):
+    store.consumir({"cpf:1": 1})
+    assert store.consumir({"cpf:1": 1}) > 0
+    store.liberar("cpf:1")
+    assert store.consumir({"cpf:1": 1}) == 0
+
+
+def test_memoria_descarta_chaves_menos_usadas(relogio):
+    store = LimitadorMemoria(janela=JANELA, capacidade=2)
+    for chave in ("cpf:1", "cpf:2", "cpf:3"):
+        store.consumir({chave: 5})
+    assert len(store) == 2
+    assert "cpf:1" not in store._contadores
+
+
+def test_sucesso_devolve_a_tentativa_da_origem(relogio, store):
+    # Vários clientes atrás da mesma origem, todos autenticando com sucesso
+    for cpf in range(10):
+        assert store.consumir(limites_autenticacao(str(cpf), "10.0.0.1")) == 0
+        registrar_sucesso(store, str(cpf), "10.0.0.1")
+
+    # As falhas continuam contando contra a origem
+    store.consumir({"cpf:a": 10, "origem:10.0.0.1": 2})
+    store.consumir({"cpf:b": 10, "origem:10.0.0.1": 2})
+    assert store.consumir({"cpf:c": 10, "origem:10.0.0.1": 2}) > 0
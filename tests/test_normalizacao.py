@@ -0,0 +1,30 @@
+import pytest
+
+from normalizacao import extrair_valor
+
+
+@pytest.mark.parametrize("mensagem, valor", [
+    ("R$ 10.000,50", 10000.50),
+    ("quero 7.000", 7000.0),
+    ("1.000.000", 1000000.0),
+    ("7000.50", 7000.50),
+    ("5,00", 5.0),
+    ("1,500", 1.5),
+    ("0,005", 0.005),
+    ("0.005", 0.005),
+    ("1,000,000", 1000000.0),
+    ("5 mil", 5000.0),
+    ("1,5 mil", 1500.0),
+])
+def test_extrair_valor(mensagem, valor):
+    assert extrair_valor(mensagem) == pytest.approx(valor)
+
+
+@pytest.mark.parametrize("mensagem", [
+    "não sei",
+    "quero aumentar meu limite para 1.000,,00",
+    "74.9,,8",
+    "1,2.3,4",
+])
+def test_sem_valor(mensagem):
+    assert extrair_valor(mensagem) is None
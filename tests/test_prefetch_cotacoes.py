@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import prefetch_cotacoes
+from cache_cotacoes import CacheCotacoes
+from clientes_falsos import BuscaFalsa
+from prefetch_cotacoes import AgendadorCotacoes
+
+AGORA = 1000.0
+
+
+@pytest.fixture(autouse=True)
+def relogio_fixo(monkeypatch):
+    monkeypatch.setattr(prefetch_cotacoes.time, "monotonic", lambda: AGORA)
+
+
+def buscar_com(busca: BuscaFalsa):
+    return lambda moeda: busca.search(f"cotação {moeda} hoje Brasil", max_results=1)["results"][0]["content"]
+
+
+def test_sucesso_agenda_intervalo_com_jitter():
+    cache = CacheCotacoes()
+    agendador = AgendadorCotacoes(cache, buscar_com(BuscaFalsa(semente=1)), ["dólar"], intervalo=10, jitter=0.2)
+
+    esperas = set()
+    for _ in range(50):
+        assert agendador.atualizar_agora("dólar")
+        espera = agendador._proxima["dólar"] - AGORA
+        assert 8.0 <= espera <= 12.0
+        esperas.add(espera)
+
+    # O jitter espalha as atualizações em vez de repetir sempre o mesmo intervalo
+    assert len(esperas) > 1
+    assert cache.obter("dólar", lambda: pytest.fail("deveria vir do cache")) == "O dólar está cotado a R$ 5,00."
+
+
+def test_sem_jitter_intervalo_exato():
+    agendador = AgendadorCotacoes(CacheCotacoes(), buscar_com(BuscaFalsa()), ["euro"], intervalo=10, jitter=0)
+    agendador.atualizar_agora("euro")
+    assert agendador._proxima["euro"] - AGORA == 10
+
+
+def test_falhas_dobram_o_backoff_ate_o_maximo():
+    busca = BuscaFalsa(taxa_falha=1.0)
+    agendador = AgendadorCotacoes(
+        CacheCotacoes(), buscar_com(busca), ["libra"],
+        intervalo=30, jitter=0, backoff_inicial=1, backoff_maximo=5
+    )
+
+    esperas = []
+    for _ in range(5):
+        assert not agendador.atualizar_agora("libra")
+        esperas.append(agendador._proxima["libra"] - AGORA)
+
+    assert esperas == [1, 2, 4, 5, 5]
+    assert agendador.falhas_consecutivas() == {"libra": 5}
+    assert busca.chamadas == 5
+
+
+def test_sucesso_depois_de_falhas_volta_ao_intervalo():
+    busca = BuscaFalsa(taxa_falha=1.0)
+    cache = CacheCotacoes()
+    agendador = AgendadorCotacoes(cache, buscar_com(busca), ["libra"], intervalo=30, jitter=0, backoff_inicial=1)
+    agendador.atualizar_agora("libra")
+    agendador.atualizar_agora("libra")
+    assert cache.idade("libra") is None
+
+    busca.taxa_falha = 0.0
+    assert agendador.atualizar_agora("libra")
+    assert agendador.falhas_consecutivas() == {"libra": 0}
+    assert agendador._proxima["libra"] - AGORA == 30
+    assert cache.idade("libra") is not None
+
+
+def test_backoff_com_jitter_fica_na_faixa():
+    agendador = AgendadorCotacoes(
+        CacheCotacoes(), buscar_com(BuscaFalsa(taxa_falha=1.0)), ["dólar"],
+        jitter=0.1, backoff_inicial=2, backoff_maximo=100
+    )
+    for falhas in range(1, 6):
+        agendador.atualizar_agora("dólar")
+        base = 2 * 2 ** (falhas - 1)
+        assert base * 0.9 <= agendador._proxima["dólar"] - AGORA <= base * 1.1
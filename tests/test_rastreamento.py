@@ -0,0 +1,113 @@
+import itertools
+
+import pytest
+
+import rastreamento
+from metricas import RegistroMetricas
+from rastreamento import (
+    DestinoHistograma, configurar_rastreamento, contar_tokens, rastreador, rastrear, texto_prometheus
+)
+
+
+@pytest.fixture
+def histograma():
+    """Destino de histogramas com limites pequenos e durações controladas"""
+    destinos = list(rastreador.destinos)
+    destino = DestinoHistograma(limites=(0.01, 0.1))
+    configurar_rastreamento(destino)
+    yield destino
+    configurar_rastreamento(*destinos)
+
+
+def com_duracoes(monkeypatch, *duracoes):
+    """perf_counter devolve pares (início, fim) com as durações informadas"""
+    instantes = itertools.chain.from_iterable((0.0, d) for d in duracoes)
+    monkeypatch.setattr(rastreamento.time, "perf_counter", lambda: next(instantes))
+
+
+def test_desligado_devolve_span_nulo():
+    destinos = list(rastreador.destinos)
+    configurar_rastreamento()
+    try:
+        with rastrear("llm", agente="cambio") as span:
+            span.definir(tokens_saida=10)
+        assert span is rastreamento._SPAN_NULO
+    finally:
+        configurar_rastreamento(*destinos)
+
+
+def test_texto_prometheus_de_contadores_e_resumos():
+    registro = RegistroMetricas()
+    registro.incrementar("cache_cotacoes_total", resultado="hit")
+    registro.incrementar("cache_cotacoes_total", resultado="hit")
+    registro.incrementar("cache_cotacoes_total", resultado='mi"ss')
+    registro.observar("resposta_primeiro_trecho_segundos", 0.5, agente="cambio")
+    registro.observar("resposta_primeiro_trecho_segundos", 1.5, agente="cambio")
+
+    destinos = list(rastreador.destinos)
+    configurar_rastreamento()
+    try:
+        texto = texto_prometheus(registro)
+    finally:
+        configurar_rastreamento(*destinos)
+
+    assert texto.splitlines() == [
+        "# TYPE banco_agil_cache_cotacoes_total counter",
+        'banco_agil_cache_cotacoes_total{resultado="hit"} 2.0',
+        'banco_agil_cache_cotacoes_total{resultado="mi\\"ss"} 1.0',
+        "# TYPE banco_agil_resposta_primeiro_trecho_segundos summary",
+        'banco_agil_resposta_primeiro_trecho_segundos_sum{agente="cambio"} 2.0',
+        'banco_agil_resposta_primeiro_trecho_segundos_count{agente="cambio"} 2',
+    ]
+
+
+def test_histograma_em_buckets_cumulativos(histograma, monkeypatch):
+    com_duracoes(monkeypatch, 0.005, 0.05, 0.5)
+    for _ in range(3):
+        # "moeda" vai só para o log: não é rótulo de histograma
+        with rastrear("cotacao", agente="cambio", moeda="euro"):
+            pass
+
+    texto = histograma.texto_prometheus()
+    base = 'span="cotacao",agente="cambio"'
+    assert f'banco_agil_span_segundos_bucket{{{base},le="0.01"}} 1' in texto
+    assert f'banco_agil_span_segundos_bucket{{{base},le="0.1"}} 2' in texto
+    assert f'banco_agil_span_segundos_bucket{{{base},le="+Inf"}} 3' in texto
+    assert f"banco_agil_span_segundos_sum{{{base}}} 0.555" in texto
+    assert f"banco_agil_span_segundos_count{{{base}}} 3" in texto
+    assert "moeda" not in texto
+
+    assert histograma.percentil("cotacao", 50, agente="cambio") == 0.1
+    assert histograma.percentil("cotacao", 100) == float("inf")
+    assert histograma.percentil("llm", 50) is None
+
+
+def test_erro_e_tokens_no_histograma(histograma, monkeypatch):
+    com_duracoes(monkeypatch, 0.001, 0.001)
+    with pytest.raises(ConnectionError):
+        with rastrear("busca", agente="cambio"):
+            raise ConnectionError("falha")
+    with rastrear("llm", prompt="cotacao") as span:
+        span.definir(tokens_entrada=120, tokens_saida=30)
+
+    texto = histograma.texto_prometheus()
+    assert 'banco_agil_span_segundos_count{span="busca",agente="cambio",erro="ConnectionError"} 1' in texto
+    assert 'banco_agil_tokens_total{span="llm",tipo="entrada"} 120.0' in texto
+    assert 'banco_agil_tokens_total{span="llm",tipo="saida"} 30.0' in texto
+
+    # O texto do processo inclui os histogramas do rastreador configurado
+    assert texto_prometheus(RegistroMetricas()) == texto
+
+
+def test_contar_tokens_estima_sem_usage_metadata():
+    class Mensagem:
+        def __init__(self, content):
+            self.content = content
+
+    assert contar_tokens([Mensagem("a" * 40)], Mensagem("b" * 8)) == {
+        "tokens_entrada": 10, "tokens_saida": 2, "tokens_estimados": True
+    }
+
+    resposta = Mensagem("ok")
+    resposta.usage_metadata = {"input_tokens": 7, "output_tokens": 3}
+    assert contar_tokens([], resposta) == {"tokens_entrada": 7, "tokens_saida": 3}
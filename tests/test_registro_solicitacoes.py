@@ -0,0 +1,180 @@
+import csv
+import gzip
+import time
+
+import pytest
+
+from registro_solicitacoes import COLUNAS_SOLICITACOES, RegistroSolicitacoes
+
+CABECALHO = ",".join(COLUNAS_SOLICITACOES)
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return tmp_path / "solicitacoes.csv"
+
+
+def linhas(texto: str):
+    return list(csv.reader(texto.splitlines()))
+
+
+def rotacionados(caminho):
+    return sorted(caminho.parent.glob(f"{caminho.stem}.*{caminho.suffix}*"))
+
+
+def ler(arquivo) -> str:
+    if arquivo.suffix == ".gz":
+        with gzip.open(arquivo, "rt", encoding="utf-8") as comprimido:
+            return comprimido.read()
+    return arquivo.read_text(encoding="utf-8")
+
+
+def registrar(registro: RegistroSolicitacoes, quantidade: int, inicio: int = 0):
+    for i in range(inicio, inicio + quantidade):
+        registro.registrar(f"{i:011d}", "2026-10-16T10:00:00", 1000.0, 2000.0, "aprovado")
+
+
+def test_agrupa_linhas_em_lotes(caminho):
+    registro = RegistroSolicitacoes(str(caminho), tamanho_lote=3, intervalo_flush=10)
+    lotes = []
+    gravar = registro._gravar_travado
+    registro._gravar_travado = lambda conteudo: lotes.append(len(linhas(conteudo))) or gravar(conteudo)
+    try:
+        registrar(registro, 7)
+        registro.flush()
+    finally:
+        registro.fechar()
+
+    # Lotes completos assim que chegam a tamanho_lote; o resto no flush
+    assert lotes == [3, 3, 1]
+    conteudo = linhas(caminho.read_text(encoding="utf-8"))
+    assert conteudo[0] == COLUNAS_SOLICITACOES
+    assert [linha[0] for linha in conteudo[1:]] == [f"{i:011d}" for i in range(7)]
+
+
+def test_intervalo_flush_grava_lote_incompleto(caminho):
+    registro = RegistroSolicitacoes(str(caminho), tamanho_lote=100, intervalo_flush=0.05)
+    try:
+        registrar(registro, 2)
+        # Sem flush: o lote incompleto é gravado quando o intervalo expira
+        gravadas = lambda: len(linhas(caminho.read_text(encoding="utf-8"))) - 1 if caminho.exists() else 0
+        prazo = time.monotonic() + 5
+        while time.monotonic() < prazo and gravadas() < 2:
+            time.sleep(0.01)
+        assert gravadas() == 2
+    finally:
+        registro.fechar()
+
+
+def test_reabertura_nao_repete_cabecalho(caminho):
+    caminho.write_text(f"{CABECALHO}\n00000000009,2026-10-16T09:00:00,1000.0,1500.0,aprovado", encoding="utf-8")
+    registro = RegistroSolicitacoes(str(caminho))
+    try:
+        registrar(registro, 1)
+        registro.flush()
+    finally:
+        registro.fechar()
+
+    # A última linha sem quebra não se junta à nova
+    conteudo = linhas(caminho.read_text(encoding="utf-8"))
+    assert [linha[0] for linha in conteudo] == ["cpf_cliente", "00000000009", "00000000000"]
+
+
+def test_registrar_lote_de_dataframe(caminho):
+    pd = pytest.importorskip("pandas")
+    registro = RegistroSolicitacoes(str(caminho))
+    try:
+        registro.registrar_lote(pd.DataFrame({
+            "cpf_cliente": ["00000000001", "00000000002"],
+            "data_hora_solicitacao": "2026-10-16T10:00:00",
+            "limite_atual": [1000.0, 2000.0],
+            "novo_limite_solicitado": [5000.0, 9000.0],
+            "status_pedido": ["aprovado", "rejeitado"],
+        }))
+        registro.registrar_lote(pd.DataFrame(columns=COLUNAS_SOLICITACOES))
+    finally:
+        registro.fechar()
+
+    conteudo = linhas(caminho.read_text(encoding="utf-8"))
+    assert conteudo[1:] == [
+        ["00000000001", "2026-10-16T10:00:00", "1000.0", "5000.0", "aprovado"],
+        ["00000000002", "2026-10-16T10:00:00", "2000.0", "9000.0", "rejeitado"],
+    ]
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_rotacao_por_tamanho(caminho, comprimir):
+    registro = RegistroSolicitacoes(
+        str(caminho), tamanho_lote=1, tamanho_maximo=300, comprimir_rotacionados=comprimir
+    )
+    try:
+        for i in range(20):
+            registrar(registro, 1, inicio=i)
+            registro.flush()
+    finally:
+        registro.fechar()
+
+    segmentos = rotacionados(caminho)
+    assert segmentos
+    assert all((segmento.suffix == ".gz") == comprimir for segmento in segmentos)
+
+    # Cada arquivo tem o seu cabeçalho e nenhuma linha se perde ou se repete
+    cpfs = []
+    for arquivo in segmentos + [caminho]:
+        conteudo = linhas(ler(arquivo))
+        assert conteudo[0] == COLUNAS_SOLICITACOES
+        cpfs.extend(linha[0] for linha in conteudo[1:])
+    assert cpfs == [f"{i:011d}" for i in range(20)]
+
+
+def test_rotacao_manual(caminho):
+    registro = RegistroSolicitacoes(str(caminho), comprimir_rotacionados=True)
+    try:
+        registrar(registro, 2)
+        registro.rotacionar()
+        registrar(registro, 1, inicio=2)
+        registro.flush()
+    finally:
+        registro.fechar()
+
+    [segmento] = rotacionados(caminho)
+    assert segmento.name.endswith(".csv.gz")
+    assert len(linhas(ler(segmento))) == 3
+    assert len(linhas(caminho.read_text(encoding="utf-8"))) == 2
+
+
+def test_obter_registro_le_as_variaveis_de_ambiente(caminho, monkeypatch):
+    import registro_solicitacoes
+
+    monkeypatch.setenv("BANCO_AGIL_REGISTRO_LOTE", "7")
+    monkeypatch.setenv("BANCO_AGIL_REGISTRO_FLUSH", "0.5")
+    monkeypatch.setenv("BANCO_AGIL_REGISTRO_FSYNC", "1")
+    monkeypatch.setenv("BANCO_AGIL_REGISTRO_TAMANHO_MAX", "1000")
+    monkeypatch.setenv("BANCO_AGIL_REGISTRO_COMPRIMIR", "1")
+    registro = registro_solicitacoes.obter_registro_solicitacoes(str(caminho))
+    try:
+        assert registro is registro_solicitacoes.obter_registro_solicitacoes(str(caminho))
+        assert (registro.tamanho_lote, registro.intervalo_flush, registro.fsync) == (7, 0.5, True)
+        assert (registro.tamanho_maximo, registro.comprimir_rotacionados) == (1000, True)
+    finally:
+        registro.fechar()
+        registro_solicitacoes._registros.pop(str(caminho))
+
+
+def test_compressao_fora_da_trava(caminho, monkeypatch):
+    registro = RegistroSolicitacoes(str(caminho), comprimir_rotacionados=True)
+    eventos = []
+    for nome in ("_travar", "_destravar", "_comprimir"):
+        metodo = getattr(registro, nome)
+        monkeypatch.setattr(registro, nome, lambda *a, n=nome, m=metodo: eventos.append(n) or m(*a))
+    try:
+        registrar(registro, 2)
+        registro.rotacionar()
+    finally:
+        registro.fechar()
+
+    # A compressão só começa depois que a trava do arquivo é liberada
+    assert eventos[eventos.index("_comprimir") - 1] == "_destravar"
+    assert "_travar" not in eventos[eventos.index("_comprimir"):]
+    [segmento] = rotacionados(caminho)
+    assert len(linhas(ler(segmento))) == 3
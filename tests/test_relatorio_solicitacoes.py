@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from registro_solicitacoes import RegistroSolicitacoes
+from relatorio_solicitacoes import atualizar_relatorio
+
+
+@pytest.fixture
+def caminhos(tmp_path):
+    return str(tmp_path / "solicitacoes.csv"), str(tmp_path / "relatorio.json")
+
+
+def registrar(registro: RegistroSolicitacoes, quantidade: int, status: str = "aprovado"):
+    for i in range(quantidade):
+        registro.registrar(f"{i:011d}", "2026-10-16T10:00:00", 1000.0, 2000.0, status)
+    registro.flush()
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_le_todos_os_rotacionados_depois_do_checkpoint(caminhos, comprimir):
+    caminho, checkpoint = caminhos
+    registro = RegistroSolicitacoes(caminho, comprimir_rotacionados=comprimir)
+    try:
+        registrar(registro, 3)
+        assert atualizar_relatorio(caminho, checkpoint).resumo()["solicitacoes"] == 3
+
+        # Linhas no arquivo do checkpoint após a leitura, e duas rotações
+        registrar(registro, 2)
+        registro.rotacionar()
+        registrar(registro, 4, status="reprovado")
+        registro.rotacionar()
+        registrar(registro, 1)
+
+        resumo = atualizar_relatorio(caminho, checkpoint).resumo()
+        assert resumo["solicitacoes"] == 10
+        assert resumo["aprovadas"] == 6
+
+        # Sem linhas novas, nada é contado de novo
+        assert atualizar_relatorio(caminho, checkpoint).resumo()["solicitacoes"] == 10
+    finally:
+        registro.fechar()
+
+
+def test_primeira_execucao_le_rotacionados_anteriores(caminhos):
+    caminho, checkpoint = caminhos
+    registro = RegistroSolicitacoes(caminho, comprimir_rotacionados=True)
+    try:
+        registrar(registro, 5)
+        registro.rotacionar()
+        registrar(registro, 3, status="reprovado")
+        resumo = atualizar_relatorio(caminho, checkpoint).resumo()
+        assert resumo["solicitacoes"] == 8
+        assert resumo["aprovadas"] == 5
+
+        # Os rotacionados já lidos não são contados de novo
+        registro.rotacionar()
+        registrar(registro, 1)
+        assert atualizar_relatorio(caminho, checkpoint).resumo()["solicitacoes"] == 9
+    finally:
+        registro.fechar()
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+
+import pytest
+
+import resiliencia
+from resiliencia import (
+    ABERTO, FECHADO, MEIO_ABERTO, BuscaResiliente, Disjuntor, DisjuntorAberto, LLMResiliente, Politica,
+    PrazoExcedido, ServicoSaturado
+)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(resiliencia.time, "monotonic", relogio)
+    return relogio
+
+
+def disjuntor(**kwargs):
+    opcoes = dict(janela=10, minimo_chamadas=4, taxa_erros=0.5, taxa_lentas=0.5, limite_lenta=1.0, tempo_aberto=30)
+    opcoes.update(kwargs)
+    return Disjuntor("teste", **opcoes)
+
+
+def abrir(d: Disjuntor):
+    for _ in range(d.minimo_chamadas):
+        d.permitir()
+        d.registrar(True, 0.1)
+
+
+def test_abre_com_taxa_de_erros(relogio):
+    d = disjuntor()
+    for _ in range(3):
+        d.permitir()
+        d.registrar(True, 0.1)
+    # Abaixo do mínimo de chamadas, não abre
+    assert d.estado == FECHADO
+
+    d.permitir()
+    d.registrar(False, 0.1)
+    assert d.estado == ABERTO
+    with pytest.raises(DisjuntorAberto):
+        d.permitir()
+
+
+def test_abre_com_chamadas_lentas(relogio):
+    d = disjuntor()
+    for _ in range(4):
+        d.permitir()
+        d.registrar(False, 2.0)
+    assert d.estado == ABERTO
+
+
+def test_continua_fechado_com_poucos_erros(relogio):
+    d = disjuntor()
+    for i in range(10):
+        d.permitir()
+        d.registrar(i % 4 == 0, 0.1)
+    assert d.estado == FECHADO
+
+
+def test_meio_aberto_permite_uma_chamada_de_teste(relogio):
+    d = disjuntor()
+    abrir(d)
+
+    relogio.agora += 29
+    with pytest.raises(DisjuntorAberto):
+        d.permitir()
+
+    relogio.agora += 1
+    assert d.permitir() is True
+    assert d.estado == MEIO_ABERTO
+    with pytest.raises(DisjuntorAberto):
+        d.permitir()
+
+
+def test_teste_bem_sucedido_fecha(relogio):
+    d = disjuntor()
+    abrir(d)
+    relogio.agora += 30
+    d.permitir()
+    d.registrar(False, 0.1)
+    assert d.estado == FECHADO
+    assert d.permitir() is False
+
+
+@pytest.mark.parametrize("falhou, duracao", [(True, 0.1), (False, 2.0)])
+def test_teste_com_falha_ou_lento_reabre(relogio, falhou, duracao):
+    d = disjuntor()
+    abrir(d)
+    relogio.agora += 30
+    d.permitir()
+    d.registrar(falhou, duracao)
+    assert d.estado == ABERTO
+
+    relogio.agora += 29
+    with pytest.raises(DisjuntorAberto):
+        d.permitir()
+
+
+class LLMTravado:
+    async def ainvoke(self, mensagens):
+        await asyncio.sleep(60)
+
+    def stream(self, mensagens):
+        yield "um"
+        yield "dois"
+
+
+def test_chamada_de_teste_cancelada_libera_o_disjuntor(relogio):
+    d = disjuntor()
+    abrir(d)
+    relogio.agora += 30
+    llm = LLMResiliente(LLMTravado(), "teste", Politica(prazo=120), d)
+
+    async def cancelar():
+        tarefa = asyncio.ensure_future(llm.ainvoke([]))
+        await asyncio.sleep(0)
+        tarefa.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa
+
+    asyncio.run(cancelar())
+    assert d.estado == MEIO_ABERTO
+    # A próxima chamada pode testar o serviço
+    assert d.permitir() is True
+
+
+def test_stream_de_teste_abandonado_libera_o_disjuntor(relogio):
+    d = disjuntor()
+    abrir(d)
+    relogio.agora += 30
+    llm = LLMResiliente(LLMTravado(), "teste", Politica(prazo=5), d)
+
+    trechos = llm.stream([])
+    assert next(trechos) == "um"
+    trechos.close()
+
+    assert d.estado == MEIO_ABERTO
+    assert d.permitir() is True
+
+
+class ClienteBloqueado:
+    """invoke/search ficam presos até `liberar` ser sinalizado"""
+
+    def __init__(self):
+        self.liberar = threading.Event()
+
+    def invoke(self, mensagens):
+        self.liberar.wait(10)
+        return "ok"
+
+    def search(self, query, **kwargs):
+        self.liberar.wait(10)
+        return {"results": []}
+
+
+def test_threads_ocupadas_recusam_sem_afetar_o_outro_servico():
+    cliente = ClienteBloqueado()
+    d = disjuntor()
+    llm = LLMResiliente(cliente, "llm", Politica(prazo=0.05, tentativas=1), d, threads=1)
+    busca = BuscaResiliente(cliente, "busca", Politica(prazo=5, tentativas=1), disjuntor(), threads=1)
+    try:
+        # A chamada estoura o prazo, mas a thread continua presa nela
+        with pytest.raises(PrazoExcedido):
+            llm.invoke([])
+        # Sem thread livre: recusa na hora, contando como falha no disjuntor
+        with pytest.raises(ServicoSaturado):
+            llm.invoke([])
+        assert len(d._resultados) == 2
+
+        # A busca tem threads próprias
+        cliente.liberar.set()
+        assert busca.search("dólar") == {"results": []}
+    finally:
+        cliente.liberar.set()
+
+
+def test_thread_liberada_volta_a_aceitar_chamadas():
+    cliente = ClienteBloqueado()
+    llm = LLMResiliente(cliente, "llm", Politica(prazo=0.05, tentativas=1), disjuntor(), threads=1)
+    with pytest.raises(PrazoExcedido):
+        llm.invoke([])
+    cliente.liberar.set()
+
+    # A vaga volta quando a chamada presa termina
+    for _ in range(100):
+        try:
+            assert llm.invoke([]) == "ok"
+            break
+        except ServicoSaturado:
+            threading.Event().wait(0.01)
+    else:
+        pytest.fail("a thread não foi liberada")
+
+
+def test_busca_sem_versao_assincrona_usa_as_threads_do_servico():
+    cliente = ClienteBloqueado()
+    cliente.liberar.set()
+    busca = BuscaResiliente(cliente, "busca", Politica(prazo=5), disjuntor(), threads=1)
+    assert asyncio.run(busca.asearch("euro")) == {"results": []}
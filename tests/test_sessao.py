@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from sessao import (
+    ArmazenamentoSessoesMemoria, ArmazenamentoSessoesSQLite, EstadoSessao, SessaoConcorrente
+)
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memoria":
+        return ArmazenamentoSessoesMemoria()
+    return ArmazenamentoSessoesSQLite(str(tmp_path / "sessoes.db"))
+
+
+def test_salvar_incrementa_a_versao(store):
+    estado = EstadoSessao()
+    store.salvar(estado)
+    store.salvar(estado)
+    assert estado.versao == 2
+    assert store.obter(estado.id).versao == 2
+
+
+def test_escrita_concorrente_nao_sobrescreve(store):
+    store.salvar(EstadoSessao(id="s1"))
+    primeiro, segundo = store.obter("s1"), store.obter("s1")
+
+    primeiro.agente_atual = "credito"
+    store.salvar(primeiro)
+    segundo.agente_atual = "cambio"
+    with pytest.raises(SessaoConcorrente):
+        store.salvar(segundo)
+
+    assert store.obter("s1").agente_atual == "credito"
+
+
+def test_sessao_nova_com_id_existente_conflita(store):
+    store.salvar(EstadoSessao(id="s1"))
+    with pytest.raises(SessaoConcorrente):
+        store.salvar(EstadoSessao(id="s1"))
+
+
+def test_sqlite_migra_tabela_sem_versao(tmp_path):
+    import sqlite3
+
+    caminho = str(tmp_path / "antigo.db")
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("CREATE TABLE sessoes (id TEXT PRIMARY KEY, dados BLOB NOT NULL, atualizado_em REAL NOT NULL)")
+
+    store = ArmazenamentoSessoesSQLite(caminho)
+    estado = EstadoSessao()
+    store.salvar(estado)
+    assert store.obter(estado.id).versao == 1
@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from armazenamento import ArmazenamentoCSV
+from snapshot_clientes import ArmazenamentoSnapshot, converter, verificar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLIENTES = (
+    "cpf,data_nascimento,nome,limite_credito,score\n"
+    "00012345678,1990-05-15,João Silva,6000.0,750\n"
+    "98765432100,1985-08-22,Maria da Conceição Ávila,8000.5,699\n"
+    "11122233344,1992-03-10,Pedro,3000.0,550\n"
+)
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    clientes = tmp_path / "clientes.csv"
+    clientes.write_text(CLIENTES, encoding="utf-8")
+    tabela = str(tmp_path / "score_limite.csv")
+    shutil.copy(os.path.join(RAIZ, "score_limite.csv"), tabela)
+    return str(clientes), tabela, str(tmp_path / "banco.snap")
+
+
+def test_conversao_preserva_clientes_e_faixas(arquivos):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    assert converter(caminho_clientes, caminho_tabela, caminho_snapshot) == 3
+    assert verificar(caminho_snapshot, caminho_clientes, caminho_tabela) == []
+
+    snapshot = ArmazenamentoSnapshot(caminho_snapshot)
+    csv = ArmazenamentoCSV(caminho_clientes)
+    assert dict(snapshot.registros()) == dict(csv.registros())
+    # Zeros à esquerda e nomes acentuados voltam iguais
+    assert snapshot.buscar("00012345678").nome == "João Silva"
+    assert snapshot.buscar("98765432100") == csv.buscar("98765432100")
+    assert snapshot.buscar("55566677788") is None
+
+    blocos = list(snapshot.blocos(tamanho_bloco=2))
+    assert [len(bloco) for bloco in blocos] == [2, 1]
+    # Ordenados por CPF, para a busca binária
+    assert pd.concat(blocos)["cpf"].tolist() == ["00012345678", "11122233344", "98765432100"]
+
+    faixas = pd.read_csv(caminho_tabela)
+    assert snapshot.faixas().to_dict("list") == faixas.astype(snapshot.faixas().dtypes).to_dict("list")
+
+
+def test_atualizacoes_aparecem_na_verificacao(arquivos):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    snapshot = ArmazenamentoSnapshot(caminho_snapshot)
+
+    snapshot.atualizar("11122233344", limite_credito=4500.0)
+    assert snapshot.atualizar_em_lote("score", {"00012345678": 800, "99999999999": 10}) == 1
+
+    # Outro mapeamento do mesmo arquivo enxerga as escritas
+    releitura = ArmazenamentoSnapshot(caminho_snapshot)
+    assert releitura.buscar("11122233344").limite_credito == 4500.0
+    assert releitura.buscar("00012345678").score == 800
+
+    divergencias = verificar(caminho_snapshot, caminho_clientes, caminho_tabela)
+    assert len(divergencias) == 2
+    assert any("limite_credito" in d and "11122233344" in d for d in divergencias)
+    assert any("score" in d and "00012345678" in d for d in divergencias)
+
+
+def test_reconversao_atualiza_o_snapshot(arquivos):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    snapshot = ArmazenamentoSnapshot(caminho_snapshot)
+    snapshot.atualizar("11122233344", score=100)
+
+    # Nova conversão a partir do CSV substitui o arquivo; o mapeamento é refeito
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    assert snapshot.buscar("11122233344").score == 550
+    assert verificar(caminho_snapshot, caminho_clientes, caminho_tabela) == []
+
+
+def test_campos_fixos_e_cpf_inexistente(arquivos):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    snapshot = ArmazenamentoSnapshot(caminho_snapshot)
+
+    with pytest.raises(ValueError):
+        snapshot.atualizar("11122233344", nome="Outro")
+    with pytest.raises(ValueError):
+        snapshot.atualizar_em_lote("data_nascimento", {"11122233344": "2000-01-01"})
+    with pytest.raises(KeyError):
+        snapshot.atualizar("55566677788", score=500)
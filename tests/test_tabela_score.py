@@ -0,0 +1,69 @@
+import os
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import tabela_score
+from snapshot_clientes import converter, obter_snapshot
+from tabela_score import ScoreForaDaFaixaError, TabelaScoreLimite
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    clientes = str(tmp_path / "clientes.csv")
+    tabela = str(tmp_path / "score_limite.csv")
+    shutil.copy(os.path.join(RAIZ, "clientes.csv"), clientes)
+    shutil.copy(os.path.join(RAIZ, "score_limite.csv"), tabela)
+    return clientes, tabela, str(tmp_path / "banco.snap")
+
+
+@pytest.fixture
+def leituras(monkeypatch):
+    contagem = []
+    ler = tabela_score._ler_tabela
+    monkeypatch.setattr(tabela_score, "_ler_tabela", lambda caminho: contagem.append(caminho) or ler(caminho))
+    return contagem
+
+
+def test_limite_por_faixa(arquivos):
+    _, caminho_tabela, _ = arquivos
+    tabela = TabelaScoreLimite(caminho_tabela)
+    assert tabela.limite_para(0) == 3000.0
+    assert tabela.limite_para(600) == 7000.0
+    with pytest.raises(ScoreForaDaFaixaError):
+        tabela.limite_para(-1)
+
+
+def test_snapshot_nao_recarrega_a_cada_escrita_de_cliente(arquivos, leituras):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    tabela = TabelaScoreLimite(caminho_snapshot)
+    assert tabela.limite_para(600) == 7000.0
+
+    snapshot = obter_snapshot(caminho_snapshot)
+    cpf, _ = next(snapshot.registros())
+    for limite in (1000.0, 2000.0, 3000.0):
+        time.sleep(0.01)
+        snapshot.atualizar(cpf, limite_credito=limite)
+        tabela.limite_para(600)
+
+    assert len(leituras) == 1
+
+
+def test_snapshot_substituido_recarrega(arquivos, leituras):
+    caminho_clientes, caminho_tabela, caminho_snapshot = arquivos
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+    tabela = TabelaScoreLimite(caminho_snapshot)
+    assert tabela.limite_para(600) == 7000.0
+
+    with open(caminho_tabela, "w") as arquivo:
+        arquivo.write("score_min,score_max,limite_maximo\n0,1000,9000.00\n")
+    converter(caminho_clientes, caminho_tabela, caminho_snapshot)
+
+    assert tabela.limite_para(600) == 9000.0
+    assert len(leituras) == 2